@@ -0,0 +1,214 @@
+"""Отчёты администратора по всем пользователям.
+
+Агрегаты считаются на стороне PostgreSQL по материализованным представлениям
+(scripts/analytics_views.sql), дальнейшая обработка — векторно в NumPy.
+
+    python admin.py refresh            # обновить представления
+    python admin.py all --refresh      # обновить и вывести все отчёты
+    python admin.py dau --days 30
+    python admin.py apm --hours 24
+    python admin.py retention --weeks 8
+    python admin.py hardest --limit 20 --min-attempts 5
+"""
+import argparse
+import logging
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from dotenv import load_dotenv
+
+from src import db
+
+load_dotenv()
+logging.basicConfig(
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    level=logging.INFO,
+)
+logger = logging.getLogger(__name__)
+
+# Сглаживание оценки сложности: слова с малым числом ответов тянутся к общей медиане
+DIFFICULTY_PRIOR_WEIGHT = 5
+
+
+def report_dau(days: int = 30) -> str:
+    """DAU и число ответов по дням, скользящее среднее за 7 дней и «липкость» (средний DAU к числу уникальных пользователей)."""
+    start = date.today() - timedelta(days=days - 1)
+    cur = db.execute(
+        """
+        SELECT day, COUNT(*), SUM(answers)
+        FROM analytics_user_daily
+        WHERE day >= %s
+        GROUP BY day
+        """,
+        (start,),
+    )
+    rows = cur.fetchall()
+    cur = db.execute("SELECT COUNT(DISTINCT user_id) FROM analytics_user_daily WHERE day >= %s", (start,))
+    period_users = cur.fetchone()[0]
+
+    dau = np.zeros(days, dtype=np.int64)
+    answers = np.zeros(days, dtype=np.int64)
+    if rows:
+        offsets = np.array([(row[0] - start).days for row in rows])
+        dau[offsets] = [row[1] for row in rows]
+        answers[offsets] = [row[2] for row in rows]
+
+    # Скользящее среднее за 7 дней через накопленные суммы (в начале периода — по доступным дням)
+    cumulative = np.concatenate(([0], np.cumsum(dau)))
+    index = np.arange(1, days + 1)
+    window_start = np.maximum(index - 7, 0)
+    rolling = (cumulative[index] - cumulative[window_start]) / (index - window_start)
+    stickiness = dau.mean() / period_users if period_users else 0.0
+
+    lines = [f"DAU за {days} дн.: среднее {dau.mean():.1f}, максимум {dau.max()}, "
+             f"уникальных пользователей {period_users}, DAU/уникальные {stickiness:.1%}",
+             "день        DAU  ответов  DAU(7д)"]
+    for i in range(days):
+        lines.append(f"{start + timedelta(days=i)}  {dau[i]:>4}  {answers[i]:>7}  {rolling[i]:>7.1f}")
+    return "\n".join(lines)
+
+
+def report_answers_per_minute(hours: int = 24) -> str:
+    """Распределение числа ответов в минуту за последние часы (включая «тихие» минуты)."""
+    now = datetime.now().replace(second=0, microsecond=0)
+    start = now - timedelta(hours=hours)
+    cur = db.execute(
+        "SELECT minute, answers FROM analytics_minute_answers WHERE minute >= %s",
+        (start,),
+    )
+    rows = cur.fetchall()
+
+    per_minute = np.zeros(hours * 60 + 1, dtype=np.int64)
+    if rows:
+        minutes = np.array([row[0] for row in rows], dtype="datetime64[m]")
+        offsets = (minutes - np.datetime64(start, "m")).astype(np.int64)
+        valid = (offsets >= 0) & (offsets < per_minute.size)
+        per_minute[offsets[valid]] = np.array([row[1] for row in rows])[valid]
+
+    active = per_minute[per_minute > 0]
+    peak = int(per_minute.argmax())
+    p50, p95, p99 = np.percentile(per_minute, [50, 95, 99])
+    return "\n".join([
+        f"Ответы в минуту за {hours} ч.: всего {per_minute.sum()}, среднее {per_minute.mean():.2f}",
+        f"p50 {p50:.0f}, p95 {p95:.0f}, p99 {p99:.0f}, максимум {per_minute[peak]} "
+        f"({start + timedelta(minutes=peak):%Y-%m-%d %H:%M})",
+        f"Минут с активностью: {active.size} из {per_minute.size}"
+        + (f", среднее в активную минуту {active.mean():.2f}" if active.size else ""),
+    ])
+
+
+def report_retention(weeks: int = 8) -> str:
+    """Удержание недельных когорт: доля вернувшихся на 1-й день, в 1-ю неделю и в 8–30-й день."""
+    cur = db.execute(
+        """
+        WITH activity AS (
+            SELECT user_id, day, day - MIN(day) OVER (PARTITION BY user_id) AS offset_days,
+                   MIN(day) OVER (PARTITION BY user_id) AS first_day
+            FROM analytics_user_daily
+        )
+        SELECT date_trunc('week', first_day)::DATE AS cohort,
+               COUNT(DISTINCT user_id),
+               COUNT(DISTINCT user_id) FILTER (WHERE offset_days = 1),
+               COUNT(DISTINCT user_id) FILTER (WHERE offset_days BETWEEN 1 AND 7),
+               COUNT(DISTINCT user_id) FILTER (WHERE offset_days BETWEEN 8 AND 30)
+        FROM activity
+        WHERE first_day >= %s
+        GROUP BY 1
+        ORDER BY 1
+        """,
+        (date.today() - timedelta(weeks=weeks),),
+    )
+    rows = cur.fetchall()
+    if not rows:
+        return "Удержание: нет данных"
+
+    counts = np.array([row[1:] for row in rows], dtype=np.float64)
+    sizes = counts[:, :1]
+    rates = np.divide(counts[:, 1:], sizes, out=np.zeros_like(counts[:, 1:]), where=sizes > 0)
+    weighted = (rates * sizes).sum(axis=0) / sizes.sum()
+
+    lines = ["когорта     размер    D1   D1-7  D8-30"]
+    for (cohort, *_), size, rate in zip(rows, sizes[:, 0], rates):
+        lines.append(f"{cohort}  {int(size):>6}  " + "  ".join(f"{r:>5.0%}" for r in rate))
+    lines.append("итого       " + f"{int(sizes.sum()):>6}  " + "  ".join(f"{r:>5.0%}" for r in weighted))
+    return "\n".join(lines)
+
+
+def report_hardest_words(limit: int = 20, min_attempts: int = 5) -> str:
+    """Самые трудные слова по доле неправильных ответов (счётчики word_difficulty).
+
+    Доля ошибок сглаживается к общей доле с весом DIFFICULTY_PRIOR_WEIGHT,
+    чтобы слова с парой ответов не занимали верх списка. Рядом выводится
+    медианное время до правильного ответа из analytics_word_learning.
+    """
+    cur = db.execute(
+        """
+        SELECT d.word_type,
+               COALESCE(c.english_word, l.english_word),
+               COALESCE(c.russian_translation, l.russian_translation),
+               d.attempts,
+               d.wrong,
+               w.median_seconds
+        FROM word_difficulty d
+        LEFT JOIN analytics_word_learning w ON w.word_type = d.word_type AND w.word_id = d.word_id
+        LEFT JOIN common_words c ON d.word_type = 'common' AND c.id = d.word_id
+        LEFT JOIN user_words u ON d.word_type = 'user' AND u.id = d.word_id
+        LEFT JOIN lexemes l ON l.id = u.lexeme_id
+        WHERE d.attempts >= %s
+        """,
+        (min_attempts,),
+    )
+    rows = cur.fetchall()
+    if not rows:
+        return "Трудные слова: нет данных"
+
+    attempts = np.array([row[3] for row in rows], dtype=np.float64)
+    wrong = np.array([row[4] for row in rows], dtype=np.float64)
+    medians = np.array([np.nan if row[5] is None else row[5] for row in rows], dtype=np.float64)
+    prior = wrong.sum() / attempts.sum()
+    scores = (wrong + DIFFICULTY_PRIOR_WEIGHT * prior) / (attempts + DIFFICULTY_PRIOR_WEIGHT)
+    # При равной доле ошибок выше слово, на которое дольше отвечают
+    top = np.lexsort((-np.nan_to_num(medians), -scores))[:limit]
+
+    lines = [f"Трудные слова (общая доля ошибок {prior:.0%}):", "слово — перевод: оценка, ошибок/ответов, медиана"]
+    for i in top:
+        word_type, english, russian = rows[i][:3]
+        median = "—" if np.isnan(medians[i]) else f"{medians[i]:.1f} с"
+        lines.append(f"{english} — {russian} [{word_type}]: {scores[i]:.0%}, {int(wrong[i])}/{int(attempts[i])}, {median}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Отчёты администратора по всем пользователям")
+    parser.add_argument("--refresh", action="store_true", help="обновить представления перед отчётом")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("refresh", help="обновить материализованные представления")
+    commands.add_parser("dau", help="активные пользователи по дням").add_argument("--days", type=int, default=30)
+    commands.add_parser("apm", help="ответы в минуту").add_argument("--hours", type=int, default=24)
+    commands.add_parser("retention", help="удержание когорт").add_argument("--weeks", type=int, default=8)
+    hardest = commands.add_parser("hardest", help="самые трудные слова")
+    hardest.add_argument("--limit", type=int, default=20)
+    hardest.add_argument("--min-attempts", type=int, default=5)
+    commands.add_parser("all", help="все отчёты")
+    args = parser.parse_args()
+
+    if args.refresh or args.command == "refresh":
+        refreshed = db.refresh_analytics_views()
+        logger.info(f"Обновлены представления: {', '.join(refreshed) or 'нет'}")
+
+    reports = {
+        "dau": lambda: report_dau(args.days),
+        "apm": lambda: report_answers_per_minute(args.hours),
+        "retention": lambda: report_retention(args.weeks),
+        "hardest": lambda: report_hardest_words(args.limit, args.min_attempts),
+        "all": lambda: "\n\n".join([
+            report_dau(), report_answers_per_minute(), report_retention(), report_hardest_words()
+        ]),
+    }
+    if args.command in reports:
+        print(reports[args.command]())
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import logging
+from datetime import time
 from telegram.ext import (
     Updater,
     CommandHandler,
@@ -6,17 +7,46 @@ from telegram.ext import (
     Filters,
     CallbackQueryHandler,
     ConversationHandler,
+    InlineQueryHandler,
 )
 from dotenv import load_dotenv
-from src.config import TOKEN
+from src.config import TOKEN, ANSWER_LOG_FLUSH_SECONDS, INLINE_CATALOG_REFRESH_SECONDS, REMINDER_TICK_SECONDS
 from src.handlers import (
     start_handler,
     ask_question_handler,
     button_click_handler,
     pronounce_word_handler,
     handle_menu_button,
+    typed_answer_handler,
+    voice_answer_handler,
+    quiz_mode_handler,
+    quiz_mode_select_handler,
+    lang_handler,
+    lang_select_handler,
 )
-from src.stats import stats_handler, clear_user_sessions, reset_progress_handler
+from src.answer_log import flush_answer_log
+from src.keyboards import (
+    BUTTON_ADD_MORE,
+    BUTTON_ADD_WORD,
+    BUTTON_BACK,
+    BUTTON_CLEAR,
+    BUTTON_DELETE_MORE,
+    BUTTON_DELETE_WORD,
+    BUTTON_MY_WORDS,
+    BUTTON_START_QUIZ,
+    BUTTON_STATS,
+    BUTTON_TO_MENU,
+    MENU_BUTTONS,
+)
+from src.menu_router import MenuRouter
+from src.export import export_handler
+from src.groups import class_create_handler, class_publish_handler, join_handler, leaderboard_handler
+from src.inline_search import inline_query_handler, refresh_inline_catalogs
+from src.lemmas import run_lemma_backfill
+from src.reminders import remind_handler, run_reminders
+from src.retention import run_session_retention
+from src.session_manager import finalize_sessions_on_shutdown, recover_open_sessions
+from src.stats import stats_handler, clear_user_sessions, reset_progress_handler, query_stats_handler
 from src.word_management import (
     add_word,
     save_word,
@@ -38,6 +68,19 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Кнопки меню вне диалогов добавления/удаления слов: текст кнопки -> обработчик
+MENU_ROUTES = {
+    BUTTON_START_QUIZ: ask_question_handler,
+    BUTTON_MY_WORDS: show_user_words,
+    BUTTON_STATS: stats_handler,
+    BUTTON_CLEAR: clear_user_sessions,
+    BUTTON_BACK: handle_back_to_menu,
+    BUTTON_TO_MENU: handle_menu_button,
+}
+
+# Свободный ввод в диалогах: любой текст, кроме команд и кнопок меню
+FREE_TEXT = Filters.text & ~Filters.command & ~Filters.text(MENU_BUTTONS)
+
 
 def main():
     """Главная функция для запуска бота."""
@@ -48,61 +91,98 @@ def main():
 
     # 1. Глобальные обработчики
     dispatcher.add_handler(CommandHandler("start", start_handler))
-    dispatcher.add_handler(MessageHandler(Filters.regex(r"^В меню ↩️$"), handle_menu_button))
+    dispatcher.add_handler(CommandHandler("mode", quiz_mode_handler))
+    dispatcher.add_handler(CommandHandler("lang", lang_handler))
+    dispatcher.add_handler(CommandHandler("querystats", query_stats_handler))
+    dispatcher.add_handler(CommandHandler("export", export_handler, run_async=True))
+    dispatcher.add_handler(CommandHandler("remind", remind_handler))
+    dispatcher.add_handler(CommandHandler("class_create", class_create_handler))
+    dispatcher.add_handler(CommandHandler("join", join_handler))
+    dispatcher.add_handler(CommandHandler("class_publish", class_publish_handler))
+    dispatcher.add_handler(CommandHandler("leaderboard", leaderboard_handler))
+
+    # 2. ConversationHandlers: нажатие кнопки меню внутри диалога выполняет её и завершает диалог
+    leave_conversation = MenuRouter(MENU_ROUTES, end_conversation=True)
 
-    # 2. ConversationHandlers
     add_conv = ConversationHandler(
-        entry_points=[MessageHandler(Filters.regex(r"^Добавить слово ➕$"), add_word)],
+        entry_points=[MenuRouter({BUTTON_ADD_WORD: add_word})],
         states={
             WAITING_WORD: [
-                MessageHandler(Filters.text & ~Filters.command, save_word),
-                MessageHandler(Filters.regex(r"^Назад ↩️$"), handle_back_to_menu),
+                MenuRouter({BUTTON_ADD_MORE: add_word}),
+                MessageHandler(FREE_TEXT, save_word),
             ]
         },
-        fallbacks=[],
+        fallbacks=[leave_conversation],
         allow_reentry=True,
     )
 
     delete_conv = ConversationHandler(
-        entry_points=[MessageHandler(Filters.regex(r"^Удалить слово ➖$"), delete_word)],
+        entry_points=[MenuRouter({BUTTON_DELETE_WORD: delete_word})],
         states={
             WAITING_DELETE: [
-                MessageHandler(Filters.text & ~Filters.command, confirm_delete),
-                MessageHandler(Filters.regex(r"^Назад ↩️$"), handle_back_to_menu),
+                MenuRouter({BUTTON_DELETE_MORE: delete_word}),
+                MessageHandler(FREE_TEXT, confirm_delete),
             ]
         },
-        fallbacks=[],
+        fallbacks=[leave_conversation],
         allow_reentry=True,
     )
 
     dispatcher.add_handler(add_conv)
     dispatcher.add_handler(delete_conv)
 
-    # 3. Обработчики главного меню
-    dispatcher.add_handler(MessageHandler(Filters.regex(r"^Начать тест 🚀$"), ask_question_handler))
-    dispatcher.add_handler(MessageHandler(Filters.regex(r"^Мои слова 📖$"), show_user_words))
-    dispatcher.add_handler(MessageHandler(Filters.regex(r"^Ваша статистика 📊$"), stats_handler))
+    # 3. Кнопки главного меню, статистики и сессии — одна таблица маршрутов
+    dispatcher.add_handler(MenuRouter(MENU_ROUTES))
 
-    # 4. Обработчик кнопки "Очистить 🗑"
-    dispatcher.add_handler(
-        MessageHandler(Filters.regex(r"^Очистить 🗑$"), clear_user_sessions)
-    )
+    # Ответ, введённый текстом (режим ввода) — после всех кнопок меню
+    dispatcher.add_handler(MessageHandler(Filters.text & ~Filters.command, typed_answer_handler))
+    # Голосовой ответ: проверка произношения текущего слова (распознавание в пуле потоков)
+    dispatcher.add_handler(MessageHandler(Filters.voice, voice_answer_handler, run_async=True))
 
-    dispatcher.add_handler(MessageHandler(Filters.regex(r"^Назад ↩️$"), handle_back_to_menu))
-
-    # 5. CallbackQuery обработчики
-    dispatcher.add_handler(CallbackQueryHandler(button_click_handler, pattern=r"^answer_"))
-    dispatcher.add_handler(CallbackQueryHandler(pronounce_word_handler, pattern="^pronounce_word$"))
+    # 4. CallbackQuery обработчики
+    dispatcher.add_handler(CallbackQueryHandler(button_click_handler, pattern=r"^a:"))
+    dispatcher.add_handler(CallbackQueryHandler(pronounce_word_handler, pattern="^pronounce_word$", run_async=True))
     dispatcher.add_handler(CallbackQueryHandler(reset_progress_handler, pattern="^reset_progress$"))
+    dispatcher.add_handler(CallbackQueryHandler(quiz_mode_select_handler, pattern=r"^mode_"))
+    dispatcher.add_handler(CallbackQueryHandler(lang_select_handler, pattern=r"^lang_"))
+
+    # Inline-режим: «@бот слово» в любом чате
+    dispatcher.add_handler(InlineQueryHandler(inline_query_handler, run_async=True))
 
-    # 6. Обработка ошибок
+    # 5. Обработка ошибок
     dispatcher.add_error_handler(lambda u, c: logger.error(f"Ошибка: {c.error}"))
 
+    # 6. Обслуживание секций статистики: при запуске и ежедневно ночью
+    updater.job_queue.run_once(run_session_retention, when=0)
+    updater.job_queue.run_daily(run_session_retention, time=time(hour=3))
+
+    # Леммы для слов, загруженных без них (начальные данные, импорт словарей)
+    updater.job_queue.run_once(run_lemma_backfill, when=0)
+
+    # Журнал ответов пишется в БД пачками
+    updater.job_queue.run_repeating(flush_answer_log, interval=ANSWER_LOG_FLUSH_SECONDS)
+
+    # Каталоги inline-поиска перестраиваются, чтобы в них появлялись импортированные слова
+    updater.job_queue.run_repeating(
+        refresh_inline_catalogs, interval=INLINE_CATALOG_REFRESH_SECONDS, first=INLINE_CATALOG_REFRESH_SECONDS
+    )
+
+    # Ежедневные напоминания: одна периодическая задача на всех пользователей
+    updater.job_queue.run_repeating(run_reminders, interval=REMINDER_TICK_SECONDS, first=REMINDER_TICK_SECONDS)
+
+    # Завершение сессий, оставшихся открытыми после прошлого запуска
+    recover_open_sessions()
+
     # Запуск бота
     updater.start_polling()
     logger.info("Бот успешно запущен.")
     updater.idle()
 
+    # Сохранение всех активных сессий одной записью перед выходом
+    finalize_sessions_on_shutdown(dispatcher)
+    # Запись ответов, оставшихся в журнале
+    flush_answer_log()
+
 
 if __name__ == "__main__":
     main()
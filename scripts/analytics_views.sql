@@ -0,0 +1,79 @@
+-- Материализованные представления для отчётов администратора (admin.py).
+-- Создаются пустыми; заполняются и обновляются командой `python admin.py refresh`.
+-- Уникальные индексы нужны для REFRESH MATERIALIZED VIEW CONCURRENTLY.
+
+-- Все отчёты об ответах считаются по журналу answer_events: у каждого ответа своё время,
+-- и в журнал попадают и неверные ответы, и повторы. В user_progress одна строка на новое
+-- изученное слово со временем начала сессии, поэтому прежние версии этих представлений
+-- (по user_progress) пересоздаются
+DO $$
+DECLARE
+    view_name TEXT;
+BEGIN
+    FOR view_name IN
+        SELECT matviewname FROM pg_matviews
+        WHERE matviewname IN ('analytics_user_daily', 'analytics_minute_answers', 'analytics_word_learning')
+            AND definition LIKE '%user_progress%'
+    LOOP
+        EXECUTE format('DROP MATERIALIZED VIEW %I', view_name);
+    END LOOP;
+END $$;
+
+-- Активность пользователя по дням: основа для DAU и удержания
+CREATE MATERIALIZED VIEW IF NOT EXISTS analytics_user_daily AS
+SELECT user_id,
+       answered_at::DATE AS day,
+       COUNT(*) AS answers
+FROM answer_events
+GROUP BY user_id, answered_at::DATE
+WITH NO DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS analytics_user_daily_key ON analytics_user_daily (user_id, day);
+CREATE INDEX IF NOT EXISTS analytics_user_daily_day_idx ON analytics_user_daily (day);
+
+-- Ответы (правильные и неправильные) по минутам за последние 7 дней (на момент обновления)
+CREATE MATERIALIZED VIEW IF NOT EXISTS analytics_minute_answers AS
+SELECT date_trunc('minute', answered_at) AS minute,
+       COUNT(*) AS answers
+FROM answer_events
+WHERE answered_at >= LOCALTIMESTAMP - INTERVAL '7 days'
+GROUP BY 1
+WITH NO DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS analytics_minute_answers_key ON analytics_minute_answers (minute);
+
+-- Время до правильного ответа по каждому слову: от предыдущего ответа пользователя
+-- (показ вопроса) до первого правильного ответа на это слово, включая неверные попытки.
+-- Подряд идущие ответы на одно слово — один вопрос; паузы дольше 5 минут не учитываются
+CREATE MATERIALIZED VIEW IF NOT EXISTS analytics_word_learning AS
+SELECT word_type,
+       word_id,
+       COUNT(DISTINCT user_id) AS learners,
+       percentile_cont(0.5) WITHIN GROUP (ORDER BY seconds) AS median_seconds,
+       AVG(seconds) AS mean_seconds
+FROM (
+    SELECT user_id,
+           word_type,
+           word_id,
+           EXTRACT(EPOCH FROM MIN(answered_at) FILTER (WHERE correct) - MIN(previous_at)) AS seconds
+    FROM (
+        SELECT *, SUM(new_question::INT) OVER (PARTITION BY user_id ORDER BY answered_at) AS question
+        FROM (
+            SELECT user_id,
+                   word_type,
+                   word_id,
+                   correct,
+                   answered_at,
+                   LAG(answered_at) OVER w AS previous_at,
+                   (word_type, word_id) IS DISTINCT FROM (LAG(word_type) OVER w, LAG(word_id) OVER w) AS new_question
+            FROM answer_events
+            WINDOW w AS (PARTITION BY user_id ORDER BY answered_at)
+        ) AS events
+    ) AS numbered
+    GROUP BY user_id, question, word_type, word_id
+) AS questions
+WHERE seconds BETWEEN 0 AND 300
+GROUP BY word_type, word_id
+WITH NO DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS analytics_word_learning_key ON analytics_word_learning (word_type, word_id);
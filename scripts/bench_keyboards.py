@@ -0,0 +1,83 @@
+"""Сравнение подготовки клавиатур к отправке: сборка на каждый вызов и реестр.
+
+Для каждого варианта измеряется время и память на одну «отправку» —
+получение клавиатуры и её сериализацию в JSON (так делает Bot перед
+запросом к Telegram API).
+
+    python scripts/bench_keyboards.py
+    python scripts/bench_keyboards.py --number 20000
+"""
+import argparse
+import importlib.util
+import os
+import secrets
+import timeit
+import tracemalloc
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
+
+# Модуль загружается по пути: импорт пакета src открыл бы подключение к БД
+_spec = importlib.util.spec_from_file_location(
+    "keyboards", os.path.join(os.path.dirname(__file__), "..", "src", "keyboards.py")
+)
+keyboards = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(keyboards)
+
+OPTIONS = ["собака", "кошка", "лошадь", "корова"]
+
+
+def build_main_menu():
+    """Прежний способ: новая клавиатура на каждый вызов."""
+    return ReplyKeyboardMarkup(
+        keyboard=[[KeyboardButton(text) for text in row] for row in keyboards.LAYOUTS["main_menu"]],
+        resize_keyboard=True,
+    )
+
+
+def build_answer_keyboard(options, token):
+    """Прежний способ: объекты кнопок для каждого вопроса."""
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(opt, callback_data=keyboards.answer_callback_data(token, index))
+                for index, opt in enumerate(options[i : i + 2], start=i)
+            ]
+            for i in range(0, len(options), 2)
+        ]
+    )
+
+
+def measure(send, number: int):
+    """Время (мкс) и пиковая выделенная память (байт) на одну отправку."""
+    seconds = min(timeit.repeat(send, number=number, repeat=3))
+    tracemalloc.start()
+    send()
+    tracemalloc.reset_peak()
+    current, _ = tracemalloc.get_traced_memory()
+    send()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds / number * 1e6, peak - current
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк подготовки клавиатур")
+    parser.add_argument("--number", type=int, default=10000, help="число отправок в замере")
+    args = parser.parse_args()
+
+    token = secrets.token_urlsafe(6)
+    cases = {
+        "главное меню: сборка": lambda: build_main_menu().to_json(),
+        "главное меню: реестр": lambda: keyboards.main_menu_keyboard().to_json(),
+        "варианты ответа: сборка": lambda: build_answer_keyboard(OPTIONS, token).to_json(),
+        "варианты ответа: шаблон": lambda: keyboards.answer_keyboard(OPTIONS, token).to_json(),
+    }
+
+    print(f"{'вариант':<26}{'мкс/отправка':>14}{'байт/отправка':>16}")
+    for name, send in cases.items():
+        micros, allocated = measure(send, args.number)
+        print(f"{name:<26}{micros:>14.2f}{allocated:>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
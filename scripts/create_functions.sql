@@ -0,0 +1,240 @@
+DROP FUNCTION IF EXISTS record_answer_and_next(INT, INT, TEXT, TIMESTAMP, INT);
+DROP FUNCTION IF EXISTS record_answer_and_next(INT, INT, TEXT, TIMESTAMP, INT, BOOLEAN);
+DROP FUNCTION IF EXISTS record_answer_and_next(INT, INT, TEXT, TIMESTAMP, INT, BOOLEAN, INT, TEXT[]);
+DROP FUNCTION IF EXISTS next_question_bundle(INT, INT);
+DROP FUNCTION IF EXISTS next_question_bundle(INT, INT, BOOLEAN);
+
+-- До p_count неизученных слов, каждое вместе с вариантами неправильных ответов.
+-- Сначала идут слова пользователя, затем общие слова в порядке частоты
+-- (по индексу common_words_lang_rank_idx); слова без ранга — в конце.
+-- Индекс отдаёт небольшое окно ближайших по частоте слов, и только внутри него
+-- при равном ранге раньше идут слова с меньшей долей ошибок (word_difficulty).
+-- Слова и варианты берутся только из языковой пары пользователя (users.lang_pair).
+-- Неправильные варианты — слова со случайными рангами, каждое находится по тому же
+-- индексу; у пар без рангов варианты подбирает бот.
+-- При p_reverse варианты подбираются на изучаемом языке (режим RU -> EN).
+-- p_exclude — ключи 'тип:id' слов, которые уже выданы или лежат в буфере.
+CREATE OR REPLACE FUNCTION question_batch(
+    p_user_id INT,
+    p_count INT,
+    p_distractors INT,
+    p_reverse BOOLEAN,
+    p_exclude TEXT[]
+)
+RETURNS TABLE (
+    english_word VARCHAR,
+    russian_translation VARCHAR,
+    word_type TEXT,
+    word_id INT,
+    distractors TEXT[]
+)
+LANGUAGE sql AS $$
+    WITH pair AS (
+        SELECT split_part(lang_pair, '-', 1) AS source_lang, split_part(lang_pair, '-', 2) AS target_lang
+        FROM users
+        WHERE user_id = p_user_id
+    ), next_words AS (
+        SELECT combined.english_word, combined.russian_translation, combined.word_type, combined.word_id
+        FROM (
+            (
+                SELECT l.english_word, l.russian_translation, 'user'::TEXT AS word_type, u.id AS word_id,
+                       0 AS frequency_rank, 0.0 AS difficulty, RANDOM() AS sort_key
+                FROM user_words u
+                JOIN lexemes l ON l.id = u.lexeme_id
+                JOIN pair ON l.source_lang = pair.source_lang AND l.target_lang = pair.target_lang
+                LEFT JOIN user_progress p
+                    ON u.id = p.word_id AND p.word_type = 'user' AND p.user_id = p_user_id
+                WHERE p.word_id IS NULL AND u.user_id = p_user_id
+                    AND (p_exclude IS NULL OR ('user:' || u.id) <> ALL (p_exclude))
+                ORDER BY sort_key
+                LIMIT p_count
+            )
+
+            UNION ALL
+
+            (
+                SELECT w.english_word, w.russian_translation, 'common'::TEXT AS word_type, w.id AS word_id,
+                       w.frequency_rank,
+                       COALESCE((d.wrong + 1.0) / (d.attempts + 2), 0.5) AS difficulty,
+                       RANDOM() AS sort_key
+                FROM (
+                    SELECT c.id, c.english_word, c.russian_translation, c.frequency_rank
+                    FROM common_words c
+                    WHERE c.source_lang = (SELECT source_lang FROM pair)
+                        AND c.target_lang = (SELECT target_lang FROM pair)
+                        AND NOT EXISTS (
+                            SELECT 1 FROM user_progress p
+                            WHERE p.user_id = p_user_id AND p.word_type = 'common' AND p.word_id = c.id
+                        )
+                        AND (p_exclude IS NULL OR ('common:' || c.id) <> ALL (p_exclude))
+                    ORDER BY c.frequency_rank
+                    LIMIT p_count * 4
+                ) AS w
+                LEFT JOIN word_difficulty d ON d.word_type = 'common' AND d.word_id = w.id
+                ORDER BY w.frequency_rank NULLS LAST, difficulty, sort_key
+                LIMIT p_count
+            )
+        ) AS combined
+        ORDER BY combined.frequency_rank NULLS LAST, combined.difficulty, combined.sort_key
+        LIMIT p_count
+    ), ranks AS (
+        SELECT MIN(c.frequency_rank) AS low, MAX(c.frequency_rank) AS high
+        FROM common_words c
+        WHERE c.source_lang = (SELECT source_lang FROM pair)
+            AND c.target_lang = (SELECT target_lang FROM pair)
+    ), sampled AS (
+        SELECT r.low + FLOOR(RANDOM() * (r.high - r.low + 1))::INT AS frequency_rank
+        FROM ranks r, generate_series(1, p_count * p_distractors * 3)
+        WHERE r.high IS NOT NULL
+    ), candidates AS (
+        SELECT DISTINCT LOWER(CASE WHEN p_reverse THEN c.english_word ELSE c.russian_translation END) AS candidate
+        FROM sampled s
+        CROSS JOIN LATERAL (
+            SELECT c.english_word, c.russian_translation
+            FROM common_words c
+            WHERE c.source_lang = (SELECT source_lang FROM pair)
+                AND c.target_lang = (SELECT target_lang FROM pair)
+                AND c.frequency_rank >= s.frequency_rank
+            ORDER BY c.frequency_rank
+            LIMIT 1
+        ) AS c
+    )
+    SELECT n.english_word, n.russian_translation, n.word_type, n.word_id,
+           ARRAY(
+               SELECT o.candidate
+               FROM candidates o
+               WHERE o.candidate <> LOWER(CASE WHEN p_reverse THEN n.english_word ELSE n.russian_translation END)
+               ORDER BY RANDOM()
+               LIMIT p_distractors
+           )
+    FROM next_words n;
+$$;
+
+-- Запись правильного ответа и выбор следующих вопросов за одно обращение.
+-- p_answered_at — время ответа по часам бота: по тем же часам записано начало сессии.
+CREATE OR REPLACE FUNCTION record_answer_and_next(
+    p_user_id INT,
+    p_word_id INT,
+    p_word_type TEXT,
+    p_seen_at TIMESTAMP,
+    p_answered_at TIMESTAMP,
+    p_distractors INT,
+    p_reverse BOOLEAN,
+    p_count INT,
+    p_exclude TEXT[]
+)
+RETURNS TABLE (
+    english_word VARCHAR,
+    russian_translation VARCHAR,
+    word_type TEXT,
+    word_id INT,
+    distractors TEXT[]
+)
+LANGUAGE plpgsql AS $$
+#variable_conflict use_column
+BEGIN
+    INSERT INTO user_progress (user_id, word_id, word_type, added_at)
+    VALUES (p_user_id, p_word_id, p_word_type, COALESCE(p_seen_at, p_answered_at))
+    ON CONFLICT DO NOTHING;
+
+    UPDATE open_sessions SET last_activity = p_answered_at WHERE user_id = p_user_id;
+
+    RETURN QUERY SELECT * FROM question_batch(p_user_id, p_count, p_distractors, p_reverse, p_exclude);
+END;
+$$;
+
+-- Завершение открытых сессий одной командой: запись в session_stats и удаление из open_sessions.
+-- p_user_ids = NULL завершает все сессии; p_ended_at = NULL — по времени последней активности.
+CREATE OR REPLACE FUNCTION finalize_open_sessions(p_user_ids INT[], p_ended_at TIMESTAMP)
+RETURNS INT
+LANGUAGE sql AS $$
+    WITH closed AS (
+        DELETE FROM open_sessions o
+        WHERE p_user_ids IS NULL OR o.user_id = ANY(p_user_ids)
+        RETURNING o.user_id, o.session_start,
+                  GREATEST(COALESCE(p_ended_at, o.last_activity), o.session_start) AS ended_at
+    ), inserted AS (
+        INSERT INTO session_stats (user_id, session_date, learned_words, session_duration)
+        SELECT c.user_id,
+               c.ended_at,
+               (
+                   SELECT COUNT(*)
+                   FROM user_progress p
+                   WHERE p.user_id = c.user_id
+                       AND p.added_at BETWEEN c.session_start AND c.ended_at + INTERVAL '1 second'
+               ),
+               EXTRACT(EPOCH FROM c.ended_at - c.session_start)::INT
+        FROM closed c
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INT FROM inserted;
+$$;
+
+-- Очки участников класса: изученные слова из списка класса. Полный пересчёт нужен только
+-- при вступлении в класс и публикации слов; p_user_id = NULL — для всех участников.
+CREATE OR REPLACE FUNCTION refresh_group_scores(p_group_id INT, p_user_id INT)
+RETURNS VOID
+LANGUAGE sql AS $$
+    UPDATE group_members m
+    SET score = (
+        SELECT COUNT(*)
+        FROM group_words g
+        JOIN user_words u ON u.lexeme_id = g.lexeme_id AND u.user_id = m.user_id
+        JOIN user_progress p ON p.user_id = m.user_id AND p.word_type = 'user' AND p.word_id = u.id
+        WHERE g.group_id = m.group_id
+    )
+    WHERE m.group_id = p_group_id AND (p_user_id IS NULL OR m.user_id = p_user_id);
+$$;
+
+-- Инкрементальное обновление очков: каждая запись прогресса по слову из списка класса
+-- меняет очки участника на ±1 (по первичным ключам, без подсчёта)
+CREATE OR REPLACE FUNCTION group_scores_on_progress()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    progress RECORD;
+    delta INT;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        progress := NEW;
+        delta := 1;
+    ELSE
+        progress := OLD;
+        delta := -1;
+    END IF;
+
+    IF progress.word_type = 'user' THEN
+        UPDATE group_members m
+        SET score = GREATEST(m.score + delta, 0)
+        FROM user_words u
+        JOIN group_words g ON g.lexeme_id = u.lexeme_id
+        WHERE u.id = progress.word_id
+            AND u.user_id = progress.user_id
+            AND m.group_id = g.group_id
+            AND m.user_id = progress.user_id;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS user_progress_group_scores ON user_progress;
+CREATE TRIGGER user_progress_group_scores
+    AFTER INSERT OR DELETE ON user_progress
+    FOR EACH ROW EXECUTE FUNCTION group_scores_on_progress();
+
+-- Удаление слова из словаря удаляет и прогресс по нему. Строка user_words ещё существует,
+-- поэтому триггер на user_progress уменьшает очки классов, где слово опубликовано
+CREATE OR REPLACE FUNCTION user_words_drop_progress()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    DELETE FROM user_progress
+    WHERE user_id = OLD.user_id AND word_type = 'user' AND word_id = OLD.id;
+    RETURN OLD;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS user_words_drop_progress ON user_words;
+CREATE TRIGGER user_words_drop_progress
+    BEFORE DELETE ON user_words
+    FOR EACH ROW EXECUTE FUNCTION user_words_drop_progress();
@@ -10,27 +10,246 @@ CREATE TABLE IF NOT EXISTS common_words (
     russian_translation VARCHAR(50)
 );
 
-CREATE TABLE IF NOT EXISTS user_words (
+-- Частотный словарь: ранг частоты (1 — самое частое слово) и часть речи
+ALTER TABLE common_words ADD COLUMN IF NOT EXISTS frequency_rank INT;
+ALTER TABLE common_words ADD COLUMN IF NOT EXISTS part_of_speech VARCHAR(20);
+
+-- Языковая пара слова: english_word хранит слово изучаемого языка (source_lang),
+-- russian_translation — перевод на родной язык (target_lang). Имена колонок
+-- исторические; существующие слова относятся к паре en-ru.
+ALTER TABLE common_words ADD COLUMN IF NOT EXISTS source_lang VARCHAR(3) NOT NULL DEFAULT 'en';
+ALTER TABLE common_words ADD COLUMN IF NOT EXISTS target_lang VARCHAR(3) NOT NULL DEFAULT 'ru';
+
+-- Перед созданием уникального индекса удаляются дубликаты пар без учёта регистра
+DO $$
+BEGIN
+    IF to_regclass('common_words_lang_pair_key') IS NULL AND to_regclass('common_words_pair_key') IS NULL THEN
+        DELETE FROM common_words a
+        USING common_words b
+        WHERE a.id > b.id
+            AND a.source_lang = b.source_lang
+            AND a.target_lang = b.target_lang
+            AND LOWER(a.english_word) = LOWER(b.english_word)
+            AND LOWER(a.russian_translation) = LOWER(b.russian_translation);
+    END IF;
+END $$;
+
+CREATE UNIQUE INDEX IF NOT EXISTS common_words_lang_pair_key
+    ON common_words (source_lang, target_lang, LOWER(english_word), LOWER(russian_translation));
+DROP INDEX IF EXISTS common_words_pair_key;
+
+-- Выбор слов по частоте внутри пары (question_batch получает пару параметром,
+-- поэтому индекс составной; частичные индексы пар создаёт Database.ensure_lang_pair)
+CREATE INDEX IF NOT EXISTS common_words_lang_rank_idx ON common_words (source_lang, target_lang, frequency_rank);
+DROP INDEX IF EXISTS common_words_frequency_rank_idx;
+
+-- Глобальный словарь: каждая пара слово/перевод хранится один раз (в нижнем регистре)
+CREATE TABLE IF NOT EXISTS lexemes (
     id SERIAL PRIMARY KEY,
-    user_id INT REFERENCES users(user_id),
-    english_word VARCHAR(50),
-    russian_translation VARCHAR(50),
-    UNIQUE (user_id, english_word)
+    english_word VARCHAR(50) NOT NULL,
+    russian_translation VARCHAR(50) NOT NULL
 );
 
-CREATE TABLE IF NOT EXISTS user_progress (
+ALTER TABLE lexemes ADD COLUMN IF NOT EXISTS source_lang VARCHAR(3) NOT NULL DEFAULT 'en';
+ALTER TABLE lexemes ADD COLUMN IF NOT EXISTS target_lang VARCHAR(3) NOT NULL DEFAULT 'ru';
+CREATE UNIQUE INDEX IF NOT EXISTS lexemes_lang_pair_key
+    ON lexemes (source_lang, target_lang, english_word, russian_translation);
+ALTER TABLE lexemes DROP CONSTRAINT IF EXISTS lexemes_english_word_russian_translation_key;
+
+CREATE INDEX IF NOT EXISTS lexemes_russian_translation_idx ON lexemes (russian_translation);
+
+-- Леммы (словарные формы) слов для поиска дубликатов с учётом морфологии: «кошки» и «кошка»,
+-- «ran» и «run» — одно слово. Заполняются при добавлении слов и фоновой задачей (src/lemmas.py);
+-- индексы по леммам создаются для каждой языковой пары (Database.ensure_lang_pair)
+ALTER TABLE common_words ADD COLUMN IF NOT EXISTS english_lemma VARCHAR(50);
+ALTER TABLE common_words ADD COLUMN IF NOT EXISTS translation_lemma VARCHAR(50);
+ALTER TABLE lexemes ADD COLUMN IF NOT EXISTS english_lemma VARCHAR(50);
+ALTER TABLE lexemes ADD COLUMN IF NOT EXISTS translation_lemma VARCHAR(50);
+
+-- Результаты морфологического анализатора: слово -> лемма для каждого языка
+CREATE TABLE IF NOT EXISTS lemma_cache (
+    lang VARCHAR(3) NOT NULL,
+    word VARCHAR(50) NOT NULL,
+    lemma VARCHAR(50) NOT NULL,
+    PRIMARY KEY (lang, word)
+);
+
+-- Слова пользователя — только ссылки на глобальный словарь
+CREATE TABLE IF NOT EXISTS user_words (
     id SERIAL PRIMARY KEY,
     user_id INT REFERENCES users(user_id),
-    word_id INT,
-    word_type VARCHAR(50),
-    added_at TIMESTAMP DEFAULT NOW(),
-    UNIQUE(user_id, word_id, word_type)
+    lexeme_id INT NOT NULL REFERENCES lexemes(id),
+    UNIQUE (user_id, lexeme_id)
 );
 
-CREATE TABLE IF NOT EXISTS session_stats (
+-- Миграция: перенос собственных копий слов из user_words в lexemes
+DO $$
+DECLARE
+    untranslated INT;
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'user_words' AND column_name = 'english_word'
+    ) THEN
+        INSERT INTO lexemes (english_word, russian_translation)
+        SELECT DISTINCT LOWER(english_word), LOWER(russian_translation)
+        FROM user_words
+        WHERE english_word IS NOT NULL AND russian_translation IS NOT NULL
+        ON CONFLICT DO NOTHING;
+
+        ALTER TABLE user_words ADD COLUMN IF NOT EXISTS lexeme_id INT REFERENCES lexemes(id);
+
+        UPDATE user_words u
+        SET lexeme_id = l.id
+        FROM lexemes l
+        WHERE l.english_word = LOWER(u.english_word)
+            AND l.russian_translation = LOWER(u.russian_translation);
+
+        -- Слова без перевода не образуют лексему: удаляем их вместе с прогрессом
+        SELECT COUNT(*) INTO untranslated FROM user_words WHERE lexeme_id IS NULL;
+        IF untranslated > 0 THEN
+            RAISE NOTICE 'user_words: удалено слов без перевода: %', untranslated;
+            DELETE FROM user_progress p
+            USING user_words u
+            WHERE p.word_type = 'user' AND p.word_id = u.id AND u.lexeme_id IS NULL;
+            DELETE FROM user_words WHERE lexeme_id IS NULL;
+        END IF;
+
+        -- Старый ключ (user_id, english_word) различал регистр, поэтому после приведения
+        -- к нижнему регистру у пользователя могут быть две строки одной лексемы:
+        -- оставляем первую и переносим на неё прогресс остальных
+        CREATE TEMP TABLE user_words_duplicates AS
+        SELECT id, keep_id
+        FROM (
+            SELECT id, MIN(id) OVER (PARTITION BY user_id, lexeme_id) AS keep_id
+            FROM user_words
+        ) w
+        WHERE id <> keep_id;
+
+        INSERT INTO user_progress (user_id, word_id, word_type, added_at)
+        SELECT p.user_id, d.keep_id, p.word_type, p.added_at
+        FROM user_progress p
+        JOIN user_words_duplicates d ON d.id = p.word_id
+        WHERE p.word_type = 'user'
+        ORDER BY p.added_at
+        ON CONFLICT DO NOTHING;
+
+        DELETE FROM user_progress p
+        USING user_words_duplicates d
+        WHERE p.word_type = 'user' AND p.word_id = d.id;
+        DELETE FROM user_words u
+        USING user_words_duplicates d
+        WHERE u.id = d.id;
+        DROP TABLE user_words_duplicates;
+
+        ALTER TABLE user_words ALTER COLUMN lexeme_id SET NOT NULL;
+        ALTER TABLE user_words DROP COLUMN english_word;
+        ALTER TABLE user_words DROP COLUMN russian_translation;
+        ALTER TABLE user_words ADD CONSTRAINT user_words_user_id_lexeme_id_key UNIQUE (user_id, lexeme_id);
+    END IF;
+END $$;
+
+-- Таблицы user_progress и session_stats секционированы, см. partition_tables.sql
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS quiz_mode VARCHAR(10) NOT NULL DEFAULT 'en_ru';
+
+-- Изучаемая языковая пара пользователя: "изучаемый-родной"
+ALTER TABLE users ADD COLUMN IF NOT EXISTS lang_pair VARCHAR(7) NOT NULL DEFAULT 'en-ru';
+
+-- Открытые сессии: позволяют завершить сессии после остановки или падения бота
+CREATE TABLE IF NOT EXISTS open_sessions (
+    user_id INT PRIMARY KEY REFERENCES users(user_id),
+    session_start TIMESTAMP NOT NULL,
+    last_activity TIMESTAMP NOT NULL
+);
+
+-- Журнал ответов: только добавление, пишется пачками; BRIN-индекс по времени компактен
+CREATE TABLE IF NOT EXISTS answer_events (
+    answered_at TIMESTAMP NOT NULL,
+    user_id INT NOT NULL,
+    word_id INT NOT NULL,
+    word_type VARCHAR(10) NOT NULL,
+    mode VARCHAR(10) NOT NULL,
+    correct BOOLEAN NOT NULL,
+    answer TEXT
+);
+
+CREATE INDEX IF NOT EXISTS answer_events_answered_at_idx ON answer_events USING BRIN (answered_at);
+
+-- Счётчики сложности слов, обновляются инкрементально при записи пачки ответов
+CREATE TABLE IF NOT EXISTS word_difficulty (
+    word_type VARCHAR(10) NOT NULL,
+    word_id INT NOT NULL,
+    attempts INT NOT NULL DEFAULT 0,
+    wrong INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (word_type, word_id)
+);
+
+-- Какие неправильные варианты выбирают вместо правильного ответа (в каждой языковой паре)
+CREATE TABLE IF NOT EXISTS distractor_confusions (
+    source_lang VARCHAR(3) NOT NULL,
+    target_lang VARCHAR(3) NOT NULL,
+    correct_answer TEXT NOT NULL,
+    distractor TEXT NOT NULL,
+    picks INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (source_lang, target_lang, correct_answer, distractor)
+);
+
+-- Миграция: счётчики, собранные до разделения по парам, относятся к паре en-ru
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'distractor_confusions' AND column_name = 'source_lang'
+    ) THEN
+        ALTER TABLE distractor_confusions ADD COLUMN source_lang VARCHAR(3) NOT NULL DEFAULT 'en';
+        ALTER TABLE distractor_confusions ADD COLUMN target_lang VARCHAR(3) NOT NULL DEFAULT 'ru';
+        ALTER TABLE distractor_confusions ALTER COLUMN source_lang DROP DEFAULT;
+        ALTER TABLE distractor_confusions ALTER COLUMN target_lang DROP DEFAULT;
+        ALTER TABLE distractor_confusions DROP CONSTRAINT distractor_confusions_pkey;
+        ALTER TABLE distractor_confusions
+            ADD PRIMARY KEY (source_lang, target_lang, correct_answer, distractor);
+    END IF;
+END $$;
+
+-- Ежедневные напоминания: час по местному времени, смещение от UTC в минутах
+-- и время следующего напоминания (UTC). Частичный индекс содержит только подписчиков.
+ALTER TABLE users ADD COLUMN IF NOT EXISTS reminders_enabled BOOLEAN NOT NULL DEFAULT FALSE;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS reminder_hour SMALLINT;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS reminder_utc_offset SMALLINT;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS next_reminder_at TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS users_next_reminder_idx ON users (next_reminder_at) WHERE reminders_enabled;
+
+-- Классы: учитель публикует список слов, ученики изучают его; chat_id — групповой чат класса
+CREATE TABLE IF NOT EXISTS groups (
     id SERIAL PRIMARY KEY,
-    user_id INT REFERENCES users(user_id),
-    session_date TIMESTAMP NOT NULL,
-    learned_words INT NOT NULL,
-    session_duration INT NOT NULL
-);
\ No newline at end of file
+    owner_id INT NOT NULL REFERENCES users(user_id),
+    title VARCHAR(100) NOT NULL,
+    invite_code VARCHAR(16) NOT NULL UNIQUE,
+    lang_pair VARCHAR(7) NOT NULL DEFAULT 'en-ru',
+    chat_id BIGINT UNIQUE,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Участники класса; score — число изученных слов списка класса, поддерживается
+-- триггером на user_progress, поэтому таблица лидеров читается по индексу без подсчёта
+CREATE TABLE IF NOT EXISTS group_members (
+    group_id INT NOT NULL REFERENCES groups(id) ON DELETE CASCADE,
+    user_id INT NOT NULL REFERENCES users(user_id),
+    score INT NOT NULL DEFAULT 0,
+    joined_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (group_id, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS group_members_score_idx ON group_members (group_id, score DESC, user_id);
+CREATE INDEX IF NOT EXISTS group_members_user_idx ON group_members (user_id);
+
+-- Опубликованный список слов класса (ссылки на глобальный словарь)
+CREATE TABLE IF NOT EXISTS group_words (
+    group_id INT NOT NULL REFERENCES groups(id) ON DELETE CASCADE,
+    lexeme_id INT NOT NULL REFERENCES lexemes(id),
+    PRIMARY KEY (group_id, lexeme_id)
+);
+
+CREATE INDEX IF NOT EXISTS group_words_lexeme_idx ON group_words (lexeme_id);
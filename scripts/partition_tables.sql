@@ -0,0 +1,116 @@
+-- Секционированные таблицы прогресса и статистики сессий.
+-- Скрипт идемпотентен: существующие несекционированные таблицы переносятся в новые.
+
+-- Создание месячных секций session_stats в диапазоне [p_from, p_to).
+-- Строки этого диапазона, попавшие в секцию по умолчанию, переносятся в новую секцию.
+CREATE OR REPLACE FUNCTION ensure_session_stats_partitions(p_from DATE, p_to DATE)
+RETURNS VOID
+LANGUAGE plpgsql AS $$
+DECLARE
+    month_start DATE := date_trunc('month', p_from)::DATE;
+    month_end DATE;
+    partition_name TEXT;
+BEGIN
+    WHILE month_start < p_to LOOP
+        month_end := (month_start + INTERVAL '1 month')::DATE;
+        partition_name := format('session_stats_y%sm%s', to_char(month_start, 'YYYY'), to_char(month_start, 'MM'));
+
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I (LIKE session_stats INCLUDING DEFAULTS)', partition_name);
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM session_stats_default '
+                'WHERE session_date >= %L AND session_date < %L RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved',
+                month_start, month_end, partition_name
+            );
+            EXECUTE format(
+                'ALTER TABLE session_stats ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, month_end
+            );
+        END IF;
+
+        month_start := month_end;
+    END LOOP;
+END;
+$$;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'user_progress' AND relkind = 'r') THEN
+        ALTER TABLE user_progress RENAME TO user_progress_legacy;
+    END IF;
+    IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'session_stats' AND relkind = 'r') THEN
+        ALTER TABLE session_stats RENAME TO session_stats_legacy;
+    END IF;
+END $$;
+
+-- Прогресс: хэш-секционирование по пользователю, запросы с user_id читают одну секцию
+CREATE TABLE IF NOT EXISTS user_progress (
+    id BIGSERIAL,
+    user_id INT NOT NULL REFERENCES users(user_id),
+    word_id INT,
+    word_type VARCHAR(50),
+    added_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (user_id, id),
+    UNIQUE (user_id, word_id, word_type)
+) PARTITION BY HASH (user_id);
+
+CREATE TABLE IF NOT EXISTS user_progress_p0 PARTITION OF user_progress FOR VALUES WITH (MODULUS 8, REMAINDER 0);
+CREATE TABLE IF NOT EXISTS user_progress_p1 PARTITION OF user_progress FOR VALUES WITH (MODULUS 8, REMAINDER 1);
+CREATE TABLE IF NOT EXISTS user_progress_p2 PARTITION OF user_progress FOR VALUES WITH (MODULUS 8, REMAINDER 2);
+CREATE TABLE IF NOT EXISTS user_progress_p3 PARTITION OF user_progress FOR VALUES WITH (MODULUS 8, REMAINDER 3);
+CREATE TABLE IF NOT EXISTS user_progress_p4 PARTITION OF user_progress FOR VALUES WITH (MODULUS 8, REMAINDER 4);
+CREATE TABLE IF NOT EXISTS user_progress_p5 PARTITION OF user_progress FOR VALUES WITH (MODULUS 8, REMAINDER 5);
+CREATE TABLE IF NOT EXISTS user_progress_p6 PARTITION OF user_progress FOR VALUES WITH (MODULUS 8, REMAINDER 6);
+CREATE TABLE IF NOT EXISTS user_progress_p7 PARTITION OF user_progress FOR VALUES WITH (MODULUS 8, REMAINDER 7);
+
+CREATE INDEX IF NOT EXISTS user_progress_user_added_idx ON user_progress (user_id, added_at);
+
+-- Статистика сессий: месячные секции по дате сессии
+CREATE TABLE IF NOT EXISTS session_stats (
+    id BIGSERIAL,
+    user_id INT REFERENCES users(user_id),
+    session_date TIMESTAMP NOT NULL,
+    learned_words INT NOT NULL,
+    session_duration INT NOT NULL,
+    PRIMARY KEY (session_date, id)
+) PARTITION BY RANGE (session_date);
+
+CREATE TABLE IF NOT EXISTS session_stats_default PARTITION OF session_stats DEFAULT;
+
+CREATE INDEX IF NOT EXISTS session_stats_user_date_idx ON session_stats (user_id, session_date);
+
+-- Помесячные итоги по сессиям, вынесенным в архив
+CREATE TABLE IF NOT EXISTS session_stats_monthly (
+    user_id INT NOT NULL REFERENCES users(user_id),
+    month DATE NOT NULL,
+    sessions INT NOT NULL,
+    learned_words INT NOT NULL,
+    total_duration BIGINT NOT NULL,
+    PRIMARY KEY (user_id, month)
+);
+
+-- Перенос данных из несекционированных таблиц
+DO $$
+BEGIN
+    IF to_regclass('user_progress_legacy') IS NOT NULL THEN
+        INSERT INTO user_progress (user_id, word_id, word_type, added_at)
+        SELECT user_id, word_id, word_type, added_at
+        FROM user_progress_legacy
+        WHERE user_id IS NOT NULL
+        ON CONFLICT DO NOTHING;
+        DROP TABLE user_progress_legacy;
+    END IF;
+
+    IF to_regclass('session_stats_legacy') IS NOT NULL THEN
+        INSERT INTO session_stats (user_id, session_date, learned_words, session_duration)
+        SELECT user_id, session_date, learned_words, session_duration
+        FROM session_stats_legacy;
+        DROP TABLE session_stats_legacy;
+    END IF;
+
+    PERFORM ensure_session_stats_partitions(
+        LEAST((SELECT MIN(session_date) FROM session_stats_default), NOW())::DATE,
+        (date_trunc('month', NOW()) + INTERVAL '2 months')::DATE
+    );
+END $$;
@@ -10,4 +10,4 @@ VALUES
 ('black', 'черный'),
 ('they', 'они'),
 ('it', 'оно')
-ON CONFLICT (LOWER(english_word), LOWER(russian_translation)) DO NOTHING;
\ No newline at end of file
+ON CONFLICT (source_lang, target_lang, LOWER(english_word), LOWER(russian_translation)) DO NOTHING;
\ No newline at end of file
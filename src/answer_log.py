@@ -0,0 +1,90 @@
+import logging
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+from telegram.ext import CallbackContext
+
+from src import db
+from src.config import DEFAULT_LANG_PAIR
+from src.languages import split_pair
+from src.quiz import MODE_EN_RU
+
+logger = logging.getLogger(__name__)
+
+# Журнал в памяти сбрасывается сразу, если накопилось столько ответов
+FLUSH_BATCH_SIZE = 500
+# Предел буфера: при недоступной БД самые старые ответы отбрасываются
+MAX_PENDING = 20000
+
+
+class AnswerLog:
+    """Буфер ответов в памяти, который записывается в БД пачками.
+
+    Запись ответа в обработчике — только добавление в список; БД получает
+    одну вставку на пачку (из задачи job_queue, при переполнении и при
+    остановке бота).
+    """
+
+    def __init__(self, database=db, batch_size: int = FLUSH_BATCH_SIZE, max_pending: int = MAX_PENDING):
+        self.db = database
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._events: List[tuple] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def record(self, user_id: int, question: dict, correct: bool, answer: Optional[str] = None):
+        """Добавляет ответ на вопрос в буфер."""
+        source_lang, target_lang = split_pair(question.get("pair", DEFAULT_LANG_PAIR))
+        event = (
+            datetime.now(),
+            user_id,
+            question["word_id"],
+            question["word_type"],
+            question.get("mode", MODE_EN_RU),
+            correct,
+            None if correct else answer,
+            question["correct_answer"],
+            source_lang,
+            target_lang,
+        )
+        with self._lock:
+            self._events.append(event)
+            full = len(self._events) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        """Записывает накопленные ответы одной пачкой. Возвращает число записанных."""
+        with self._flush_lock:
+            with self._lock:
+                events, self._events = self._events, []
+            if not events:
+                return 0
+            # Запись идёт из задачи job_queue и при остановке: на соединении из пула
+            with self.db.pooled():
+                written = self.db.record_answer_events(events)
+            if written:
+                return len(events)
+
+            # Запись не удалась: ответы возвращаются в буфер до следующей попытки
+            with self._lock:
+                self._events = (events + self._events)[-self.max_pending:]
+            return 0
+
+
+answer_log = AnswerLog()
+
+
+def flush_answer_log(context: CallbackContext = None):
+    """Периодическая задача job_queue (и вызов при остановке): сброс журнала ответов."""
+    try:
+        written = answer_log.flush()
+        if written:
+            logger.debug(f"Записано ответов: {written}")
+    except Exception as e:
+        logger.error(f"Ошибка записи журнала ответов: {e}")
@@ -0,0 +1,92 @@
+import unicodedata
+from typing import Tuple
+
+# Таблица нормализации строится один раз: 'ё' -> 'е', дефисы, пробелы,
+# апострофы и знаки препинания удаляются. Проверка ответа — один проход по строке.
+_NORMALIZATION_TABLE = str.maketrans(
+    {
+        "ё": "е",
+        "Ё": "е",
+        "’": None,
+        "'": None,
+        "`": None,
+        "-": None,
+        "‑": None,
+        "–": None,
+        "—": None,
+        " ": None,
+        ".": None,
+        ",": None,
+        "!": None,
+        "?": None,
+        " ": None,
+    }
+)
+
+
+def normalize_answer(text: str) -> str:
+    """Приводит ответ к каноническому виду для сравнения."""
+    return unicodedata.normalize("NFC", text).translate(_NORMALIZATION_TABLE).lower()
+
+
+def allowed_typos(length: int) -> int:
+    """Допустимое число опечаток в зависимости от длины слова."""
+    if length <= 3:
+        return 0
+    if length <= 7:
+        return 1
+    return 2
+
+
+def within_distance(a: str, b: str, limit: int) -> bool:
+    """Проверяет, что расстояние Дамерау–Левенштейна (OSA) между a и b не больше limit.
+
+    Хранится только полоса шириной 2*limit+1 вокруг диагонали: ячейка (i, j)
+    лежит в строке по смещению j - i + limit. Поэтому и время, и память —
+    O(len * limit), а при заведомо большом расстоянии выход ранний.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return False
+    if limit == 0:
+        return a == b
+
+    big = limit + 1
+    width = 2 * limit + 1
+    previous2 = None
+    # Строка 0: расстояние от пустой строки до первых j символов b
+    previous = [k - limit if limit <= k <= limit + len(b) else big for k in range(width)]
+    for i in range(1, len(a) + 1):
+        current = [big] * width
+        row_min = big
+        for k in range(width):
+            j = i + k - limit
+            if j < 0 or j > len(b):
+                continue
+            if j == 0:
+                value = i
+            else:
+                cost = 0 if a[i - 1] == b[j - 1] else 1
+                value = previous[k] + cost
+                if k + 1 < width:
+                    value = min(value, previous[k + 1] + 1)
+                if k > 0:
+                    value = min(value, current[k - 1] + 1)
+                if previous2 is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                    value = min(value, previous2[k] + 1)
+            current[k] = min(value, big)
+            row_min = min(row_min, current[k])
+        if row_min > limit:
+            return False
+        previous2, previous = previous, current
+    return previous[len(b) - len(a) + limit] <= limit
+
+
+def match_answer(user_answer: str, expected: str) -> Tuple[bool, bool]:
+    """Сравнивает ответ пользователя с ожидаемым (уже нормализованным).
+
+    Возвращает пару (засчитан, точное совпадение).
+    """
+    given = normalize_answer(user_answer)
+    if given == expected:
+        return True, True
+    return within_distance(given, expected, allowed_typos(len(expected))), False
@@ -0,0 +1,161 @@
+import logging
+import shutil
+import subprocess
+import threading
+import time
+from typing import Iterable, Iterator, Optional
+
+from src.config import AUDIO_MAX_BYTES, AUDIO_TRANSCODE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+FFMPEG = shutil.which("ffmpeg")
+
+# Обрезка тишины в начале и (через разворот) в конце, выравнивание громкости по EBU R128
+VOICE_FILTER = (
+    "silenceremove=start_periods=1:start_threshold=-50dB,"
+    "areverse,silenceremove=start_periods=1:start_threshold=-50dB,areverse,"
+    "loudnorm=I=-16:TP=-1.5:LRA=11"
+)
+
+# Параметры, совместимые с голосовыми сообщениями Telegram: моно OGG/Opus 48 кГц
+VOICE_ARGS = ["-c:a", "libopus", "-b:a", "32k", "-ar", "48000", "-ac", "1", "-f", "ogg"]
+
+READ_CHUNK_SIZE = 16 * 1024
+
+
+class AudioTooLarge(Exception):
+    """Аудио превысило допустимый размер."""
+
+
+def available() -> bool:
+    """Установлен ли ffmpeg."""
+    return FFMPEG is not None
+
+
+def _feed(process: subprocess.Popen, chunks: Iterable[bytes], max_bytes: int, errors: list):
+    """Поток-поставщик: пишет входные фрагменты в stdin ffmpeg по мере поступления."""
+    total = 0
+    try:
+        for chunk in chunks:
+            total += len(chunk)
+            if total > max_bytes:
+                raise AudioTooLarge(f"входное аудио больше {max_bytes} байт")
+            process.stdin.write(chunk)
+    except BrokenPipeError:
+        pass
+    except Exception as e:
+        errors.append(e)
+    finally:
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+
+
+def transcode_to_voice(
+    chunks: Iterable[bytes],
+    max_bytes: int = AUDIO_MAX_BYTES,
+    timeout: float = AUDIO_TRANSCODE_TIMEOUT,
+) -> Optional[bytes]:
+    """Перекодирует поток аудиофрагментов в голосовое сообщение OGG/Opus.
+
+    Вход передаётся в ffmpeg отдельным потоком по мере загрузки, выход
+    читается фрагментами; ни вход, ни выход не превышают `max_bytes`,
+    временные файлы не создаются. Возвращает None при ошибке.
+    """
+    process = subprocess.Popen(
+        [FFMPEG, "-hide_banner", "-loglevel", "error", "-i", "pipe:0", "-af", VOICE_FILTER, *VOICE_ARGS, "pipe:1"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    errors = []
+    feeder = threading.Thread(target=_feed, args=(process, chunks, max_bytes, errors), daemon=True)
+    feeder.start()
+
+    # Тайм-аут на случай зависшего источника: процесс завершается принудительно
+    timer = threading.Timer(timeout, process.kill)
+    timer.start()
+    started = time.monotonic()
+    output = bytearray()
+    try:
+        while True:
+            chunk = process.stdout.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            output += chunk
+            if len(output) > max_bytes:
+                raise AudioTooLarge(f"результат больше {max_bytes} байт")
+        returncode = process.wait()
+        feeder.join(timeout=1)
+    except AudioTooLarge as e:
+        process.kill()
+        logger.error(f"Ошибка перекодирования аудио: {e}")
+        return None
+    finally:
+        timer.cancel()
+        process.stdout.close()
+
+    if errors:
+        logger.error(f"Ошибка чтения исходного аудио: {errors[0]}")
+        return None
+    if returncode != 0:
+        elapsed = time.monotonic() - started
+        reason = "тайм-аут" if elapsed >= timeout else f"код {returncode}"
+        logger.error(f"ffmpeg завершился с ошибкой ({reason})")
+        return None
+    return bytes(output) or None
+
+
+def decode_to_pcm(
+    chunks: Iterable[bytes],
+    sample_rate: int = 16000,
+    max_bytes: int = AUDIO_MAX_BYTES,
+    timeout: float = AUDIO_TRANSCODE_TIMEOUT,
+) -> Iterator[bytes]:
+    """Декодирует аудио в PCM (16 бит, моно) и отдаёт его фрагментами по мере готовности.
+
+    Используется для распознавания речи: распознаватель получает звук, пока
+    ffmpeg ещё декодирует. При ошибке или тайм-ауте выбрасывает исключение.
+    """
+    process = subprocess.Popen(
+        [FFMPEG, "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+         "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "pipe:1"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    errors = []
+    feeder = threading.Thread(target=_feed, args=(process, chunks, max_bytes, errors), daemon=True)
+    feeder.start()
+    timer = threading.Timer(timeout, process.kill)
+    timer.start()
+    try:
+        while True:
+            chunk = process.stdout.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+        returncode = process.wait()
+        feeder.join(timeout=1)
+        if errors:
+            raise errors[0]
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg завершился с кодом {returncode}")
+    finally:
+        timer.cancel()
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+
+
+def collect(chunks: Iterable[bytes], max_bytes: int = AUDIO_MAX_BYTES) -> Optional[bytes]:
+    """Собирает фрагменты без перекодирования (если ffmpeg не установлен)."""
+    output = bytearray()
+    for chunk in chunks:
+        output += chunk
+        if len(output) > max_bytes:
+            logger.error(f"Аудио больше {max_bytes} байт")
+            return None
+    return bytes(output) or None
@@ -14,3 +14,83 @@ DB_CONFIG = {
     "password": os.getenv("DB_PASSWORD"),
     "host": os.getenv("DB_HOST"),
 }
+
+# Соединения для фоновой работы (run_async-обработчики, задачи, фоновые потоки):
+# у основного потока обработки обновлений своё соединение
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+
+# Порог (мс), после которого запрос попадает в журнал медленных запросов
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# Как часто (с) собирать план EXPLAIN для одного и того же медленного запроса
+SLOW_QUERY_EXPLAIN_SECONDS = float(os.getenv("SLOW_QUERY_EXPLAIN_SECONDS", "600"))
+
+# ID администраторов бота (через запятую)
+ADMIN_IDS = {int(i) for i in os.getenv("ADMIN_IDS", "").split(",") if i.strip()}
+
+# Сложность неправильных вариантов ответа: 1 — лёгкая, 2 — средняя, 3 — сложная
+DISTRACTOR_DIFFICULTY = int(os.getenv("DISTRACTOR_DIFFICULTY", "2"))
+
+# Хранение статистики сессий: число месяцев в «горячей» таблице и каталог архива
+SESSION_RETENTION_MONTHS = int(os.getenv("SESSION_RETENTION_MONTHS", "6"))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+
+# Языковая пара по умолчанию: "изучаемый-родной" (английский для русскоязычных)
+DEFAULT_LANG_PAIR = os.getenv("DEFAULT_LANG_PAIR", "en-ru")
+
+# Лемматизация: размер LRU-кэша лемм в памяти и сколько слов обрабатывать за раз при заполнении лемм
+LEMMA_CACHE_SIZE = int(os.getenv("LEMMA_CACHE_SIZE", "4096"))
+LEMMA_BACKFILL_BATCH = int(os.getenv("LEMMA_BACKFILL_BATCH", "1000"))
+
+# Сколько готовых вопросов держать в буфере предзагрузки для каждого пользователя
+QUIZ_PREFETCH_SIZE = int(os.getenv("QUIZ_PREFETCH_SIZE", "3"))
+
+# Сколько участников класса показывать в таблице лидеров
+LEADERBOARD_SIZE = int(os.getenv("LEADERBOARD_SIZE", "10"))
+
+# Inline-режим: результатов на страницу, время кэширования ответа (с), сколько индексов
+# слов пользователей держать в памяти, минимальная длина запроса к Яндекс.Словарю
+# при промахе, размер кэша уже запрошенных слов и период (с) перестроения каталогов пар
+INLINE_PAGE_SIZE = min(int(os.getenv("INLINE_PAGE_SIZE", "20")), 50)
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "300"))
+INLINE_USER_CACHE_SIZE = int(os.getenv("INLINE_USER_CACHE_SIZE", "1000"))
+INLINE_LOOKUP_MIN_LENGTH = int(os.getenv("INLINE_LOOKUP_MIN_LENGTH", "3"))
+INLINE_LOOKUP_CACHE_SIZE = int(os.getenv("INLINE_LOOKUP_CACHE_SIZE", "10000"))
+INLINE_CATALOG_REFRESH_SECONDS = int(os.getenv("INLINE_CATALOG_REFRESH_SECONDS", "600"))
+
+# Период (в секундах) записи журнала ответов в БД
+ANSWER_LOG_FLUSH_SECONDS = int(os.getenv("ANSWER_LOG_FLUSH_SECONDS", "10"))
+
+# Ежедневные напоминания: период тика рассылки (с), размер пачки, скорость отправки
+# (сообщений в секунду), смещение от UTC по умолчанию (мин) и предел опоздания (ч)
+REMINDER_TICK_SECONDS = int(os.getenv("REMINDER_TICK_SECONDS", "60"))
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "100"))
+REMINDER_RATE_PER_SECOND = float(os.getenv("REMINDER_RATE_PER_SECOND", "25"))
+REMINDER_DEFAULT_UTC_OFFSET = int(os.getenv("REMINDER_DEFAULT_UTC_OFFSET", "180"))
+REMINDER_MAX_DELAY_HOURS = int(os.getenv("REMINDER_MAX_DELAY_HOURS", "3"))
+
+# Синтез речи: движки в порядке приоритета, бюджет задержки (мс), пауза после
+# сбоя (с), тайм-аут облачного движка (с), размер кэша аудио (МБ) и голос espeak
+SPEECH_BACKENDS = os.getenv("SPEECH_BACKENDS", "sber,espeak")
+SPEECH_LATENCY_BUDGET_MS = float(os.getenv("SPEECH_LATENCY_BUDGET_MS", "1500"))
+SPEECH_FAILURE_COOLDOWN = float(os.getenv("SPEECH_FAILURE_COOLDOWN", "60"))
+SPEECH_REMOTE_TIMEOUT = float(os.getenv("SPEECH_REMOTE_TIMEOUT", "5"))
+SPEECH_CACHE_MB = int(os.getenv("SPEECH_CACHE_MB", "32"))
+ESPEAK_VOICE = os.getenv("ESPEAK_VOICE", "en-us")
+
+# Перекодирование аудио (ffmpeg): предельный размер входа и выхода (байт) и тайм-аут (с)
+AUDIO_MAX_BYTES = int(os.getenv("AUDIO_MAX_BYTES", str(2 * 1024 * 1024)))
+AUDIO_TRANSCODE_TIMEOUT = float(os.getenv("AUDIO_TRANSCODE_TIMEOUT", "10"))
+
+# Токен SberSpeech: файл общего кэша для нескольких процессов (пусто — только в памяти)
+# и за сколько секунд до истечения токен обновляется заранее
+SBER_TOKEN_CACHE = os.getenv("SBER_TOKEN_CACHE", "")
+SBER_TOKEN_REFRESH_MARGIN = float(os.getenv("SBER_TOKEN_REFRESH_MARGIN", "120"))
+
+# Распознавание голосовых ответов: движок (vosk или stub), путь к модели Vosk,
+# число потоков, бюджет времени (с), размер кэша результатов и предельная длина сообщения (с)
+ASR_BACKEND = os.getenv("ASR_BACKEND", "vosk")
+VOSK_MODEL_PATH = os.getenv("VOSK_MODEL_PATH", "models/vosk-model-small-en-us-0.15")
+ASR_WORKERS = int(os.getenv("ASR_WORKERS", "2"))
+ASR_TIMEOUT = float(os.getenv("ASR_TIMEOUT", "8"))
+ASR_CACHE_SIZE = int(os.getenv("ASR_CACHE_SIZE", "256"))
+VOICE_MAX_SECONDS = int(os.getenv("VOICE_MAX_SECONDS", "15"))
@@ -1,36 +1,209 @@
-from datetime import datetime
+import csv
+from contextlib import contextmanager
+from datetime import date, datetime
+import gzip
+import io
 import logging
 from pathlib import Path
-from typing import List, Tuple, Optional
+import threading
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional
 
 import psycopg2
+from psycopg2 import extensions, sql
+from psycopg2.pool import ThreadedConnectionPool
 
-from src.config import DB_CONFIG
+from src.config import DB_CONFIG, DB_POOL_SIZE, DEFAULT_LANG_PAIR, SLOW_QUERY_EXPLAIN_SECONDS, SLOW_QUERY_MS
+from src.languages import split_pair
+from src.query_profiler import QueryProfiler, monotonic_ms
 
 # Настройка логгера
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Разделы экспорта данных пользователя: колонки и запрос (параметр user_id)
+EXPORT_SECTIONS = {
+    "words": (
+        ("english_word", "russian_translation", "learned"),
+        """
+        SELECT l.english_word, l.russian_translation,
+               EXISTS (
+                   SELECT 1 FROM user_progress p
+                   WHERE p.user_id = u.user_id AND p.word_type = 'user' AND p.word_id = u.id
+               )
+        FROM user_words u
+        JOIN lexemes l ON l.id = u.lexeme_id
+        WHERE u.user_id = %(user_id)s
+        ORDER BY u.id
+        """,
+    ),
+    "progress": (
+        ("word_type", "english_word", "russian_translation", "added_at"),
+        """
+        SELECT p.word_type,
+               COALESCE(c.english_word, l.english_word),
+               COALESCE(c.russian_translation, l.russian_translation),
+               p.added_at
+        FROM user_progress p
+        LEFT JOIN common_words c ON p.word_type = 'common' AND c.id = p.word_id
+        LEFT JOIN user_words u ON p.word_type = 'user' AND u.id = p.word_id
+        LEFT JOIN lexemes l ON l.id = u.lexeme_id
+        WHERE p.user_id = %(user_id)s
+        ORDER BY p.added_at
+        """,
+    ),
+    "sessions": (
+        ("session_date", "sessions", "learned_words", "session_duration"),
+        """
+        SELECT session_date, 1, learned_words, session_duration
+        FROM session_stats
+        WHERE user_id = %(user_id)s
+        UNION ALL
+        SELECT month::TIMESTAMP, sessions, learned_words, total_duration
+        FROM session_stats_monthly
+        WHERE user_id = %(user_id)s
+        ORDER BY 1
+        """,
+    ),
+}
+
+# Tables whose words carry english_lemma / translation_lemma columns
+LEMMA_TABLES = ("common_words", "lexemes")
+
+
+class PooledConnection(extensions.connection):
+    """Pool connection that remembers whether the hot statements are prepared on it."""
+
+    statements_prepared = False
+
 
 class Database:
     def __init__(self):
         self.base_dir = Path(__file__).resolve().parent.parent
+        self.profiler = QueryProfiler(slow_query_ms=SLOW_QUERY_MS, explain_interval=SLOW_QUERY_EXPLAIN_SECONDS)
+        self._indexed_pairs = set()
+        self._index_lock = threading.Lock()
+        self._local = threading.local()
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._pool_slots = threading.BoundedSemaphore(DB_POOL_SIZE)
         try:
-            self.conn = psycopg2.connect(**DB_CONFIG)
-            self.cur = self.conn.cursor()
+            self._conn = psycopg2.connect(**DB_CONFIG)
+            self._cur = self._conn.cursor()
             self._create_tables()
+            self.ensure_lang_pair(DEFAULT_LANG_PAIR)
+            self._create_functions()
             self._seed_data()
+            self._prepare_statements()
             logger.info("Database initialized successfully.")
         except Exception as e:
             logger.error(f"Error connecting to the database: {e}")
             raise
 
+    @property
+    def conn(self):
+        """Connection of the current thread: a pooled one inside `pooled()`, otherwise the main one."""
+        conn = getattr(self._local, "conn", None)
+        return conn if conn is not None else self._conn
+
+    @property
+    def cur(self):
+        """Default cursor of the current thread's connection."""
+        cur = getattr(self._local, "cur", None)
+        return cur if cur is not None else self._cur
+
+    def _get_pool(self) -> ThreadedConnectionPool:
+        """Create the background connection pool on first use."""
+        with self._pool_lock:
+            if self._pool is None:
+                # minconn = maxconn: returned connections stay open together with their prepared statements
+                self._pool = ThreadedConnectionPool(
+                    DB_POOL_SIZE, DB_POOL_SIZE, connection_factory=PooledConnection, **DB_CONFIG
+                )
+            return self._pool
+
+    @contextmanager
+    def pooled(self):
+        """Run the queries of a block on a pooled connection of its own.
+
+        The main connection belongs to the dispatcher thread. psycopg2
+        connections must not be shared between threads, and a commit or
+        rollback on a shared connection would also end the dispatcher's
+        transaction, so background work (run_async handlers, jobs, worker
+        threads) runs inside this context: every method called in it uses
+        the pooled connection. Nested blocks reuse the outer connection;
+        when the pool is exhausted the block waits for a free connection.
+        Can also be used as a decorator.
+        """
+        if getattr(self._local, "conn", None) is not None:
+            yield self._local.conn
+            return
+        with self._pool_slots:
+            pool = self._get_pool()
+            conn = pool.getconn()
+            self._local.conn, self._local.cur = conn, conn.cursor()
+            try:
+                if not conn.statements_prepared:
+                    conn.statements_prepared = self._prepare_statements()
+                yield conn
+            finally:
+                self._local.cur.close()
+                self._local.conn = self._local.cur = None
+                # The pool rolls back whatever the block left uncommitted
+                pool.putconn(conn)
+
+    def execute(self, query: str, params: Optional[tuple] = None, cursor=None):
+        """Execute a query through the profiler and return the cursor.
+
+        This is the single execution chokepoint: every query is timed,
+        fingerprinted and, if slower than the threshold, logged together
+        with its EXPLAIN plan (at most once per fingerprint and interval).
+        """
+        cur = cursor or self.cur
+        started = monotonic_ms()
+        cur.execute(query, params)
+        duration_ms = monotonic_ms() - started
+
+        key = self.profiler.record(query, duration_ms, cur.rowcount)
+        if self.profiler.is_slow(duration_ms):
+            plan = None
+            if self.profiler.is_explainable(query) and self.profiler.should_explain(key):
+                plan = self._explain(query, params)
+            self.profiler.log_slow(key, duration_ms, cur.rowcount, plan)
+        return cur
+
+    def _explain(self, query: str, params: Optional[tuple]) -> Optional[List[str]]:
+        """Collect the EXPLAIN plan of a slow query.
+
+        Plain EXPLAIN only plans the statement, so data-modifying queries
+        are never run a second time. The plan is taken on a spare pooled
+        connection, never on the caller's one, so a failing EXPLAIN cannot
+        abort the caller's transaction. If no connection is free right
+        away, the plan is skipped rather than waited for.
+        """
+        if not self._pool_slots.acquire(blocking=False):
+            return None
+        try:
+            pool = self._get_pool()
+            conn = pool.getconn()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("EXPLAIN " + query, params)
+                    return [row[0] for row in cur.fetchall()]
+            finally:
+                conn.rollback()
+                pool.putconn(conn)
+        except Exception as e:
+            logger.warning(f"Could not explain slow query: {e}")
+            return None
+        finally:
+            self._pool_slots.release()
+
     def _execute_sql_script(self, script_path: str):
         """Execute an SQL script from a file."""
         try:
             with open(script_path, "r", encoding="utf-8") as f:
                 sql = f.read()
-            self.cur.execute(sql)
+            self.execute(sql)
             self.conn.commit()
             logger.info(f"Executed SQL script: {script_path}")
         except Exception as e:
@@ -40,6 +213,104 @@ class Database:
     def _create_tables(self):
         """Create tables if they do not exist."""
         self._execute_sql_script(str(self.base_dir / "scripts/create_tables.sql"))
+        self._execute_sql_script(str(self.base_dir / "scripts/partition_tables.sql"))
+        self._execute_sql_script(str(self.base_dir / "scripts/analytics_views.sql"))
+
+    def _create_functions(self):
+        """Create or replace server-side SQL functions."""
+        self._execute_sql_script(str(self.base_dir / "scripts/create_functions.sql"))
+
+    def has_pair_indexes(self, pair: str) -> bool:
+        """Whether the partial indexes of a language pair were built by this process."""
+        return pair in self._indexed_pairs
+
+    def ensure_lang_pair(self, pair: str):
+        """Create the partial indexes serving lookups within one language pair.
+
+        Lookups issued from Python pass the pair as literal parameters, so
+        the planner can use indexes restricted to that pair; they stay small
+        and cover only the catalog a user actually studies. Indexes are
+        created once per pair and process, with CREATE INDEX CONCURRENTLY so
+        a pair picked with /lang does not block writes to the catalog. That
+        cannot run inside a transaction, so it uses a pooled connection in
+        autocommit mode; invalid leftovers of an interrupted build are
+        dropped first. Builds are serialized, so two users switching to the
+        same pair do not race on the same index names; the bot calls this
+        from a job_queue job, and lookups fall back to the composite
+        indexes until it finishes.
+        """
+        with self._index_lock:
+            if pair not in self._indexed_pairs:
+                self._build_pair_indexes(pair)
+
+    def _build_pair_indexes(self, pair: str):
+        """Build the partial indexes of one pair on an autocommit pooled connection."""
+        source_lang, target_lang = split_pair(pair)
+        predicate = sql.SQL("WHERE source_lang = {} AND target_lang = {}").format(
+            sql.Literal(source_lang), sql.Literal(target_lang)
+        )
+        indexes = (
+            ("common_words_{}_{}_rank_idx", "common_words", sql.SQL("(frequency_rank)")),
+            ("common_words_{}_{}_translation_idx", "common_words", sql.SQL("(LOWER(russian_translation))")),
+            ("common_words_{}_{}_lemma_idx", "common_words", sql.SQL("(english_lemma)")),
+            ("common_words_{}_{}_translation_lemma_idx", "common_words", sql.SQL("(translation_lemma)")),
+            ("lexemes_{}_{}_translation_idx", "lexemes", sql.SQL("(russian_translation)")),
+            ("lexemes_{}_{}_lemma_idx", "lexemes", sql.SQL("(english_lemma)")),
+            ("lexemes_{}_{}_translation_lemma_idx", "lexemes", sql.SQL("(translation_lemma)")),
+        )
+        names = [name.format(source_lang, target_lang) for name, _, _ in indexes]
+        with self._pool_slots:
+            pool = self._get_pool()
+            conn = pool.getconn()
+            conn.autocommit = True
+            try:
+                with conn.cursor() as cur:
+                    self.execute(
+                        """
+                        SELECT c.relname
+                        FROM pg_index i
+                        JOIN pg_class c ON c.oid = i.indexrelid
+                        WHERE NOT i.indisvalid AND c.relname = ANY(%s)
+                        """,
+                        (names,),
+                        cursor=cur,
+                    )
+                    for (invalid,) in cur.fetchall():
+                        self.execute(
+                            sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(invalid)).as_string(conn),
+                            cursor=cur,
+                        )
+                    for name, (_, table, columns) in zip(names, indexes):
+                        self.execute(
+                            sql.SQL("CREATE INDEX CONCURRENTLY IF NOT EXISTS {} ON {} {} {}")
+                            .format(sql.Identifier(name), sql.Identifier(table), columns, predicate)
+                            .as_string(conn),
+                            cursor=cur,
+                        )
+                self._indexed_pairs.add(pair)
+            except Exception as e:
+                logger.error(f"Error creating indexes for pair {pair}: {e}")
+            finally:
+                conn.autocommit = False
+                pool.putconn(conn)
+
+    def _prepare_statements(self) -> bool:
+        """Prepare hot quiz statements once per connection."""
+        try:
+            self.execute(
+                "PREPARE question_batch (INT, INT, INT, BOOLEAN, TEXT[]) AS "
+                "SELECT * FROM question_batch($1, $2, $3, $4, $5)"
+            )
+            self.execute(
+                "PREPARE record_answer (INT, INT, TEXT, TIMESTAMP, TIMESTAMP, INT, BOOLEAN, INT, TEXT[]) AS "
+                "SELECT * FROM record_answer_and_next($1, $2, $3, $4, $5, $6, $7, $8, $9)"
+            )
+            self.conn.commit()
+            return True
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error preparing statements: {e}")
+            return False
 
     def _seed_data(self):
         """Seed initial data into the common_words table if it is empty."""
@@ -47,13 +318,13 @@ class Database:
 
     def get_user(self, user_id: int) -> Optional[Tuple]:
         """Retrieve a user by their ID."""
-        self.cur.execute("SELECT * FROM users WHERE user_id = %s", (user_id,))
+        self.execute("SELECT * FROM users WHERE user_id = %s", (user_id,))
         return self.cur.fetchone()
 
     def create_user(self, user_id: int, username: str, first_name: str):
         """Create a new user."""
         try:
-            self.cur.execute(
+            self.execute(
                 "INSERT INTO users (user_id, username, first_name) VALUES (%s, %s, %s)",
                 (user_id, username, first_name),
             )
@@ -61,54 +332,290 @@ class Database:
         except psycopg2.IntegrityError:
             self.conn.rollback()
 
-    def get_random_word(self, user_id: int) -> Optional[Tuple[str, str]]:
-        """Retrieve a random word for the user."""
+    def get_quiz_mode(self, user_id: int) -> str:
+        """Retrieve the user's preferred quiz mode."""
+        try:
+            self.execute("SELECT quiz_mode FROM users WHERE user_id = %s", (user_id,))
+            row = self.cur.fetchone()
+            return row[0] if row else "en_ru"
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error in get_quiz_mode: {e}")
+            return "en_ru"
+
+    def set_quiz_mode(self, user_id: int, mode: str):
+        """Save the user's preferred quiz mode."""
         try:
-            self.cur.execute(
+            self.execute("UPDATE users SET quiz_mode = %s WHERE user_id = %s", (mode, user_id))
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error in set_quiz_mode: {e}")
+
+    def get_lang_pair(self, user_id: int) -> str:
+        """Retrieve the language pair the user studies ('en-ru')."""
+        try:
+            self.execute("SELECT lang_pair FROM users WHERE user_id = %s", (user_id,))
+            row = self.cur.fetchone()
+            return row[0] if row else DEFAULT_LANG_PAIR
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error in get_lang_pair: {e}")
+            return DEFAULT_LANG_PAIR
+
+    def set_lang_pair(self, user_id: int, pair: str):
+        """Save the language pair the user studies."""
+        try:
+            self.execute("UPDATE users SET lang_pair = %s WHERE user_id = %s", (pair, user_id))
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error in set_lang_pair: {e}")
+
+    def set_reminder(self, user_id: int, hour: int, utc_offset: int, next_reminder_at: datetime):
+        """Enable daily reminders at `hour` local time (UTC offset in minutes)."""
+        try:
+            self.execute(
                 """
-                SELECT english_word, russian_translation FROM (
-                    SELECT english_word, russian_translation FROM common_words
-                    UNION ALL
-                    SELECT english_word, russian_translation FROM user_words 
-                    WHERE user_id = %s
-                ) AS all_words
-                ORDER BY RANDOM()
-                LIMIT 1;
+                UPDATE users
+                SET reminders_enabled = TRUE, reminder_hour = %s, reminder_utc_offset = %s, next_reminder_at = %s
+                WHERE user_id = %s
                 """,
-                (user_id,),
+                (hour, utc_offset, next_reminder_at, user_id),
             )
-            return self.cur.fetchone()
+            self.conn.commit()
         except Exception as e:
-            logger.error(f"Error in get_random_word: {e}")
-            return None
+            self.conn.rollback()
+            logger.error(f"Error in set_reminder: {e}")
+
+    def disable_reminders(self, user_ids: List[int]):
+        """Turn daily reminders off for the given users."""
+        try:
+            self.execute(
+                "UPDATE users SET reminders_enabled = FALSE, next_reminder_at = NULL WHERE user_id = ANY(%s)",
+                (list(user_ids),),
+            )
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error in disable_reminders: {e}")
+
+    def postpone_reminders(self, user_ids: List[int], retry_at: datetime):
+        """Put claimed but unsent reminders back in the queue until `retry_at` (UTC)."""
+        try:
+            self.execute(
+                "UPDATE users SET next_reminder_at = %s WHERE user_id = ANY(%s) AND reminders_enabled",
+                (retry_at, list(user_ids)),
+            )
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error in postpone_reminders: {e}")
+
+    def claim_due_reminders(self, now_utc: datetime, limit: int) -> List[Tuple[int, datetime, int]]:
+        """Claim up to `limit` due reminders and move them to their next occurrence.
+
+        Due users are picked through the partial index in next_reminder_at
+        order with FOR UPDATE SKIP LOCKED, so concurrent ticks never claim
+        the same user, and a restart resumes with whoever is still due.
+        The next occurrence is computed from reminder_hour, so reminders
+        missed for several days or postponed by postpone_reminders advance
+        straight to the next future slot without drifting. Users with an
+        open quiz session are not claimed and stay due until it ends.
+        Due words are counted in the user's language pair only.
+        Returns (user_id, due_at, due_words) tuples.
+        """
+        try:
+            with self.conn.cursor() as cur:
+                self.execute(
+                    """
+                    WITH due AS (
+                        SELECT u.user_id, u.next_reminder_at,
+                               DATE_TRUNC('day', %(now)s::TIMESTAMP)
+                                   + (u.reminder_hour * 60 - u.reminder_utc_offset) * INTERVAL '1 minute' AS slot,
+                               split_part(u.lang_pair, '-', 1) AS source_lang,
+                               split_part(u.lang_pair, '-', 2) AS target_lang
+                        FROM users u
+                        WHERE u.reminders_enabled AND u.next_reminder_at <= %(now)s
+                            AND NOT EXISTS (SELECT 1 FROM open_sessions o WHERE o.user_id = u.user_id)
+                        ORDER BY u.next_reminder_at
+                        LIMIT %(limit)s
+                        FOR UPDATE SKIP LOCKED
+                    ), claimed AS (
+                        UPDATE users u
+                        SET next_reminder_at = d.slot
+                            + (FLOOR(EXTRACT(EPOCH FROM %(now)s - d.slot) / 86400) + 1) * INTERVAL '1 day'
+                        FROM due d
+                        WHERE u.user_id = d.user_id
+                        RETURNING u.user_id, d.next_reminder_at AS due_at, d.source_lang, d.target_lang
+                    )
+                    SELECT c.user_id,
+                           c.due_at,
+                           GREATEST(
+                               (SELECT COUNT(*) FROM common_words cw
+                                WHERE cw.source_lang = c.source_lang AND cw.target_lang = c.target_lang)
+                               + (SELECT COUNT(*) FROM user_words w
+                                  JOIN lexemes l ON l.id = w.lexeme_id
+                                  WHERE w.user_id = c.user_id
+                                    AND l.source_lang = c.source_lang AND l.target_lang = c.target_lang)
+                               - (SELECT COUNT(*) FROM user_progress p
+                                  JOIN common_words cw ON cw.id = p.word_id
+                                  WHERE p.user_id = c.user_id AND p.word_type = 'common'
+                                    AND cw.source_lang = c.source_lang AND cw.target_lang = c.target_lang)
+                               - (SELECT COUNT(*) FROM user_progress p
+                                  JOIN user_words w ON w.id = p.word_id
+                                  JOIN lexemes l ON l.id = w.lexeme_id
+                                  WHERE p.user_id = c.user_id AND p.word_type = 'user'
+                                    AND l.source_lang = c.source_lang AND l.target_lang = c.target_lang),
+                               0
+                           )
+                    FROM claimed c
+                    ORDER BY c.due_at
+                    """,
+                    {"now": now_utc, "limit": limit},
+                    cursor=cur,
+                )
+                claimed = cur.fetchall()
+            self.conn.commit()
+            return claimed
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error in claim_due_reminders: {e}")
+            return []
 
-    def get_wrong_translations(self, correct_word: str, limit: int = 3) -> List[str]:
-        """Retrieve wrong translations for a given word."""
-        self.cur.execute(
+    def get_wrong_translations(
+        self, correct_word: str, limit: int = 3, reverse: bool = False, pair: str = DEFAULT_LANG_PAIR
+    ) -> List[str]:
+        """Retrieve wrong translations for a given word (studied-language ones with `reverse`)."""
+        if reverse:
+            query = """
+                SELECT LOWER(english_word)
+                FROM common_words
+                WHERE source_lang = %s AND target_lang = %s AND LOWER(english_word) != LOWER(%s)
+                GROUP BY LOWER(english_word)
+                ORDER BY RANDOM()
+                LIMIT %s;
             """
-            SELECT LOWER(russian_translation) 
-            FROM common_words 
-            WHERE LOWER(russian_translation) != LOWER(%s)
-            GROUP BY LOWER(russian_translation)
-            ORDER BY RANDOM()
-            LIMIT %s;
-            """,
-            (correct_word.lower(), limit),
-        )
+        else:
+            query = """
+                SELECT LOWER(russian_translation) 
+                FROM common_words 
+                WHERE source_lang = %s AND target_lang = %s AND LOWER(russian_translation) != LOWER(%s)
+                GROUP BY LOWER(russian_translation)
+                ORDER BY RANDOM()
+                LIMIT %s;
+            """
+        self.execute(query, (*split_pair(pair), correct_word.lower(), limit))
         return [row[0] for row in self.cur.fetchall()]
 
-    def add_user_word(self, user_id: int, english_word: str, russian_word: str) -> bool:
-        """Add a word to the user's personal dictionary."""
-        english_word = english_word.lower()
-        russian_word = russian_word.lower()
+    def get_all_word_pairs(self, pair: str = DEFAULT_LANG_PAIR) -> List[Tuple[str, str]]:
+        """Retrieve all distinct (word, translation) pairs of a language pair."""
+        try:
+            # Метод вызывается из фонового потока построения индекса (внутри pooled())
+            with self.conn.cursor() as cur:
+                self.execute(
+                    """
+                    SELECT LOWER(english_word), LOWER(russian_translation) FROM common_words
+                    WHERE source_lang = %(source)s AND target_lang = %(target)s
+                    UNION
+                    SELECT english_word, russian_translation FROM lexemes
+                    WHERE source_lang = %(source)s AND target_lang = %(target)s
+                    """,
+                    dict(zip(("source", "target"), split_pair(pair))),
+                    cursor=cur,
+                )
+                return [(row[0], row[1]) for row in cur.fetchall()]
+        except Exception as e:
+            logger.error(f"Error in get_all_word_pairs: {e}")
+            return []
+
+    def get_all_word_pairs_with_lemmas(self, pair: str = DEFAULT_LANG_PAIR) -> List[Tuple[str, str, str, str]]:
+        """Retrieve all distinct (word, translation, word lemma, translation lemma) rows of a language pair.
+
+        Lemmas are None for words the backfill has not reached yet.
+        """
+        try:
+            # Метод вызывается из фонового потока построения индекса (внутри pooled())
+            with self.conn.cursor() as cur:
+                self.execute(
+                    """
+                    SELECT LOWER(english_word), LOWER(russian_translation), english_lemma, translation_lemma
+                    FROM common_words
+                    WHERE source_lang = %(source)s AND target_lang = %(target)s
+                    UNION
+                    SELECT english_word, russian_translation, english_lemma, translation_lemma FROM lexemes
+                    WHERE source_lang = %(source)s AND target_lang = %(target)s
+                    """,
+                    dict(zip(("source", "target"), split_pair(pair))),
+                    cursor=cur,
+                )
+                return cur.fetchall()
+        except Exception as e:
+            logger.error(f"Error in get_all_word_pairs_with_lemmas: {e}")
+            return []
+
+    def find_lexeme_translation(self, russian_word: str, pair: str = DEFAULT_LANG_PAIR) -> Optional[str]:
+        """Look up a studied-language translation already stored in the global dictionary."""
         try:
-            self.cur.execute(
+            self.execute(
+                "SELECT english_word FROM lexemes "
+                "WHERE source_lang = %s AND target_lang = %s AND russian_translation = %s "
+                "ORDER BY id LIMIT 1",
+                (*split_pair(pair), russian_word.lower()),
+            )
+            row = self.cur.fetchone()
+            return row[0] if row else None
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error in find_lexeme_translation: {e}")
+            return None
+
+    def add_user_word(
+        self,
+        user_id: int,
+        english_word: str,
+        russian_word: str,
+        pair: str = DEFAULT_LANG_PAIR,
+        english_lemma: Optional[str] = None,
+        translation_lemma: Optional[str] = None,
+    ) -> bool:
+        """Add a word to the user's personal dictionary.
+
+        The word/translation pair is stored once per language pair in the
+        global lexemes table and the user only keeps a reference to it.
+        Lemmas default to the words themselves.
+        """
+        source_lang, target_lang = split_pair(pair)
+        try:
+            self.execute(
                 """
-                INSERT INTO user_words (user_id, english_word, russian_translation)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (user_id, english_word) DO NOTHING
+                WITH inserted AS (
+                    INSERT INTO lexemes
+                        (source_lang, target_lang, english_word, russian_translation, english_lemma, translation_lemma)
+                    VALUES (%(source)s, %(target)s, %(word)s, %(translation)s, %(word_lemma)s, %(translation_lemma)s)
+                    ON CONFLICT (source_lang, target_lang, english_word, russian_translation) DO NOTHING
+                    RETURNING id
+                ), lexeme AS (
+                    SELECT id FROM inserted
+                    UNION ALL
+                    SELECT id FROM lexemes
+                    WHERE source_lang = %(source)s AND target_lang = %(target)s
+                        AND english_word = %(word)s AND russian_translation = %(translation)s
+                    LIMIT 1
+                )
+                INSERT INTO user_words (user_id, lexeme_id)
+                SELECT %(user_id)s, id FROM lexeme
+                ON CONFLICT (user_id, lexeme_id) DO NOTHING
                 """,
-                (user_id, english_word, russian_word),
+                {
+                    "source": source_lang,
+                    "target": target_lang,
+                    "word": english_word.lower(),
+                    "translation": russian_word.lower(),
+                    "word_lemma": (english_lemma or english_word).lower(),
+                    "translation_lemma": (translation_lemma or russian_word).lower(),
+                    "user_id": user_id,
+                },
             )
             self.conn.commit()
             return self.cur.rowcount > 0
@@ -117,141 +624,573 @@ class Database:
             logger.error(f"Error adding word: {e}")
             return False
 
-    def delete_user_word(self, user_id: int, word: str) -> bool:
-        """Delete a word from the user's personal dictionary."""
+    def delete_user_word(self, user_id: int, word: str, pair: str = DEFAULT_LANG_PAIR) -> bool:
+        """Delete a word of the given language pair from the user's personal dictionary.
+
+        The word or its translation must match exactly: lemmas are only used
+        to detect duplicates, since one ambiguous lemma may cover unrelated words.
+        """
+        source_lang, target_lang = split_pair(pair)
         query = """
-            DELETE FROM user_words
-            WHERE user_id = %s AND (
-                LOWER(english_word) = LOWER(%s) OR LOWER(russian_translation) = LOWER(%s)
-            )
+            DELETE FROM user_words u
+            USING lexemes l
+            WHERE u.lexeme_id = l.id AND u.user_id = %(user_id)s
+                AND l.source_lang = %(source)s AND l.target_lang = %(target)s
+                AND (l.english_word = %(word)s OR l.russian_translation = %(word)s)
         """
-        self.cur.execute(query, (user_id, word, word))
+        self.execute(
+            query,
+            {"user_id": user_id, "source": source_lang, "target": target_lang, "word": word.lower()},
+        )
         deleted_rows = self.cur.rowcount
         self.conn.commit()
         return deleted_rows > 0
 
-    def count_user_words(self, user_id: int) -> int:
-        """Count the number of words in the user's personal dictionary."""
-        self.cur.execute("SELECT COUNT(*) FROM user_words WHERE user_id = %s", (user_id,))
+    def count_user_words(self, user_id: int, pair: Optional[str] = None) -> int:
+        """Count the words in the user's personal dictionary (within `pair` if given)."""
+        if pair is None:
+            self.execute("SELECT COUNT(*) FROM user_words WHERE user_id = %s", (user_id,))
+        else:
+            self.execute(
+                "SELECT COUNT(*) FROM user_words u JOIN lexemes l ON l.id = u.lexeme_id "
+                "WHERE u.user_id = %s AND l.source_lang = %s AND l.target_lang = %s",
+                (user_id, *split_pair(pair)),
+            )
         return self.cur.fetchone()[0]
 
-    def check_word_progress(self, user_id: int, word_id: int, word_type: str) -> bool:
-        """Check if a word has been marked as seen by the user."""
+    def get_user_words(self, user_id: int, pair: str = DEFAULT_LANG_PAIR) -> List[Tuple[str, str]]:
+        """Retrieve all words of a language pair added by the user."""
         try:
-            self.cur.execute(
-                "SELECT 1 FROM user_progress WHERE user_id = %s AND word_id = %s AND word_type = %s",
-                (user_id, word_id, word_type),
+            self.execute(
+                "SELECT l.english_word, l.russian_translation "
+                "FROM user_words u JOIN lexemes l ON l.id = u.lexeme_id "
+                "WHERE u.user_id = %s AND l.source_lang = %s AND l.target_lang = %s ORDER BY u.id",
+                (user_id, *split_pair(pair)),
             )
-            return bool(self.cur.fetchone())
+            return [(row[0], row[1]) for row in self.cur.fetchall()]
         except Exception as e:
-            logger.error(f"Error in check_word_progress: {e}")
+            logger.error(f"Error in get_user_words: {e}")
+            return []
+
+    def get_question_batch(
+        self,
+        user_id: int,
+        count: int,
+        distractors: int = 3,
+        reverse: bool = False,
+        exclude: Optional[List[str]] = None,
+    ) -> List[Tuple[str, str, str, int, List[str]]]:
+        """Retrieve up to `count` unseen question bundles in one round-trip.
+
+        `exclude` holds 'word_type:word_id' keys of words that are already
+        buffered or served. Background refills call it inside `pooled()`.
+        """
+        try:
+            with self.conn.cursor() as cur:
+                self.execute(
+                    "EXECUTE question_batch (%s, %s, %s, %s, %s)",
+                    (user_id, count, distractors, reverse, exclude),
+                    cursor=cur,
+                )
+                return cur.fetchall()
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error in get_question_batch: {e}")
+            return []
+
+    def record_answer_and_next(
+        self,
+        user_id: int,
+        word_id: int,
+        word_type: str,
+        seen_at: Optional[datetime],
+        distractors: int = 3,
+        reverse: bool = False,
+        count: int = 1,
+        exclude: Optional[List[str]] = None,
+    ) -> Optional[List[Tuple[str, str, str, int, List[str]]]]:
+        """Mark a word as seen and retrieve up to `count` next question bundles in one round-trip.
+
+        The session's last activity is stamped with the bot's clock, like
+        its start, so session durations never mix the bot and server clocks.
+        Returns None if the answer could not be recorded.
+        """
+        try:
+            with self.conn.cursor() as cur:
+                self.execute(
+                    "EXECUTE record_answer (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                    (user_id, word_id, word_type, seen_at, datetime.now(), distractors, reverse, count, exclude),
+                    cursor=cur,
+                )
+                bundles = cur.fetchall()
+            self.conn.commit()
+            return bundles
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error in record_answer_and_next: {e}")
+            return None
+
+    def record_answer_events(self, events: List[tuple]) -> bool:
+        """Append a batch of answer events and update the derived counters.
+
+        `events` are (answered_at, user_id, word_id, word_type, mode, correct,
+        answer, correct_answer, source_lang, target_lang) tuples; confusions
+        are counted per language pair. The batch is passed as arrays and
+        unnested server-side, so the event log, word_difficulty and
+        distractor_confusions are all updated in a single statement.
+        """
+        if not events:
+            return True
+        columns = list(zip(*events))
+        try:
+            with self.conn.cursor() as cur:
+                self.execute(
+                    """
+                    WITH batch AS (
+                        SELECT *
+                        FROM unnest(
+                            %s::TIMESTAMP[], %s::INT[], %s::INT[], %s::TEXT[],
+                            %s::TEXT[], %s::BOOLEAN[], %s::TEXT[], %s::TEXT[], %s::TEXT[], %s::TEXT[]
+                        ) AS b(
+                            answered_at, user_id, word_id, word_type, mode, correct, answer, correct_answer,
+                            source_lang, target_lang
+                        )
+                    ), logged AS (
+                        INSERT INTO answer_events (answered_at, user_id, word_id, word_type, mode, correct, answer)
+                        SELECT answered_at, user_id, word_id, word_type, mode, correct, answer
+                        FROM batch
+                    ), difficulty AS (
+                        INSERT INTO word_difficulty (word_type, word_id, attempts, wrong)
+                        SELECT word_type, word_id, COUNT(*), COUNT(*) FILTER (WHERE NOT correct)
+                        FROM batch
+                        GROUP BY word_type, word_id
+                        ON CONFLICT (word_type, word_id) DO UPDATE SET
+                            attempts = word_difficulty.attempts + EXCLUDED.attempts,
+                            wrong = word_difficulty.wrong + EXCLUDED.wrong
+                    )
+                    INSERT INTO distractor_confusions (source_lang, target_lang, correct_answer, distractor, picks)
+                    SELECT source_lang, target_lang, LOWER(correct_answer), LOWER(answer), COUNT(*)
+                    FROM batch
+                    WHERE NOT correct AND mode <> 'typed' AND answer IS NOT NULL
+                    GROUP BY 1, 2, 3, 4
+                    ON CONFLICT (source_lang, target_lang, correct_answer, distractor) DO UPDATE SET
+                        picks = distractor_confusions.picks + EXCLUDED.picks
+                    """,
+                    tuple(list(column) for column in columns),
+                    cursor=cur,
+                )
+            self.conn.commit()
+            return True
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error in record_answer_events: {e}")
             return False
 
-    def mark_word_as_seen(self, user_id: int, word_id: int, word_type: str, session_start: datetime):
-        """Mark a word as seen by the user."""
+    def get_top_confusions(self, min_picks: int = 2, per_answer: int = 3) -> List[Tuple[str, str, str, int]]:
+        """Retrieve the most frequently picked wrong options for every correct answer.
+
+        Returns (pair, correct_answer, distractor, picks) tuples.
+        """
         try:
-            self.cur.execute(
-                "INSERT INTO user_progress (user_id, word_id, word_type, added_at) "
-                "VALUES (%s, %s, %s, %s) ON CONFLICT DO NOTHING",
-                (user_id, word_id, word_type, session_start),
+            # Метод вызывается из фонового потока построения индекса (внутри pooled())
+            with self.conn.cursor() as cur:
+                self.execute(
+                    """
+                    SELECT source_lang || '-' || target_lang, correct_answer, distractor, picks
+                    FROM (
+                        SELECT source_lang, target_lang, correct_answer, distractor, picks,
+                               ROW_NUMBER() OVER (
+                                   PARTITION BY source_lang, target_lang, correct_answer ORDER BY picks DESC
+                               ) AS position
+                        FROM distractor_confusions
+                        WHERE picks >= %s
+                    ) AS ranked
+                    WHERE position <= %s
+                    """,
+                    (min_picks, per_answer),
+                    cursor=cur,
+                )
+                return cur.fetchall()
+        except Exception as e:
+            logger.error(f"Error in get_top_confusions: {e}")
+            return []
+
+    def check_duplicate(
+        self, user_id: int, lemma: str, pair: str = DEFAULT_LANG_PAIR, studied: bool = False
+    ) -> bool:
+        """Check if a word with this lemma already exists in the catalog of a language pair.
+
+        The lemma is compared with translation lemmas, or with studied-word
+        lemmas if `studied` is set, so every branch is a single equality
+        served by the per-pair lemma indexes.
+        """
+        column = sql.Identifier("english_lemma" if studied else "translation_lemma")
+        source_lang, target_lang = split_pair(pair)
+        self.execute(
+            sql.SQL(
+                """
+                (SELECT 1 FROM common_words
+                 WHERE source_lang = %(source)s AND target_lang = %(target)s AND {column} = %(lemma)s
+                 LIMIT 1)
+                UNION ALL
+                (SELECT 1 FROM user_words u JOIN lexemes l ON l.id = u.lexeme_id
+                 WHERE u.user_id = %(user_id)s
+                     AND l.source_lang = %(source)s AND l.target_lang = %(target)s AND l.{column} = %(lemma)s)
+                LIMIT 1
+                """
+            )
+            .format(column=column)
+            .as_string(self.conn),
+            {"source": source_lang, "target": target_lang, "lemma": lemma.lower(), "user_id": user_id},
+        )
+        return bool(self.cur.fetchone())
+
+    def get_cached_lemmas(self, lang: str, words: List[str]) -> Dict[str, str]:
+        """Retrieve stored analyzer results for `words` as a word -> lemma mapping."""
+        try:
+            with self.conn.cursor() as cur:
+                self.execute(
+                    "SELECT word, lemma FROM lemma_cache WHERE lang = %s AND word = ANY(%s)",
+                    (lang, list(words)),
+                    cursor=cur,
+                )
+                return dict(cur.fetchall())
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error in get_cached_lemmas: {e}")
+            return {}
+
+    def save_lemmas(self, lang: str, lemmas: Dict[str, str]):
+        """Store analyzer results (word -> lemma) for a language."""
+        if not lemmas:
+            return
+        try:
+            with self.conn.cursor() as cur:
+                self.execute(
+                    """
+                    INSERT INTO lemma_cache (lang, word, lemma)
+                    SELECT %s, word, lemma FROM unnest(%s::TEXT[], %s::TEXT[]) AS b(word, lemma)
+                    ON CONFLICT (lang, word) DO UPDATE SET lemma = EXCLUDED.lemma
+                    """,
+                    (lang, list(lemmas), list(lemmas.values())),
+                    cursor=cur,
+                )
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error in save_lemmas: {e}")
+
+    def get_words_without_lemmas(
+        self, table: str, after_id: int = 0, limit: int = 1000, refresh: bool = False
+    ) -> List[Tuple[int, str, str, str, str]]:
+        """Retrieve the next (id, source_lang, target_lang, word, translation) rows lacking lemmas.
+
+        Rows are paged by id (keyset pagination); with `refresh` every row
+        is returned, so lemmas can be recomputed after an analyzer change.
+        """
+        if table not in LEMMA_TABLES:
+            raise ValueError(f"Unknown table: {table}")
+        condition = sql.SQL("TRUE" if refresh else "(english_lemma IS NULL OR translation_lemma IS NULL)")
+        with self.conn.cursor() as cur:
+            self.execute(
+                sql.SQL(
+                    """
+                    SELECT id, source_lang, target_lang, LOWER(english_word), LOWER(russian_translation)
+                    FROM {table}
+                    WHERE id > %s AND english_word IS NOT NULL AND russian_translation IS NOT NULL
+                        AND {condition}
+                    ORDER BY id
+                    LIMIT %s
+                    """
+                )
+                .format(table=sql.Identifier(table), condition=condition)
+                .as_string(self.conn),
+                (after_id, limit),
+                cursor=cur,
+            )
+            return cur.fetchall()
+
+    def set_word_lemmas(self, table: str, rows: List[Tuple[int, str, str]]):
+        """Store (id, english_lemma, translation_lemma) rows in one statement."""
+        if table not in LEMMA_TABLES:
+            raise ValueError(f"Unknown table: {table}")
+        if not rows:
+            return
+        ids, english_lemmas, translation_lemmas = (list(column) for column in zip(*rows))
+        try:
+            with self.conn.cursor() as cur:
+                self.execute(
+                    sql.SQL(
+                        """
+                        UPDATE {table} t
+                        SET english_lemma = b.english_lemma, translation_lemma = b.translation_lemma
+                        FROM unnest(%s::INT[], %s::TEXT[], %s::TEXT[]) AS b(id, english_lemma, translation_lemma)
+                        WHERE t.id = b.id
+                        """
+                    )
+                    .format(table=sql.Identifier(table))
+                    .as_string(self.conn),
+                    (ids, english_lemmas, translation_lemmas),
+                    cursor=cur,
+                )
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error in set_word_lemmas: {e}")
+
+    def create_group(
+        self, owner_id: int, title: str, invite_code: str, pair: str, chat_id: Optional[int] = None
+    ) -> Optional[int]:
+        """Create a class owned by `owner_id` (who becomes its first member).
+
+        Returns the class id, or None if the invite code or chat is taken.
+        """
+        try:
+            self.execute(
+                """
+                WITH created AS (
+                    INSERT INTO groups (owner_id, title, invite_code, lang_pair, chat_id)
+                    VALUES (%(owner_id)s, %(title)s, %(code)s, %(pair)s, %(chat_id)s)
+                    RETURNING id
+                ), member AS (
+                    INSERT INTO group_members (group_id, user_id)
+                    SELECT id, %(owner_id)s FROM created
+                )
+                SELECT id FROM created
+                """,
+                {"owner_id": owner_id, "title": title, "code": invite_code, "pair": pair, "chat_id": chat_id},
             )
+            group_id = self.cur.fetchone()[0]
             self.conn.commit()
+            return group_id
+        except psycopg2.IntegrityError:
+            self.conn.rollback()
+            return None
         except Exception as e:
-            logger.error(f"Error in mark_word_as_seen: {e}")
+            self.conn.rollback()
+            logger.error(f"Error in create_group: {e}")
+            return None
 
-    def get_user_words(self, user_id: int) -> List[Tuple[str, str]]:
-        """Retrieve all words added by the user."""
+    def find_group(
+        self, invite_code: Optional[str] = None, chat_id: Optional[int] = None
+    ) -> Optional[Tuple[int, str, int, str, str]]:
+        """Find a class by invite code or group chat: (id, title, owner_id, lang_pair, invite_code)."""
         try:
-            self.cur.execute(
-                "SELECT english_word, russian_translation FROM user_words WHERE user_id = %s",
-                (user_id,),
+            self.execute(
+                """
+                SELECT id, title, owner_id, lang_pair, invite_code
+                FROM groups
+                WHERE invite_code = %s OR chat_id = %s
+                LIMIT 1
+                """,
+                (invite_code, chat_id),
             )
-            return [(row[0], row[1]) for row in self.cur.fetchall()]
+            return self.cur.fetchone()
         except Exception as e:
-            logger.error(f"Error in get_user_words: {e}")
+            self.conn.rollback()
+            logger.error(f"Error in find_group: {e}")
+            return None
+
+    def get_user_groups(self, user_id: int, owned: bool = False) -> List[Tuple[int, str, int, str, str]]:
+        """List the user's classes, most recently joined first (only owned ones with `owned`)."""
+        try:
+            self.execute(
+                """
+                SELECT g.id, g.title, g.owner_id, g.lang_pair, g.invite_code
+                FROM group_members m
+                JOIN groups g ON g.id = m.group_id
+                WHERE m.user_id = %s AND (NOT %s OR g.owner_id = m.user_id)
+                ORDER BY m.joined_at DESC
+                """,
+                (user_id, owned),
+            )
+            return self.cur.fetchall()
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error in get_user_groups: {e}")
             return []
 
-    def get_unseen_word(self, user_id: int) -> Optional[Tuple[str, str, str, int]]:
-        """Retrieve an unseen word for the user."""
+    def join_group(self, group_id: int, user_id: int) -> bool:
+        """Add a member to a class and give them the published word list.
+
+        Returns False if the user already is a member.
+        """
         try:
-            query = """
-                SELECT english_word, russian_translation, word_type, word_id 
-                FROM (
-                    SELECT 
-                        c.english_word, 
-                        c.russian_translation, 
-                        'common' AS word_type, 
-                        c.id AS word_id,
-                        RANDOM() AS sort_key
-                    FROM common_words c
-                    LEFT JOIN user_progress p 
-                        ON c.id = p.word_id 
-                        AND p.word_type = 'common' 
-                        AND p.user_id = %s
-                    WHERE p.word_id IS NULL
+            self.execute(
+                """
+                INSERT INTO group_members (group_id, user_id) VALUES (%s, %s)
+                ON CONFLICT (group_id, user_id) DO NOTHING
+                """,
+                (group_id, user_id),
+            )
+            if self.cur.rowcount == 0:
+                self.conn.rollback()
+                return False
+            self.execute(
+                """
+                INSERT INTO user_words (user_id, lexeme_id)
+                SELECT %s, lexeme_id FROM group_words WHERE group_id = %s
+                ON CONFLICT (user_id, lexeme_id) DO NOTHING
+                """,
+                (user_id, group_id),
+            )
+            self.execute("SELECT refresh_group_scores(%s, %s)", (group_id, user_id))
+            self.conn.commit()
+            return True
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error in join_group: {e}")
+            return False
 
-                    UNION ALL
+    def publish_group_words(self, group_id: int) -> Tuple[int, int]:
+        """Publish the owner's words of the class language pair to all members.
 
-                    SELECT 
-                        u.english_word, 
-                        u.russian_translation, 
-                        'user' AS word_type, 
-                        u.id AS word_id,
-                        RANDOM() AS sort_key
-                    FROM user_words u
-                    LEFT JOIN user_progress p 
-                        ON u.id = p.word_id 
-                        AND p.word_type = 'user' 
-                        AND p.user_id = %s
-                    WHERE p.word_id IS NULL 
-                        AND u.user_id = %s
-                ) AS combined_data
-                ORDER BY sort_key
-                LIMIT 1;
-            """
-            self.cur.execute(query, (user_id, user_id, user_id))
+        Members receive the words as their own, so the regular quiz serves
+        them. Returns (newly published words, total words in the list).
+        """
+        try:
+            with self.conn.cursor() as cur:
+                self.execute(
+                    """
+                    INSERT INTO group_words (group_id, lexeme_id)
+                    SELECT g.id, l.id
+                    FROM groups g
+                    JOIN user_words u ON u.user_id = g.owner_id
+                    JOIN lexemes l ON l.id = u.lexeme_id
+                    WHERE g.id = %s
+                        AND l.source_lang = split_part(g.lang_pair, '-', 1)
+                        AND l.target_lang = split_part(g.lang_pair, '-', 2)
+                    ON CONFLICT (group_id, lexeme_id) DO NOTHING
+                    """,
+                    (group_id,),
+                    cursor=cur,
+                )
+                published = cur.rowcount
+                self.execute(
+                    """
+                    INSERT INTO user_words (user_id, lexeme_id)
+                    SELECT m.user_id, w.lexeme_id
+                    FROM group_members m
+                    JOIN group_words w ON w.group_id = m.group_id
+                    WHERE m.group_id = %s
+                    ON CONFLICT (user_id, lexeme_id) DO NOTHING
+                    """,
+                    (group_id,),
+                    cursor=cur,
+                )
+                if published:
+                    self.execute("SELECT refresh_group_scores(%s, NULL)", (group_id,), cursor=cur)
+                self.execute("SELECT COUNT(*) FROM group_words WHERE group_id = %s", (group_id,), cursor=cur)
+                total = cur.fetchone()[0]
+            self.conn.commit()
+            return published, total
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error in publish_group_words: {e}")
+            return 0, 0
+
+    def get_leaderboard(self, group_id: int, limit: int = 10) -> List[Tuple[int, str, str, int]]:
+        """Top members of a class as (user_id, first_name, username, score).
+
+        Scores are maintained by a trigger on user_progress, so this is an
+        index range scan over group_members_score_idx, not a count.
+        """
+        try:
+            self.execute(
+                """
+                SELECT m.user_id, u.first_name, u.username, m.score
+                FROM group_members m
+                JOIN users u ON u.user_id = m.user_id
+                WHERE m.group_id = %s
+                ORDER BY m.score DESC, m.user_id
+                LIMIT %s
+                """,
+                (group_id, limit),
+            )
+            return self.cur.fetchall()
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error in get_leaderboard: {e}")
+            return []
+
+    def get_member_rank(self, group_id: int, user_id: int) -> Optional[Tuple[int, int]]:
+        """The member's (rank, score) in a class; rank counts members with a higher score."""
+        try:
+            self.execute(
+                """
+                SELECT (
+                           SELECT COUNT(*) + 1 FROM group_members o
+                           WHERE o.group_id = m.group_id AND o.score > m.score
+                       ),
+                       m.score
+                FROM group_members m
+                WHERE m.group_id = %s AND m.user_id = %s
+                """,
+                (group_id, user_id),
+            )
             return self.cur.fetchone()
         except Exception as e:
-            logger.error(f"Error in get_unseen_word: {e}")
+            self.conn.rollback()
+            logger.error(f"Error in get_member_rank: {e}")
             return None
 
-    def check_duplicate(self, user_id: int, word: str) -> bool:
-        """Check if a word already exists in the database."""
-        self.cur.execute(
-            """
-            (SELECT 1 FROM common_words 
-             WHERE LOWER(english_word) = LOWER(%s) OR LOWER(russian_translation) = LOWER(%s))
-            UNION ALL
-            (SELECT 1 FROM user_words 
-             WHERE user_id = %s AND (LOWER(english_word) = LOWER(%s) OR LOWER(russian_translation) = LOWER(%s)))
-            LIMIT 1
-            """,
-            (word, word, user_id, word, word),
-        )
-        return bool(self.cur.fetchone())
-
     def update_session_stats(self, user_id: int, learned_words: int, session_duration: int):
         """Update session statistics for the user."""
         try:
-            self.cur.execute(
+            self.execute(
                 """
+                WITH closed AS (
+                    DELETE FROM open_sessions WHERE user_id = %s
+                )
                 INSERT INTO session_stats 
                 (user_id, session_date, learned_words, session_duration)
                 VALUES (%s, NOW(), %s, %s)
                 """,
-                (user_id, learned_words, session_duration),
+                (user_id, user_id, learned_words, session_duration),
             )
             self.conn.commit()
         except Exception as e:
             logger.error(f"Error saving session stats: {e}")
 
+    def open_session(self, user_id: int, session_start: datetime):
+        """Persist a session-open record; a stale record for the user is finalized first."""
+        try:
+            self.execute(
+                """
+                SELECT finalize_open_sessions(ARRAY[%s], NULL);
+                INSERT INTO open_sessions (user_id, session_start, last_activity)
+                VALUES (%s, %s, %s)
+                """,
+                (user_id, user_id, session_start, session_start),
+            )
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error in open_session: {e}")
+
+    def finalize_open_sessions(self, user_ids: Optional[List[int]] = None, ended_at: Optional[datetime] = None) -> int:
+        """Finalize open sessions in one bulk write and return how many were saved.
+
+        Without `user_ids` every open session is finalized; without
+        `ended_at` each session ends at its last recorded activity.
+        """
+        try:
+            self.execute("SELECT finalize_open_sessions(%s, %s)", (user_ids, ended_at))
+            finalized = self.cur.fetchone()[0]
+            self.conn.commit()
+            return finalized
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error finalizing open sessions: {e}")
+            return 0
+
     def count_new_learned_words(self, user_id: int, session_start: datetime, session_end: datetime) -> int:
         """Count the number of new words learned during a session."""
         try:
             if session_start > session_end:
                 session_start, session_end = session_end, session_start
 
-            self.cur.execute(
+            self.execute(
                 "SELECT COUNT(*) FROM user_progress "
                 "WHERE user_id = %s AND added_at BETWEEN %s AND %s",
                 (user_id, session_start, session_end),
@@ -261,7 +1200,225 @@ class Database:
             logger.error(f"Error in count_new_learned_words: {e}")
             return 0
 
+    def ensure_session_partitions(self, months_ahead: int = 2):
+        """Create monthly session_stats partitions up to `months_ahead` months from now."""
+        try:
+            self.execute(
+                "SELECT ensure_session_stats_partitions(NOW()::DATE, "
+                "(date_trunc('month', NOW()) + make_interval(months => %s))::DATE)",
+                (months_ahead,),
+            )
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error creating session_stats partitions: {e}")
+
+    def get_session_partitions(self) -> List[Tuple[str, date]]:
+        """List monthly session_stats partitions as (name, month start) pairs."""
+        self.execute(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'session_stats'::regclass
+                AND c.relname ~ '^session_stats_y[0-9]{4}m[0-9]{2}$'
+            ORDER BY c.relname
+            """
+        )
+        return [
+            (row[0], date(int(row[0][-7:-3]), int(row[0][-2:]), 1))
+            for row in self.cur.fetchall()
+        ]
+
+    def archive_session_partition(self, partition: str, archive_path: Path) -> bool:
+        """Archive a session_stats partition to a gzip CSV file, roll it up and drop it.
+
+        The partition is first streamed with COPY into the compressed file,
+        then its rows are aggregated into session_stats_monthly and the
+        partition is detached and dropped in one transaction.
+        """
+        table = sql.Identifier(partition)
+        tmp_path = archive_path.with_suffix(archive_path.suffix + ".part")
+        try:
+            archive_path.parent.mkdir(parents=True, exist_ok=True)
+            with gzip.open(tmp_path, "wb") as f:
+                self.cur.copy_expert(
+                    sql.SQL("COPY {} TO STDOUT WITH (FORMAT csv, HEADER)").format(table).as_string(self.conn),
+                    f,
+                )
+            tmp_path.replace(archive_path)
+
+            self.execute(
+                sql.SQL(
+                    """
+                    INSERT INTO session_stats_monthly (user_id, month, sessions, learned_words, total_duration)
+                    SELECT user_id, date_trunc('month', session_date)::DATE,
+                           COUNT(*), SUM(learned_words), SUM(session_duration)
+                    FROM {}
+                    WHERE user_id IS NOT NULL
+                    GROUP BY 1, 2
+                    ON CONFLICT (user_id, month) DO UPDATE SET
+                        sessions = session_stats_monthly.sessions + EXCLUDED.sessions,
+                        learned_words = session_stats_monthly.learned_words + EXCLUDED.learned_words,
+                        total_duration = session_stats_monthly.total_duration + EXCLUDED.total_duration
+                    """
+                ).format(table).as_string(self.conn)
+            )
+            self.execute(sql.SQL("ALTER TABLE session_stats DETACH PARTITION {}").format(table).as_string(self.conn))
+            self.execute(sql.SQL("DROP TABLE {}").format(table).as_string(self.conn))
+            self.conn.commit()
+            logger.info(f"Partition {partition} archived to {archive_path}")
+            return True
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error archiving partition {partition}: {e}")
+            return False
+
+    def import_common_words(
+        self, rows: Iterable[tuple], chunk_size: int = 5000, pair: str = DEFAULT_LANG_PAIR
+    ) -> Tuple[int, int]:
+        """Stream (word, translation, rank, part_of_speech) rows of a language pair into common_words.
+
+        Rows are loaded with COPY into a temporary staging table one chunk at
+        a time and merged with an idempotent upsert, so memory use does not
+        depend on the input size. Rows without a translation only update the
+        frequency rank of words that already exist.
+
+        Returns the number of (upserted, re-ranked) words.
+        """
+        upserted = ranked = 0
+        with self.conn.cursor() as cur:
+            try:
+                self.execute(
+                    """
+                    CREATE TEMP TABLE IF NOT EXISTS common_words_staging (
+                        english_word TEXT NOT NULL,
+                        russian_translation TEXT,
+                        frequency_rank INT,
+                        part_of_speech TEXT
+                    ) ON COMMIT DELETE ROWS
+                    """,
+                    cursor=cur,
+                )
+                self.conn.commit()
+
+                chunk = []
+                for row in rows:
+                    chunk.append(row)
+                    if len(chunk) >= chunk_size:
+                        counts = self._merge_common_words_chunk(cur, chunk, pair)
+                        upserted, ranked = upserted + counts[0], ranked + counts[1]
+                        chunk = []
+                if chunk:
+                    counts = self._merge_common_words_chunk(cur, chunk, pair)
+                    upserted, ranked = upserted + counts[0], ranked + counts[1]
+            except Exception:
+                self.conn.rollback()
+                raise
+        return upserted, ranked
+
+    def _merge_common_words_chunk(self, cur, chunk: List[tuple], pair: str) -> Tuple[int, int]:
+        """COPY one chunk into the staging table and merge it into common_words."""
+        source_lang, target_lang = split_pair(pair)
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(chunk)
+        buffer.seek(0)
+        cur.copy_expert("COPY common_words_staging FROM STDIN WITH (FORMAT csv)", buffer)
+
+        self.execute(
+            """
+            INSERT INTO common_words
+                (source_lang, target_lang, english_word, russian_translation, frequency_rank, part_of_speech)
+            SELECT DISTINCT ON (LOWER(english_word), LOWER(russian_translation))
+                   %(source)s, %(target)s, english_word, russian_translation, frequency_rank, part_of_speech
+            FROM common_words_staging
+            WHERE russian_translation IS NOT NULL
+            ORDER BY LOWER(english_word), LOWER(russian_translation), frequency_rank NULLS LAST
+            ON CONFLICT (source_lang, target_lang, LOWER(english_word), LOWER(russian_translation)) DO UPDATE SET
+                frequency_rank = COALESCE(EXCLUDED.frequency_rank, common_words.frequency_rank),
+                part_of_speech = COALESCE(EXCLUDED.part_of_speech, common_words.part_of_speech)
+            WHERE (common_words.frequency_rank, common_words.part_of_speech) IS DISTINCT FROM (
+                COALESCE(EXCLUDED.frequency_rank, common_words.frequency_rank),
+                COALESCE(EXCLUDED.part_of_speech, common_words.part_of_speech)
+            )
+            """,
+            {"source": source_lang, "target": target_lang},
+            cursor=cur,
+        )
+        upserted = cur.rowcount
+
+        self.execute(
+            """
+            UPDATE common_words c
+            SET frequency_rank = s.frequency_rank
+            FROM (
+                SELECT LOWER(english_word) AS english_word, MIN(frequency_rank) AS frequency_rank
+                FROM common_words_staging
+                WHERE russian_translation IS NULL AND frequency_rank IS NOT NULL
+                GROUP BY 1
+            ) AS s
+            WHERE c.source_lang = %(source)s AND c.target_lang = %(target)s
+                AND LOWER(c.english_word) = s.english_word
+                AND c.frequency_rank IS DISTINCT FROM s.frequency_rank
+            """,
+            {"source": source_lang, "target": target_lang},
+            cursor=cur,
+        )
+        ranked = cur.rowcount
+        self.conn.commit()
+        return upserted, ranked
+
+    def refresh_analytics_views(self) -> List[str]:
+        """Refresh the admin analytics materialized views.
+
+        Populated views are refreshed CONCURRENTLY so reads are not blocked;
+        a view that was never populated gets a plain first refresh.
+        Returns the names of the refreshed views.
+        """
+        refreshed = []
+        self.execute(
+            "SELECT matviewname, ispopulated FROM pg_matviews "
+            "WHERE matviewname LIKE 'analytics\\_%' ORDER BY matviewname"
+        )
+        for name, populated in self.cur.fetchall():
+            statement = "REFRESH MATERIALIZED VIEW CONCURRENTLY {}" if populated else "REFRESH MATERIALIZED VIEW {}"
+            try:
+                self.execute(sql.SQL(statement).format(sql.Identifier(name)).as_string(self.conn))
+                self.conn.commit()
+                refreshed.append(name)
+            except Exception as e:
+                self.conn.rollback()
+                logger.error(f"Error refreshing {name}: {e}")
+        return refreshed
+
+    def iter_user_export(
+        self, user_id: int, sections: Iterable[str] = tuple(EXPORT_SECTIONS), itersize: int = 2000
+    ) -> Iterator[Tuple[str, Tuple[str, ...], Iterator[tuple]]]:
+        """Yield (section, columns, rows) for a user's data export.
+
+        Rows are streamed from named (server-side) cursors, `itersize` rows
+        per round trip, on a dedicated read-only connection, so commits made
+        by other handlers cannot close the cursors mid-export. Each rows
+        iterator must be consumed before the next section is requested.
+        """
+        conn = psycopg2.connect(**DB_CONFIG)
+        try:
+            conn.set_session(readonly=True)
+            for section in sections:
+                columns, query = EXPORT_SECTIONS[section]
+                with conn.cursor(name=f"export_{section}") as cur:
+                    cur.itersize = itersize
+                    self.execute(query, {"user_id": user_id}, cursor=cur)
+                    yield section, columns, iter(cur)
+            conn.commit()
+        finally:
+            conn.close()
+
     def close(self):
-        """Close the database connection."""
-        self.cur.close()
-        self.conn.close()
+        """Close the database connection and the background pool."""
+        self._cur.close()
+        self._conn.close()
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
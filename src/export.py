@@ -0,0 +1,136 @@
+import csv
+import gzip
+import html
+import io
+import json
+import logging
+import zipfile
+from datetime import date
+
+import genanki
+from telegram import Update
+from telegram.ext import CallbackContext
+
+from src import db
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("csv", "json", "apkg")
+
+# Предельный размер документа, который бот может отправить через Bot API
+MAX_DOCUMENT_SIZE = 50 * 1024 * 1024
+
+# Постоянные ID модели и колоды Anki: повторный импорт обновляет карточки, а не дублирует их
+ANKI_MODEL_ID = 1607392319
+ANKI_DECK_ID_BASE = 2059400110 * 1000
+
+ANKI_MODEL = genanki.Model(
+    ANKI_MODEL_ID,
+    "tgEnglishLearn word",
+    fields=[{"name": "English"}, {"name": "Russian"}],
+    templates=[
+        {
+            "name": "EN → RU",
+            "qfmt": "{{English}}",
+            "afmt": "{{FrontSide}}<hr id=answer>{{Russian}}",
+        },
+    ],
+)
+
+
+def _json_value(value):
+    """Преобразование значений, которые json не сериализует сам (даты)."""
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def export_csv(user_id: int) -> io.BytesIO:
+    """ZIP-архив с CSV-файлом на каждый раздел; строки сжимаются по мере чтения."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for section, columns, rows in db.iter_user_export(user_id):
+            with archive.open(f"{section}.csv", "w") as raw:
+                text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+                writer = csv.writer(text)
+                writer.writerow(columns)
+                for row in rows:
+                    writer.writerow(row)
+                text.flush()
+                text.detach()
+    return buffer
+
+
+def export_json(user_id: int) -> io.BytesIO:
+    """JSON-документ {раздел: [записи]} в gzip; записи пишутся по одной."""
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode="wb") as compressed:
+        text = io.TextIOWrapper(compressed, encoding="utf-8")
+        text.write("{")
+        for index, (section, columns, rows) in enumerate(db.iter_user_export(user_id)):
+            text.write(f'{"," if index else ""}\n{json.dumps(section)}: [')
+            for number, row in enumerate(rows):
+                record = json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=_json_value)
+                text.write(f'{"," if number else ""}\n  {record}')
+            text.write("\n]")
+        text.write("\n}\n")
+        text.flush()
+        text.detach()
+    return buffer
+
+
+def export_apkg(user_id: int) -> io.BytesIO:
+    """Колода Anki из слов пользователя; выученные слова помечены тегом learned.
+
+    genanki собирает колоду в памяти, поэтому в неё попадают только слова
+    пользователя, а не весь прогресс.
+    """
+    deck = genanki.Deck(ANKI_DECK_ID_BASE + user_id, "tgEnglishLearn — мои слова")
+    for _, _, rows in db.iter_user_export(user_id, sections=("words",)):
+        for english, russian, learned in rows:
+            deck.add_note(
+                genanki.Note(
+                    model=ANKI_MODEL,
+                    fields=[html.escape(english), html.escape(russian)],
+                    tags=["learned"] if learned else [],
+                    guid=genanki.guid_for(user_id, english, russian),
+                )
+            )
+
+    buffer = io.BytesIO()
+    genanki.Package(deck).write_to_file(buffer)
+    return buffer
+
+
+EXPORTERS = {
+    "csv": (export_csv, "zip"),
+    "json": (export_json, "json.gz"),
+    "apkg": (export_apkg, "apkg"),
+}
+
+
+def export_handler(update: Update, context: CallbackContext):
+    """Команда /export [csv|json|apkg]: выгрузка словаря, прогресса и истории сессий файлом."""
+    export_format = context.args[0].lower() if context.args else "csv"
+    if export_format not in EXPORTERS:
+        update.message.reply_text(f"Формат экспорта: /export {' | '.join(EXPORT_FORMATS)}")
+        return
+
+    user_id = update.effective_user.id
+    exporter, extension = EXPORTERS[export_format]
+    update.message.reply_text("⏳ Готовлю файл экспорта...")
+    try:
+        buffer = exporter(user_id)
+        size = len(buffer.getbuffer())
+        if size > MAX_DOCUMENT_SIZE:
+            update.message.reply_text("❌ Экспорт слишком большой для отправки в Telegram.")
+            return
+
+        buffer.seek(0)
+        context.bot.send_document(
+            chat_id=update.effective_chat.id,
+            document=buffer,
+            filename=f"english_learn_{date.today():%Y%m%d}.{extension}",
+        )
+        logger.info(f"Экспорт {export_format} для {user_id}: {size} байт")
+    except Exception as e:
+        logger.error(f"Ошибка экспорта для {user_id}: {e}")
+        update.message.reply_text("❌ Не удалось подготовить экспорт.")
@@ -0,0 +1,155 @@
+import logging
+import secrets
+from typing import Optional, Tuple
+
+from telegram import Update
+from telegram.ext import CallbackContext
+
+from src import db
+from src.config import LEADERBOARD_SIZE
+from src.handlers import current_lang_pair
+from src.languages import pair_title
+from src.word_management import pluralize_words
+
+logger = logging.getLogger(__name__)
+
+# Код приглашения: без похожих символов (0/O, 1/I), чтобы его было легко продиктовать
+INVITE_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+INVITE_CODE_LENGTH = 6
+MAX_TITLE_LENGTH = 100
+
+GROUP_CHAT_TYPES = ("group", "supergroup")
+
+
+def generate_invite_code(length: int = INVITE_CODE_LENGTH) -> str:
+    """Случайный код приглашения в класс."""
+    return "".join(secrets.choice(INVITE_ALPHABET) for _ in range(length))
+
+
+def _in_group_chat(update: Update) -> bool:
+    return update.effective_chat is not None and update.effective_chat.type in GROUP_CHAT_TYPES
+
+
+def _ensure_user(update: Update):
+    """Создаёт пользователя, если он пишет боту впервые (например, из группового чата)."""
+    user = update.effective_user
+    if not db.get_user(user.id):
+        db.create_user(user.id, user.username, user.first_name)
+
+
+def _resolve_group(update: Update, context: CallbackContext, owned: bool = False) -> Optional[Tuple]:
+    """Класс команды: по коду в аргументах, по групповому чату или последний класс пользователя."""
+    if context.args:
+        return db.find_group(invite_code=context.args[0].strip().upper())
+    if _in_group_chat(update):
+        return db.find_group(chat_id=update.effective_chat.id)
+    groups = db.get_user_groups(update.effective_user.id, owned=owned)
+    return groups[0] if groups else None
+
+
+def _display_name(first_name: Optional[str], username: Optional[str], user_id: int) -> str:
+    return first_name or (f"@{username}" if username else str(user_id))
+
+
+def class_create_handler(update: Update, context: CallbackContext):
+    """Команда /class_create Название: создание класса (в групповом чате — класса этого чата)."""
+    title = " ".join(context.args).strip()[:MAX_TITLE_LENGTH]
+    if not title:
+        update.message.reply_text("Использование: /class_create Название класса")
+        return
+
+    _ensure_user(update)
+    user_id = update.effective_user.id
+    chat_id = update.effective_chat.id if _in_group_chat(update) else None
+    if chat_id is not None and db.find_group(chat_id=chat_id):
+        update.message.reply_text("❌ У этого чата уже есть класс.")
+        return
+
+    pair = current_lang_pair(context, user_id)
+    group_id = None
+    # Совпадение случайного кода маловероятно, но возможно — тогда пробуем другой
+    for _ in range(3):
+        code = generate_invite_code()
+        group_id = db.create_group(user_id, title, code, pair, chat_id)
+        if group_id is not None:
+            break
+    if group_id is None:
+        update.message.reply_text("❌ Не удалось создать класс, попробуйте ещё раз.")
+        return
+
+    logger.info(f"Class {group_id} created by {user_id}")
+    update.message.reply_text(
+        f"🏫 Класс «{title}» создан ({pair_title(pair)}).\n"
+        f"Код для учеников: {code} — присоединиться: /join {code}\n"
+        "Добавьте слова в свой словарь и опубликуйте их командой /class_publish."
+    )
+
+
+def join_handler(update: Update, context: CallbackContext):
+    """Команда /join КОД: вступление в класс (в групповом чате код не нужен)."""
+    if not context.args and not _in_group_chat(update):
+        update.message.reply_text("Использование: /join КОД — код выдаёт учитель.")
+        return
+
+    group = _resolve_group(update, context)
+    if not group:
+        update.message.reply_text("❌ Класс не найден. Проверьте код.")
+        return
+
+    _ensure_user(update)
+    user_id = update.effective_user.id
+    group_id, title, _, pair, _ = group
+    if not db.join_group(group_id, user_id):
+        update.message.reply_text(f"Вы уже в классе «{title}».")
+        return
+
+    text = f"✅ Вы присоединились к классу «{title}». Слова класса добавлены в ваш словарь."
+    if current_lang_pair(context, user_id) != pair:
+        text += f"\nСлова класса в паре {pair_title(pair)} — переключиться: /lang {pair}"
+    update.message.reply_text(text)
+
+
+def class_publish_handler(update: Update, context: CallbackContext):
+    """Команда /class_publish [КОД]: публикация слов учителя всем ученикам класса."""
+    group = _resolve_group(update, context, owned=True)
+    user_id = update.effective_user.id
+    if not group or group[2] != user_id:
+        update.message.reply_text("❌ Публиковать слова может только учитель класса.")
+        return
+
+    group_id, title, _, pair, _ = group
+    published, total = db.publish_group_words(group_id)
+    if not total:
+        update.message.reply_text(f"📭 В вашем словаре нет слов пары {pair_title(pair)} для публикации.")
+        return
+    update.message.reply_text(
+        f"📚 Класс «{title}»: опубликовано новых слов — {published}, "
+        f"всего в списке {total} {pluralize_words(total)}."
+    )
+
+
+def leaderboard_handler(update: Update, context: CallbackContext):
+    """Команда /leaderboard [КОД]: таблица лидеров класса."""
+    group = _resolve_group(update, context)
+    if not group:
+        update.message.reply_text("Вы пока не состоите ни в одном классе. Вступить: /join КОД")
+        return
+
+    group_id, title, _, _, _ = group
+    leaders = db.get_leaderboard(group_id, LEADERBOARD_SIZE)
+    if not leaders:
+        update.message.reply_text(f"В классе «{title}» пока нет участников.")
+        return
+
+    medals = {1: "🥇", 2: "🥈", 3: "🥉"}
+    lines = [f"🏆 Класс «{title}»:"]
+    for position, (member_id, first_name, username, score) in enumerate(leaders, start=1):
+        name = _display_name(first_name, username, member_id)
+        lines.append(f"{medals.get(position, f'{position}.')} {name} — {score} {pluralize_words(score)}")
+
+    user_id = update.effective_user.id
+    if all(member_id != user_id for member_id, *_ in leaders):
+        rank = db.get_member_rank(group_id, user_id)
+        if rank:
+            lines.append(f"…\nВы: {rank[0]} место, {rank[1]} {pluralize_words(rank[1])}")
+    update.message.reply_text("\n".join(lines))
@@ -1,20 +1,27 @@
+import io
 import os
-import random
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import CallbackContext, ConversationHandler
 from dotenv import load_dotenv
 
 from src import db
-from src.quiz import QuizManager
-from src.keyboards import main_menu_keyboard, answer_keyboard
-from src.sberspeech_api import SberSpeechAPI
+from src.answer_log import answer_log
+from src.answer_matching import match_answer
+from src.quiz import QuizManager, QUIZ_MODES, MODE_EN_RU, MODE_RU_EN, MODE_TYPED
+from src.prefetch import get_buffer, schedule_refill
+from src.keyboards import main_menu_keyboard, answer_keyboard, parse_answer_callback_data
+from src.config import DEFAULT_LANG_PAIR, VOICE_MAX_SECONDS
+from src.languages import is_lang_pair, lookup_direction, pair_title, split_pair, supported_pairs
+from src.recognition import RecognitionService, score_pronunciation
+from src.speech import SpeechService
 from src.yandex_api import YandexDictionaryApi
 from src.session_manager import (
     update_session_timer,
     start_session,
     delete_bot_messages,
     send_message_with_tracking,
+    edit_or_send_with_tracking,
     save_session_data,
 )
 
@@ -22,6 +29,8 @@ from src.session_manager import (
 load_dotenv()
 logger = logging.getLogger(__name__)
 quiz = QuizManager(db)
+speech = SpeechService.from_config()
+recognizer = RecognitionService.from_config()
 
 # Инициализация API Яндекс.Словаря
 YANDEX_API_KEY = os.getenv("YANDEX_DICTIONARY_API_KEY")
@@ -29,6 +38,8 @@ if not YANDEX_API_KEY:
     raise ValueError("Yandex Dictionary API key not found.")
 yandex_api = YandexDictionaryApi(api_key=YANDEX_API_KEY)
 
+ANSWER_NOT_SAVED = "⚠️ Ответ не удалось сохранить — это слово встретится снова."
+
 
 def start_handler(update: Update, context: CallbackContext):
     """Обработчик команды /start."""
@@ -51,6 +62,14 @@ def start_handler(update: Update, context: CallbackContext):
     )
 
 
+def current_lang_pair(context: CallbackContext, user_id: int) -> str:
+    """Языковая пара пользователя: из данных сессии или из БД."""
+    pair = context.user_data.get("lang_pair")
+    if pair is None:
+        pair = context.user_data["lang_pair"] = db.get_lang_pair(user_id)
+    return pair
+
+
 def ask_question_handler(update: Update, context: CallbackContext):
     """Генерация нового вопроса и управление сессией."""
     message = update.message or (update.callback_query and update.callback_query.message)
@@ -63,52 +82,105 @@ def ask_question_handler(update: Update, context: CallbackContext):
     # Если сессия ещё не начата
     if "active_session" not in context.user_data or not context.user_data["active_session"]:
         start_session(update, context)
+        context.user_data["quiz_mode"] = db.get_quiz_mode(user_id)
+        context.user_data["lang_pair"] = db.get_lang_pair(user_id)
 
     # Обновление таймера сессии
     update_session_timer(context, user_id)
 
-    # Получение следующего вопроса
-    question = quiz.get_next_question(user_id)
+    # Следующий вопрос: из буфера предзагрузки или одним запросом к БД
+    mode = context.user_data.get("quiz_mode", MODE_EN_RU)
+    reverse = mode == MODE_RU_EN
+    pair = current_lang_pair(context, user_id)
+    buffer = get_buffer(context)
+    question = buffer.pop()
+    if not question:
+        bundles = quiz.get_question_batch(user_id, 1, reverse=reverse, exclude=buffer.exclude_keys(), pair=pair)
+        question = quiz.build_question(bundles[0], mode, pair) if bundles else None
+        if question:
+            buffer.mark_served(question)
+
+    send_question(update, context, question)
+    schedule_refill(context, quiz, user_id, mode, reverse)
+
+
+def send_question(update: Update, context: CallbackContext, question, feedback: str = None):
+    """Показ готового вопроса (слово + перемешанные варианты).
+
+    Вопросы сессии показываются в одном сообщении, которое редактируется
+    на месте; `feedback` выводится над текстом вопроса.
+    """
+    user_id = update.effective_user.id
+    quiz_message_id = context.user_data.get("quiz_message_id")
     if not question:
         if context.user_data.get("active_session"):
             save_session_data(user_id, context)
             context.user_data.clear()
             keyboard = [[InlineKeyboardButton("Начать заново 🔄", callback_data="reset_progress")]]
-            send_message_with_tracking(
+            message_id = edit_or_send_with_tracking(
                 update,
                 context,
+                quiz_message_id,
                 text="🎉 Вы изучили все слова! Отличная работа!",
                 reply_markup=InlineKeyboardMarkup(keyboard),
             )
+            if message_id == quiz_message_id:
+                context.user_data.setdefault("bot_messages", []).append(message_id)
         return
 
-    try:
-        word_en, word_ru, word_type, word_id = question
-    except Exception as e:
-        logger.error(f"Error unpacking question data: {e}")
-        return
-
-    wrong_answers = list(
-        {ans.lower() for ans in quiz.get_wrong_answers(word_ru) if ans.lower() != word_ru.lower()}
-    )[:3]
-    options = [word_ru.capitalize()] + [ans.capitalize() for ans in wrong_answers]
-    random.shuffle(options)
-
-    context.user_data["current_question"] = {
-        "word_en": word_en,
-        "correct_answer": word_ru.capitalize(),
-        "word_id": word_id,
-        "word_type": word_type,
-        "options": options,
-    }
-
-    send_message_with_tracking(
+    text = f"{feedback}\n\n{question['prompt']}" if feedback else question["prompt"]
+    context.user_data["quiz_message_id"] = edit_or_send_with_tracking(
         update,
         context,
-        text=f"Переведи слово: *{word_en.capitalize()}*",
+        quiz_message_id,
+        text=text,
         parse_mode="Markdown",
-        reply_markup=answer_keyboard(options),
+        reply_markup=answer_keyboard(question["options"], question["token"]) if question["options"] else None,
     )
+    context.user_data["current_question"] = question
+
+
+def advance_quiz(update: Update, context: CallbackContext, feedback: str = None):
+    """Засчитывает правильный ответ и переходит к следующему вопросу."""
+    user_id = update.effective_user.id
+    current_question = context.user_data.pop("current_question")
+    mode = current_question.get("mode", MODE_EN_RU)
+    reverse = mode == MODE_RU_EN
+    pair = current_question.get("pair", DEFAULT_LANG_PAIR)
+    buffer = get_buffer(context)
+    active = context.user_data.get("active_session")
+
+    # Ответ записывается в потоке обработчика; если в буфере есть готовый вопрос,
+    # следующий вопрос не выбирается, в фоне остаётся только пополнение буфера
+    question = buffer.pop() if active else None
+    prefetched = question is not None
+    bundles = quiz.record_answer_and_next(
+        user_id,
+        current_question["word_id"],
+        current_question["word_type"],
+        context.user_data.get("session_start"),
+        reverse=reverse,
+        count=0 if prefetched else 1,
+        exclude=buffer.exclude_keys(),
+        pair=pair,
+    )
+    if bundles is None:
+        feedback = "\n".join(filter(None, [feedback, ANSWER_NOT_SAVED]))
+        # Ошибка БД — не конец слов: без готового вопроса повторяется текущий
+        if not prefetched:
+            question = current_question
+    elif not prefetched:
+        question = quiz.build_question(bundles[0], mode, pair) if bundles else None
+        if question:
+            buffer.mark_served(question)
+
+    if active:
+        # Следующий вопрос заменяет текущий в том же сообщении
+        update_session_timer(context, user_id)
+        send_question(update, context, question, feedback)
+        schedule_refill(context, quiz, user_id, mode, reverse)
+    else:
+        ask_question_handler(update, context)
 
 
 def button_click_handler(update: Update, context: CallbackContext):
@@ -118,41 +190,162 @@ def button_click_handler(update: Update, context: CallbackContext):
         query.answer("❌ Сессия устарела. Начните новый тест.")
         return
 
-    data = query.data.split("_")
-    if len(data) < 2:
+    parsed = parse_answer_callback_data(query.data)
+    if not parsed:
         query.answer("Некорректный ответ.")
         return
 
-    user_answer = data[1]
+    token, index = parsed
     current_question = context.user_data["current_question"]
-    correct_answer = current_question["correct_answer"]
-    word_id = current_question["word_id"]
-    word_type = current_question["word_type"]
-    user_id = update.effective_user.id
+    if token != current_question.get("token"):
+        query.answer("❌ Этот вопрос уже неактуален.")
+        return
+    if index >= len(current_question["options"]):
+        query.answer("Некорректный ответ.")
+        return
 
-    if user_answer.lower() == correct_answer.lower():
-        if not db.check_word_progress(user_id, word_id, word_type):
-            session_start = context.user_data.get("session_start")
-            quiz.mark_word_seen(user_id, word_id, word_type, session_start)
-        del context.user_data["current_question"]
+    user_id = update.effective_user.id
+    if index == current_question["correct_index"]:
+        answer_log.record(user_id, current_question, correct=True)
         query.answer(quiz.get_correct_response())
-
-        try:
-            context.bot.delete_message(chat_id=query.message.chat.id, message_id=query.message.message_id)
-        except Exception as e:
-            logger.error(f"Error deleting message: {e}")
-
-        ask_question_handler(update, context)
+        advance_quiz(update, context)
     else:
-        options = current_question["options"]
-        random.shuffle(options)
-        try:
-            query.edit_message_reply_markup(reply_markup=answer_keyboard(options))
-        except Exception as e:
-            logger.warning(f"Error updating keyboard: {e}")
+        chosen = current_question["options"][index]
+        answer_log.record(user_id, current_question, correct=False, answer=chosen)
+        quiz.register_confusion(
+            current_question["correct_answer"], chosen, current_question.get("pair", DEFAULT_LANG_PAIR)
+        )
         query.answer(quiz.get_incorrect_response())
 
 
+def typed_answer_handler(update: Update, context: CallbackContext):
+    """Проверка перевода, введённого текстом (режим ввода)."""
+    current_question = context.user_data.get("current_question")
+    if not current_question or current_question.get("mode") != MODE_TYPED:
+        return
+
+    context.user_data.setdefault("user_messages", []).append(update.message.message_id)
+
+    accepted, exact = match_answer(update.message.text, current_question["expected"])
+    answer_log.record(update.effective_user.id, current_question, correct=accepted, answer=update.message.text)
+    if not accepted:
+        # Реакция выводится в том же сообщении с вопросом
+        send_question(update, context, current_question, quiz.get_incorrect_response())
+        return
+
+    feedback = quiz.get_correct_response()
+    if not exact:
+        feedback += f"\nПравильное написание: *{current_question['correct_answer']}*"
+    advance_quiz(update, context, feedback)
+
+
+def quiz_mode_handler(update: Update, context: CallbackContext):
+    """Команда /mode: выбор режима викторины."""
+    current = db.get_quiz_mode(update.effective_user.id)
+    keyboard = [
+        [InlineKeyboardButton(("• " if mode == current else "") + title, callback_data=f"mode_{mode}")]
+        for mode, title in QUIZ_MODES.items()
+    ]
+    send_message_with_tracking(
+        update,
+        context,
+        text="Выберите режим теста:",
+        reply_markup=InlineKeyboardMarkup(keyboard),
+    )
+
+
+def quiz_mode_select_handler(update: Update, context: CallbackContext):
+    """Сохранение выбранного режима викторины."""
+    query = update.callback_query
+    mode = query.data[len("mode_"):]
+    if mode not in QUIZ_MODES:
+        query.answer("Неизвестный режим.")
+        return
+
+    db.set_quiz_mode(update.effective_user.id, mode)
+    context.user_data["quiz_mode"] = mode
+    # Вопросы в буфере подготовлены для прежнего режима
+    context.user_data.pop("question_buffer", None)
+    query.answer(f"Режим: {QUIZ_MODES[mode]}")
+    try:
+        query.edit_message_text(f"✅ Режим теста: {QUIZ_MODES[mode]}")
+    except Exception as e:
+        logger.warning(f"Error updating mode message: {e}")
+
+
+def available_lang_pairs(current: str) -> list:
+    """Пары с тем же родным языком, что и у текущей, доступные в Яндекс.Словаре."""
+    langs = yandex_api.get_langs()
+    if not langs:
+        return [current]
+    pairs = supported_pairs(langs, native_lang=split_pair(current)[1])
+    return pairs if current in pairs else [current] + pairs
+
+
+def build_pair_indexes(context: CallbackContext):
+    """Задача job_queue: частичные индексы новой языковой пары.
+
+    CREATE INDEX CONCURRENTLY ждёт открытых транзакций и читает весь
+    каталог, поэтому строится вне потока обработки обновлений; до
+    окончания тест работает по общему составному индексу.
+    """
+    db.ensure_lang_pair(context.job.context)
+
+
+def apply_lang_pair(context: CallbackContext, user_id: int, pair: str):
+    """Сохраняет новую языковую пару и сбрасывает подготовленные для прежней вопросы."""
+    db.set_lang_pair(user_id, pair)
+    if not db.has_pair_indexes(pair):
+        context.job_queue.run_once(build_pair_indexes, when=0, context=pair)
+    quiz.catalog(pair)
+    context.user_data["lang_pair"] = pair
+    context.user_data.pop("question_buffer", None)
+
+
+def lang_handler(update: Update, context: CallbackContext):
+    """Команда /lang: выбор изучаемого языка (/lang de-ru — сразу указать пару)."""
+    user_id = update.effective_user.id
+    current = db.get_lang_pair(user_id)
+
+    if context.args:
+        pair = context.args[0].strip().lower()
+        langs = yandex_api.get_langs()
+        if not is_lang_pair(pair) or (langs and lookup_direction(pair) not in langs):
+            send_message_with_tracking(update, context, text=f"❌ Языковая пара {pair} не поддерживается.")
+            return
+        apply_lang_pair(context, user_id, pair)
+        send_message_with_tracking(update, context, text=f"✅ Изучаемый язык: {pair_title(pair)}")
+        return
+
+    keyboard = [
+        [InlineKeyboardButton(("• " if pair == current else "") + pair_title(pair), callback_data=f"lang_{pair}")]
+        for pair in available_lang_pairs(current)
+    ]
+    send_message_with_tracking(
+        update,
+        context,
+        text="Выберите изучаемый язык:",
+        reply_markup=InlineKeyboardMarkup(keyboard),
+    )
+
+
+def lang_select_handler(update: Update, context: CallbackContext):
+    """Сохранение выбранной языковой пары."""
+    query = update.callback_query
+    pair = query.data[len("lang_"):]
+    user_id = update.effective_user.id
+    if pair not in available_lang_pairs(db.get_lang_pair(user_id)):
+        query.answer("Языковая пара не поддерживается.")
+        return
+
+    apply_lang_pair(context, user_id, pair)
+    query.answer(f"Язык: {pair_title(pair)}")
+    try:
+        query.edit_message_text(f"✅ Изучаемый язык: {pair_title(pair)}")
+    except Exception as e:
+        logger.warning(f"Error updating language message: {e}")
+
+
 def pronounce_word_handler(update: Update, context: CallbackContext):
     """Обработчик для воспроизведения произношения текущего слова."""
     query = update.callback_query
@@ -165,28 +358,67 @@ def pronounce_word_handler(update: Update, context: CallbackContext):
 
     word = current_question["word_en"]
     try:
-        sber_speech = SberSpeechAPI()
-        audio_file = sber_speech.synthesize_text(word)
-
-        if audio_file:
-            with open(audio_file, "rb") as audio:
-                message = context.bot.send_audio(chat_id=query.message.chat.id, audio=audio)
-                if "bot_messages" not in context.user_data:
-                    context.user_data["bot_messages"] = []
-                context.user_data["bot_messages"].append(message.message_id)
-            logger.info(f"Word '{word}' pronounced successfully.")
+        result = speech.synthesize(word)
+        if result:
+            # Аудио отправляется из памяти: голосовым сообщением, если формат позволяет
+            if result.voice:
+                message = context.bot.send_voice(chat_id=query.message.chat.id, voice=io.BytesIO(result.audio))
+            else:
+                message = context.bot.send_audio(
+                    chat_id=query.message.chat.id,
+                    audio=io.BytesIO(result.audio),
+                    filename=f"{word}.{result.extension}",
+                )
+            context.user_data.setdefault("bot_messages", []).append(message.message_id)
+            logger.info(f"Word '{word}' pronounced successfully ({result.backend}).")
         else:
             logger.error("Audio synthesis failed.")
             query.answer("❌ Произошла ошибка при озвучивании слова.", show_alert=True)
 
-    except FileNotFoundError as e:
-        logger.error(f"Audio file not found: {e}")
-        query.answer("❌ Не удалось найти файл произношения.", show_alert=True)
     except Exception as e:
         logger.error(f"Error in pronounce_word_handler: {e}")
         query.answer("❌ Возникла ошибка при обработке запроса.", show_alert=True)
 
 
+def voice_answer_handler(update: Update, context: CallbackContext):
+    """Оценка произношения текущего слова по голосовому сообщению."""
+    current_question = context.user_data.get("current_question")
+    if not current_question or "word_en" not in current_question:
+        return
+
+    message = update.message
+    context.user_data.setdefault("user_messages", []).append(message.message_id)
+    if not recognizer.available():
+        send_message_with_tracking(update, context, text="🎙 Проверка произношения сейчас недоступна.")
+        return
+    if message.voice.duration > VOICE_MAX_SECONDS:
+        send_message_with_tracking(
+            update, context, text=f"🎙 Запишите только слово — сообщение не длиннее {VOICE_MAX_SECONDS} с."
+        )
+        return
+
+    word = current_question["word_en"]
+    try:
+        audio = bytes(message.voice.get_file().download_as_bytearray())
+    except Exception as e:
+        logger.error(f"Error downloading voice message: {e}")
+        audio = None
+    result = recognizer.recognize(audio, word) if audio else None
+
+    if result is None:
+        text = "😕 Не удалось распознать речь, попробуйте ещё раз."
+    else:
+        accepted, exact = score_pronunciation(result.text, word)
+        if exact:
+            text = f"🎯 Отлично! Слово *{word}* произнесено верно."
+        elif accepted:
+            text = f"👍 Почти! Распознано: «{result.text}», правильно: *{word}*."
+        else:
+            heard = f"«{result.text}»" if result.text else "ничего"
+            text = f"🔁 Распознано: {heard}. Попробуйте ещё раз: *{word}*."
+    send_message_with_tracking(update, context, text=text, parse_mode="Markdown")
+
+
 def handle_menu_button(update: Update, context: CallbackContext):
     """Обработка нажатия на кнопку 'В меню ↩️'."""
     # Сохраняем ID сообщения пользователя (текст кнопки)
@@ -0,0 +1,281 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from telegram import InlineQueryResultArticle, InputTextMessageContent, Update
+from telegram.ext import CallbackContext
+
+from src import db
+from src.config import (
+    INLINE_CACHE_TIME,
+    INLINE_LOOKUP_CACHE_SIZE,
+    INLINE_LOOKUP_MIN_LENGTH,
+    INLINE_PAGE_SIZE,
+    INLINE_USER_CACHE_SIZE,
+)
+from src.handlers import current_lang_pair, yandex_api
+from src.languages import is_word_in_language, lookup_direction, split_pair
+from src.similarity import normalize
+
+logger = logging.getLogger(__name__)
+
+# Сколько переводов брать из каждого значения в ответе Яндекс.Словаря
+TRANSLATIONS_PER_DEFINITION = 3
+
+
+class PrefixIndex:
+    """Отсортированный массив (ключ, пара) с поиском по префиксу через bisect.
+
+    Каждая пара (слово, перевод) доступна и по слову, и по переводу.
+    Массив не меняется на месте: добавление создаёт новую копию, поэтому
+    поиск идёт без блокировок по снимку, взятому одним чтением атрибута.
+    """
+
+    def __init__(self):
+        self._items: List[Tuple[str, Tuple[str, str]]] = []
+        self._lock = threading.Lock()
+        self.ready = threading.Event()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @staticmethod
+    def _keyed(pairs: Iterable[Tuple[str, str]]) -> Iterator[Tuple[str, Tuple[str, str]]]:
+        for word, translation in pairs:
+            entry = (word, translation)
+            yield normalize(word), entry
+            yield normalize(translation), entry
+
+    def build(self, pairs: Iterable[Tuple[str, str]]):
+        """Полная сборка индекса."""
+        items = sorted(set(self._keyed(pairs)))
+        with self._lock:
+            self._items = items
+        self.ready.set()
+
+    def add(self, pairs: Iterable[Tuple[str, str]]):
+        """Добавление пар с сохранением порядка (копия массивов)."""
+        with self._lock:
+            items = list(self._items)
+            for item in self._keyed(pairs):
+                position = bisect_left(items, item)
+                if position == len(items) or items[position] != item:
+                    items.insert(position, item)
+            self._items = items
+
+    def search(self, prefix: str) -> Iterator[Tuple[str, str]]:
+        """Пары, у которых слово или перевод начинается с `prefix`, по алфавиту."""
+        items = self._items
+        prefix = normalize(prefix)
+        # Кортеж из одного ключа меньше любого (ключ, пара) с тем же ключом
+        position = bisect_left(items, (prefix,))
+        while position < len(items) and items[position][0].startswith(prefix):
+            yield items[position][1]
+            position += 1
+
+
+class InlineDictionary:
+    """Поиск перевода для inline-режима.
+
+    Источники в порядке выдачи: слова пользователя, каталог языковой пары
+    (common_words и глобальный словарь lexemes) и результаты Яндекс.Словаря.
+    Каталог строится в фоне при первом обращении к паре и периодически
+    перестраивается задачей job_queue, чтобы в нём появлялись слова из
+    импорта словарей; слова, добавленные пользователями, попадают в него
+    сразу. Индекс слов пользователя загружается одним запросом и живёт в
+    LRU-кэше не дольше INLINE_CACHE_TIME — столько же Telegram кэширует
+    сами ответы.
+    """
+
+    def __init__(
+        self,
+        user_cache_size: int = INLINE_USER_CACHE_SIZE,
+        user_ttl: float = INLINE_CACHE_TIME,
+        lookup_cache_size: int = INLINE_LOOKUP_CACHE_SIZE,
+    ):
+        self.user_cache_size = user_cache_size
+        self.user_ttl = user_ttl
+        self.lookup_cache_size = lookup_cache_size
+        self.catalogs: Dict[str, PrefixIndex] = {}
+        self._user_indexes: "OrderedDict[Tuple[int, str], Tuple[float, PrefixIndex]]" = OrderedDict()
+        self._lookups: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+        # Переводы из Яндекс.Словаря есть только в памяти: перестроение каталога их сохраняет
+        self._remote_pairs: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    def catalog(self, pair: str) -> PrefixIndex:
+        """Индекс каталога пары; при первом обращении запускается его построение в фоне."""
+        with self._lock:
+            index = self.catalogs.get(pair)
+            if index is None:
+                index = self.catalogs[pair] = PrefixIndex()
+                threading.Thread(
+                    target=self._build_catalog, args=(index, pair), name=f"inline-index-{pair}", daemon=True
+                ).start()
+            return index
+
+    def _build_catalog(self, index: PrefixIndex, pair: str):
+        try:
+            with db.pooled():
+                pairs = db.get_all_word_pairs(pair)
+            with self._lock:
+                remote = list(self._remote_pairs.get(pair, ()))
+            index.build(pairs + remote)
+            logger.info(f"Inline-индекс {pair} построен: {len(index)} ключей")
+        except Exception as e:
+            logger.error(f"Ошибка построения inline-индекса {pair}: {e}")
+
+    def refresh_catalogs(self):
+        """Перестраивает уже загруженные каталоги пар по текущему содержимому БД."""
+        with self._lock:
+            catalogs = [(pair, index) for pair, index in self.catalogs.items() if index.ready.is_set()]
+        for pair, index in catalogs:
+            self._build_catalog(index, pair)
+
+    def add_to_catalog(self, pair: str, pairs: List[Tuple[str, str]]):
+        """Добавляет новые пары (слово, перевод) в каталог, если он уже построен."""
+        with self._lock:
+            index = self.catalogs.get(pair)
+        if index is not None and index.ready.is_set():
+            index.add(pairs)
+
+    def user_index(self, user_id: int, pair: str) -> PrefixIndex:
+        """Индекс слов пользователя в паре (из кэша или одним запросом к БД)."""
+        key = (user_id, pair)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._user_indexes.get(key)
+            if cached is not None and now - cached[0] < self.user_ttl:
+                self._user_indexes.move_to_end(key)
+                return cached[1]
+
+        # Inline-запросы обрабатываются в пуле потоков: у запроса своё соединение
+        with db.pooled():
+            words = db.get_user_words(user_id, pair)
+        index = PrefixIndex()
+        index.build(words)
+        with self._lock:
+            self._user_indexes[key] = (now, index)
+            self._user_indexes.move_to_end(key)
+            while len(self._user_indexes) > self.user_cache_size:
+                self._user_indexes.popitem(last=False)
+        return index
+
+    def forget_user(self, user_id: int):
+        """Сбрасывает индексы пользователя после изменения его словаря."""
+        with self._lock:
+            for key in [key for key in self._user_indexes if key[0] == user_id]:
+                del self._user_indexes[key]
+
+    def search(
+        self, user_id: int, pair: str, query: str, offset: int = 0, limit: int = INLINE_PAGE_SIZE
+    ) -> Tuple[List[Tuple[str, str]], Optional[int]]:
+        """Страница результатов и смещение следующей страницы (None — страниц больше нет)."""
+        query = query.strip()
+        page = self._page(user_id, pair, query, offset, limit)
+        if not page and not offset and self._lookup_remote(query, pair):
+            page = self._page(user_id, pair, query, offset, limit)
+        if len(page) > limit:
+            return page[:limit], offset + limit
+        return page, None
+
+    def _page(self, user_id: int, pair: str, query: str, offset: int, limit: int) -> List[Tuple[str, str]]:
+        return list(islice(self._matches(user_id, pair, query), offset, offset + limit + 1))
+
+    def _matches(self, user_id: int, pair: str, query: str) -> Iterator[Tuple[str, str]]:
+        seen = set()
+        sources = [self.user_index(user_id, pair)]
+        catalog = self.catalog(pair)
+        # Пустой запрос показывает только слова пользователя, а не весь каталог по алфавиту
+        if query and catalog.ready.is_set():
+            sources.append(catalog)
+        for index in sources:
+            for entry in index.search(query):
+                if entry not in seen:
+                    seen.add(entry)
+                    yield entry
+
+    def _lookup_remote(self, query: str, pair: str) -> bool:
+        """Запрос к Яндекс.Словарю при промахе; найденные переводы добавляются в каталог.
+
+        Каждое слово запрашивается не чаще одного раза за время жизни кэша,
+        в том числе если перевода не нашлось. Пока каталог строится, запрос
+        не выполняется: сборка заменила бы добавленные переводы.
+        """
+        if yandex_api is None or len(query) < INLINE_LOOKUP_MIN_LENGTH or " " in query:
+            return False
+        catalog = self.catalog(pair)
+        if not catalog.ready.is_set():
+            return False
+        _, native_lang = split_pair(pair)
+        from_native = is_word_in_language(query.lower(), native_lang)
+        direction = lookup_direction(pair) if from_native else pair
+        key = (direction, normalize(query))
+        with self._lock:
+            if key in self._lookups:
+                return False
+            self._lookups[key] = None
+            while len(self._lookups) > self.lookup_cache_size:
+                self._lookups.popitem(last=False)
+
+        data = yandex_api.lookup(query, direction) or {}
+        pairs = []
+        for definition in data.get("def", []):
+            source = definition.get("text", "").lower()
+            for translation in definition.get("tr", [])[:TRANSLATIONS_PER_DEFINITION]:
+                target = translation.get("text", "").lower()
+                if source and target:
+                    pairs.append((target, source) if from_native else (source, target))
+        if pairs:
+            with self._lock:
+                self._remote_pairs.setdefault(pair, set()).update(pairs)
+            catalog.add(pairs)
+        return bool(pairs)
+
+
+dictionary = InlineDictionary()
+
+
+def refresh_inline_catalogs(context: CallbackContext = None):
+    """Периодическая задача job_queue: перестроение каталогов inline-поиска."""
+    try:
+        dictionary.refresh_catalogs()
+    except Exception as e:
+        logger.error(f"Ошибка обновления inline-каталогов: {e}")
+
+
+def inline_query_handler(update: Update, context: CallbackContext):
+    """Inline-режим: «@бот слово» в любом чате — перевод по префиксу слова."""
+    inline_query = update.inline_query
+    user_id = inline_query.from_user.id
+    # Соединение из пула берётся только на время чтения из БД, не на запрос к Яндекс.Словарю
+    with db.pooled():
+        pair = current_lang_pair(context, user_id)
+    try:
+        offset = max(int(inline_query.offset or 0), 0)
+    except ValueError:
+        offset = 0
+
+    entries, next_offset = dictionary.search(user_id, pair, inline_query.query, offset)
+    results = [
+        InlineQueryResultArticle(
+            id=str(offset + position),
+            title=f"{word.capitalize()} — {translation}",
+            description=pair,
+            input_message_content=InputTextMessageContent(f"{word.capitalize()} — {translation}"),
+        )
+        for position, (word, translation) in enumerate(entries)
+    ]
+    try:
+        inline_query.answer(
+            results,
+            cache_time=INLINE_CACHE_TIME,
+            is_personal=True,
+            next_offset=str(next_offset) if next_offset is not None else "",
+        )
+    except Exception as e:
+        logger.error(f"Ошибка ответа на inline-запрос: {e}")
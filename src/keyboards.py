@@ -1,67 +1,152 @@
-from telegram import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardButton, InlineKeyboardMarkup
+import json
+from functools import lru_cache
+from typing import Tuple
 
-# Общая кнопка для возврата в меню
-MENU_BUTTON = KeyboardButton("В меню ↩️")
+from telegram import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardButton, InlineKeyboardMarkup, ReplyMarkup
 
+# Тексты кнопок меню. Из них строятся и клавиатуры, и таблица маршрутов
+# в main.py (MenuRouter), поэтому текст кнопки задаётся только здесь.
+BUTTON_START_QUIZ = "Начать тест 🚀"
+BUTTON_ADD_WORD = "Добавить слово ➕"
+BUTTON_DELETE_WORD = "Удалить слово ➖"
+BUTTON_STATS = "Ваша статистика 📊"
+BUTTON_MY_WORDS = "Мои слова 📖"
+BUTTON_ADD_MORE = "Добавить ещё ➕"
+BUTTON_DELETE_MORE = "Удалить ещё ➖"
+BUTTON_CLEAR = "Очистить 🗑"
+BUTTON_BACK = "Назад ↩️"
+BUTTON_TO_MENU = "В меню ↩️"
 
-def main_menu_keyboard():
-    """Клавиатура для главного меню."""
+# Раскладки статических клавиатур: имя -> строки кнопок
+LAYOUTS = {
+    "main_menu": [
+        [BUTTON_START_QUIZ],
+        [BUTTON_DELETE_WORD, BUTTON_ADD_WORD],
+        [BUTTON_STATS, BUTTON_MY_WORDS],
+    ],
+    "add_more": [[BUTTON_ADD_MORE, BUTTON_BACK]],
+    "delete_more": [[BUTTON_DELETE_MORE, BUTTON_BACK]],
+    "session": [[BUTTON_TO_MENU]],
+    "stats": [[BUTTON_CLEAR, BUTTON_BACK]],
+}
+
+# Все тексты кнопок — чтобы свободный ввод не принимал нажатие кнопки за слово
+MENU_BUTTONS = frozenset(text for layout in LAYOUTS.values() for row in layout for text in row)
+
+# Сколько раскладок клавиатуры ответов хранить готовыми
+ANSWER_KEYBOARD_CACHE_SIZE = 512
+
+
+class PreparedMarkup(ReplyMarkup):
+    """Клавиатура, сериализованная в JSON заранее и неизменяемая.
+
+    Bot превращает reply_markup в JSON при каждой отправке (`to_json`);
+    для этого объекта он получает готовую строку, без обхода кнопок.
+    """
+
+    __slots__ = ("_payload",)
+
+    def __init__(self, payload: str):
+        object.__setattr__(self, "_payload", payload)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("готовая клавиатура неизменяема")
+
+    @classmethod
+    def from_markup(cls, markup: ReplyMarkup) -> "PreparedMarkup":
+        return cls(markup.to_json())
+
+    def to_json(self) -> str:
+        return self._payload
+
+    def to_dict(self) -> dict:
+        return json.loads(self._payload)
+
+
+def _reply_keyboard(layout) -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton("Начать тест 🚀")],
-            [KeyboardButton("Удалить слово ➖"), KeyboardButton("Добавить слово ➕")],
-            [KeyboardButton("Ваша статистика 📊"), KeyboardButton("Мои слова 📖")],
-        ],
+        keyboard=[[KeyboardButton(text) for text in row] for row in layout],
         resize_keyboard=True,
     )
 
 
+# Реестр статических клавиатур: каждая собирается и сериализуется один раз при импорте
+KEYBOARDS = {name: PreparedMarkup.from_markup(_reply_keyboard(layout)) for name, layout in LAYOUTS.items()}
+
+
+def main_menu_keyboard():
+    """Клавиатура для главного меню."""
+    return KEYBOARDS["main_menu"]
+
+
 def add_more_keyboard():
     """Клавиатура для добавления слов."""
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton("Добавить ещё ➕"), KeyboardButton("Назад ↩️")],
-        ],
-        resize_keyboard=True,
-    )
+    return KEYBOARDS["add_more"]
 
 
 def delete_more_keyboard():
     """Клавиатура для удаления слов."""
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton("Удалить ещё ➖"), KeyboardButton("Назад ↩️")],
-        ],
-        resize_keyboard=True,
-    )
+    return KEYBOARDS["delete_more"]
 
 
 def session_keyboard():
     """Клавиатура для сессии."""
-    return ReplyKeyboardMarkup(
-        keyboard=[[MENU_BUTTON]],
-        resize_keyboard=True,
-    )
+    return KEYBOARDS["session"]
 
 
 def stats_keyboard():
     """Клавиатура для статистики."""
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton("Очистить 🗑"), KeyboardButton("Назад ↩️")],
-        ],
-        resize_keyboard=True,
-    )
+    return KEYBOARDS["stats"]
 
 
-def answer_keyboard(options):
-    """Клавиатура с вариантами ответов."""
-    return InlineKeyboardMarkup(
+# Префикс callback_data ответа: "a:<токен вопроса>:<номер варианта>"
+ANSWER_PREFIX = "a"
+
+
+def answer_callback_data(token: str, index: int) -> str:
+    """Компактные callback_data варианта ответа (укладываются в лимит Telegram в 64 байта)."""
+    return f"{ANSWER_PREFIX}:{token}:{index}"
+
+
+def parse_answer_callback_data(data: str):
+    """Разбор callback_data ответа в пару (токен, номер варианта) или None."""
+    parts = data.split(":")
+    if len(parts) != 3 or parts[0] != ANSWER_PREFIX or not parts[2].isdigit():
+        return None
+    return parts[1], int(parts[2])
+
+
+# Заполнитель токена в шаблоне клавиатуры ответов. Символ NUL не встречается
+# в вариантах ответа (PostgreSQL не хранит его в тексте), а json.dumps
+# записывает его как \u0000 — по этой последовательности шаблон и режется.
+_TOKEN_PLACEHOLDER = "\0"
+_TOKEN_PLACEHOLDER_JSON = "\\u0000"
+
+
+@lru_cache(maxsize=ANSWER_KEYBOARD_CACHE_SIZE)
+def _answer_keyboard_template(options: Tuple[str, ...]) -> Tuple[str, ...]:
+    """JSON клавиатуры с вариантами, разрезанный по месту токена вопроса."""
+    markup = InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(opt, callback_data=f"answer_{opt}") for opt in options[i : i + 2]]
+            [
+                InlineKeyboardButton(opt, callback_data=answer_callback_data(_TOKEN_PLACEHOLDER, index))
+                for index, opt in enumerate(options[i : i + 2], start=i)
+            ]
             for i in range(0, len(options), 2)
         ]
     )
+    return tuple(markup.to_json().split(_TOKEN_PLACEHOLDER_JSON))
+
+
+def answer_keyboard(options, token):
+    """Клавиатура с вариантами ответов.
+
+    Текст варианта в callback_data не передаётся: кнопка несёт только токен
+    вопроса и номер варианта, а сами варианты хранятся на стороне бота.
+    Раскладка для набора вариантов сериализуется один раз (LRU), для
+    вопроса в неё подставляется только токен.
+    """
+    return PreparedMarkup(token.join(_answer_keyboard_template(tuple(options))))
 
 
 def send_pronounce_button(chat_id, context):
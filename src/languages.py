@@ -0,0 +1,106 @@
+import re
+from typing import Iterable, List, Tuple
+
+from src.config import DEFAULT_LANG_PAIR
+
+# Языковая пара "изучаемый-родной", как в users.lang_pair: "en-ru" — английский для русскоязычных
+_PAIR_PATTERN = re.compile(r"^[a-z]{2,3}-[a-z]{2,3}$")
+
+# Названия языков в именительном падеже («на английский»); предложный падеж строится от них
+LANGUAGE_NAMES = {
+    "be": "белорусский",
+    "bg": "болгарский",
+    "cs": "чешский",
+    "da": "датский",
+    "de": "немецкий",
+    "el": "греческий",
+    "en": "английский",
+    "es": "испанский",
+    "et": "эстонский",
+    "fi": "финский",
+    "fr": "французский",
+    "hu": "венгерский",
+    "it": "итальянский",
+    "lt": "литовский",
+    "lv": "латышский",
+    "nl": "нидерландский",
+    "no": "норвежский",
+    "pl": "польский",
+    "pt": "португальский",
+    "ru": "русский",
+    "sk": "словацкий",
+    "sv": "шведский",
+    "tr": "турецкий",
+    "tt": "татарский",
+    "uk": "украинский",
+    "zh": "китайский",
+}
+
+# Допустимые символы слова для языков с проверкой по алфавиту; для остальных — любые буквы
+_WORD_PATTERNS = {
+    "ru": re.compile(r"^[а-яё\-]+$"),
+    "uk": re.compile(r"^[а-щьюяєіїґ'\-]+$"),
+    "en": re.compile(r"^[a-z'\-]+$"),
+}
+
+
+def is_lang_pair(value: str) -> bool:
+    """Похожа ли строка на языковую пару ('en-ru')."""
+    return bool(_PAIR_PATTERN.match(value or ""))
+
+
+def split_pair(pair: str) -> Tuple[str, str]:
+    """Пара -> (изучаемый язык, родной язык)."""
+    source_lang, target_lang = pair.split("-")
+    return source_lang, target_lang
+
+
+def lookup_direction(pair: str) -> str:
+    """Направление запроса к словарю при добавлении слова: с родного языка на изучаемый."""
+    source_lang, target_lang = split_pair(pair)
+    return f"{target_lang}-{source_lang}"
+
+
+def language_name(lang: str) -> str:
+    """Название языка в именительном падеже ('английский'); для неизвестных — код."""
+    return LANGUAGE_NAMES.get(lang, lang.upper())
+
+
+def language_name_prepositional(lang: str) -> str:
+    """Название языка в предложном падеже ('английском')."""
+    name = language_name(lang)
+    return name[:-2] + "ом" if name.endswith("ий") else name
+
+
+def pair_title(pair: str) -> str:
+    """Подпись пары для кнопок и сообщений: 'Английский (en-ru)'."""
+    source_lang, _ = split_pair(pair)
+    return f"{language_name(source_lang).capitalize()} ({pair})"
+
+
+def is_word_in_language(text: str, lang: str) -> bool:
+    """Проверяет, что строка — одно слово из букв языка `lang`."""
+    pattern = _WORD_PATTERNS.get(lang)
+    if pattern:
+        return bool(pattern.match(text))
+    stripped = text.replace("-", "").replace("'", "")
+    return stripped.isalpha()
+
+
+def supported_pairs(directions: Iterable[str], native_lang: str = None) -> List[str]:
+    """Пары, доступные по направлениям словаря ('ru-en' -> пара 'en-ru').
+
+    С `native_lang` остаются только пары с этим родным языком и известным
+    изучаемым языком — для клавиатуры выбора.
+    """
+    pairs = set()
+    for direction in directions:
+        if not is_lang_pair(direction):
+            continue
+        target_lang, source_lang = split_pair(direction)
+        if source_lang == target_lang:
+            continue
+        if native_lang and (target_lang != native_lang or source_lang not in LANGUAGE_NAMES):
+            continue
+        pairs.add(f"{source_lang}-{target_lang}")
+    return sorted(pairs, key=lambda pair: (pair != DEFAULT_LANG_PAIR, pair))
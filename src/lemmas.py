@@ -0,0 +1,140 @@
+"""Лемматизация слов для поиска дубликатов с учётом морфологии.
+
+Лемма ищется в LRU-кэше в памяти, затем в таблице lemma_cache и только
+потом вычисляется морфологическим анализатором simplemma (локально, без
+сетевых запросов). Леммы слов каталога заполняются фоновой задачей:
+
+    python -m src.lemmas            # строки без лемм
+    python -m src.lemmas --refresh  # пересчитать все леммы (после установки simplemma)
+"""
+import argparse
+import logging
+import sys
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import simplemma
+except ImportError:  # без simplemma леммой считается само слово
+    simplemma = None
+
+from telegram.ext import CallbackContext
+
+from src import db
+from src.config import LEMMA_BACKFILL_BATCH, LEMMA_CACHE_SIZE
+from src.database import LEMMA_TABLES
+
+logger = logging.getLogger(__name__)
+
+# Лемма хранится в колонке той же длины, что и слово
+MAX_LEMMA_LENGTH = 50
+
+
+def analyze(word: str, lang: str) -> str:
+    """Лемма слова по словарю simplemma; для неподдерживаемого языка — само слово."""
+    if simplemma is None:
+        return word
+    try:
+        lemma = simplemma.lemmatize(word, lang=lang).lower()
+    except Exception as e:
+        logger.debug(f"simplemma не обработал '{word}' ({lang}): {e}")
+        return word
+    return lemma if lemma and len(lemma) <= MAX_LEMMA_LENGTH else word
+
+
+class Lemmatizer:
+    """Леммы слов: LRU-кэш в памяти, таблица lemma_cache, анализатор.
+
+    Результаты анализатора сохраняются в БД, только если simplemma
+    установлен: иначе после его установки в кэше остались бы слова без
+    нормализации.
+    """
+
+    def __init__(self, cache_size: int = LEMMA_CACHE_SIZE):
+        self._cached = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def lemma(self, word: str, lang: str) -> str:
+        """Лемма одного слова (слово приводится к нижнему регистру)."""
+        word = word.strip().lower()
+        return self._cached(word, lang) if word else word
+
+    def _resolve(self, word: str, lang: str) -> str:
+        return self.lemmas([word], lang)[word]
+
+    def lemmas(self, words: Iterable[str], lang: str) -> Dict[str, str]:
+        """Леммы пачки слов одного языка одним запросом к lemma_cache.
+
+        LRU-кэш не заполняется: пачки фоновой задачи вытеснили бы из него
+        слова, которые вводят пользователи.
+        """
+        words = list(dict.fromkeys(words))
+        found = db.get_cached_lemmas(lang, words)
+        missing = {word: analyze(word, lang) for word in words if word not in found}
+        if missing and simplemma is not None:
+            db.save_lemmas(lang, missing)
+        return {**found, **missing}
+
+
+lemmatizer = Lemmatizer()
+
+
+def _lemmatize_rows(rows: List[tuple]) -> List[tuple]:
+    """(id, source_lang, target_lang, слово, перевод) -> (id, лемма слова, лемма перевода)."""
+    words_by_lang: Dict[str, set] = {}
+    for _, source_lang, target_lang, word, translation in rows:
+        words_by_lang.setdefault(source_lang, set()).add(word)
+        words_by_lang.setdefault(target_lang, set()).add(translation)
+    lemmas = {lang: lemmatizer.lemmas(words, lang) for lang, words in words_by_lang.items()}
+    return [
+        (row_id, lemmas[source_lang][word], lemmas[target_lang][translation])
+        for row_id, source_lang, target_lang, word, translation in rows
+    ]
+
+
+def backfill_lemmas(refresh: bool = False, batch_size: int = LEMMA_BACKFILL_BATCH) -> int:
+    """Заполняет леммы слов каталога пачками; возвращает число обработанных строк.
+
+    С `refresh` пересчитываются леммы всех строк.
+    """
+    processed = 0
+    for table in LEMMA_TABLES:
+        after_id = 0
+        while True:
+            rows = db.get_words_without_lemmas(table, after_id, batch_size, refresh)
+            if not rows:
+                break
+            db.set_word_lemmas(table, _lemmatize_rows(rows))
+            processed += len(rows)
+            after_id = rows[-1][0]
+    return processed
+
+
+def run_lemma_backfill(context: CallbackContext = None):
+    """Задача job_queue: леммы для слов, загруженных без них (начальные данные, импорт)."""
+    try:
+        with db.pooled():
+            processed = backfill_lemmas()
+        if processed:
+            logger.info(f"Заполнены леммы для {processed} слов")
+    except Exception as e:
+        logger.error(f"Ошибка заполнения лемм: {e}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Заполнение лемм слов в common_words и lexemes")
+    parser.add_argument("--refresh", action="store_true", help="пересчитать леммы всех слов")
+    parser.add_argument("--batch-size", type=int, default=LEMMA_BACKFILL_BATCH, help="слов в одной пачке")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    if simplemma is None:
+        logger.warning("simplemma не установлен: леммой будет само слово")
+
+    processed = backfill_lemmas(args.refresh, args.batch_size)
+    logger.info(f"Обработано слов: {processed}")
+    db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
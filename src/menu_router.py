@@ -0,0 +1,36 @@
+import logging
+from typing import Callable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import CallbackContext, ConversationHandler, Handler
+
+logger = logging.getLogger(__name__)
+
+
+class MenuRouter(Handler):
+    """Обработчик кнопок меню: точный текст кнопки -> функция, один поиск в словаре.
+
+    Заменяет цепочку MessageHandler(Filters.regex(...)), где каждое
+    сообщение проверялось каждым регулярным выражением по очереди.
+    С `end_conversation=True` роутер годится в fallbacks ConversationHandler:
+    нажатие любой кнопки меню выполняет её действие и завершает диалог.
+    """
+
+    def __init__(
+        self,
+        routes: Dict[str, Callable[[Update, CallbackContext], Optional[object]]],
+        end_conversation: bool = False,
+        run_async: bool = False,
+    ):
+        super().__init__(self._route, run_async=run_async)
+        self.routes = dict(routes)
+        self.end_conversation = end_conversation
+
+    def check_update(self, update: object) -> Optional[Callable]:
+        if isinstance(update, Update) and update.message and update.message.text:
+            return self.routes.get(update.message.text)
+        return None
+
+    def _route(self, update: Update, context: CallbackContext):
+        result = self.routes[update.message.text](update, context)
+        return ConversationHandler.END if self.end_conversation else result
@@ -0,0 +1,122 @@
+import logging
+import threading
+from collections import deque
+from typing import Iterable, List, Optional
+
+from telegram.ext import CallbackContext
+
+from src.config import DEFAULT_LANG_PAIR, QUIZ_PREFETCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+def question_key(question: dict) -> str:
+    """Ключ слова вопроса в формате 'тип:id' (как в p_exclude функции question_batch)."""
+    return f"{question['word_type']}:{question['word_id']}"
+
+
+class QuestionBuffer:
+    """Буфер готовых вопросов пользователя (слово + перемешанные варианты).
+
+    Пополняется в фоне пачками; выдача вопроса — только извлечение из очереди.
+    """
+
+    def __init__(self, size: int = QUIZ_PREFETCH_SIZE):
+        self.size = size
+        self._items = deque()
+        self._keys = set()
+        self._served = set()
+        self._lock = threading.Lock()
+        self.refilling = False
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def missing(self) -> int:
+        """Сколько вопросов не хватает до полного буфера."""
+        return max(self.size - len(self._items), 0)
+
+    def exclude_keys(self) -> List[str]:
+        """Ключи слов, которые не должны повторно попасть в буфер."""
+        with self._lock:
+            return list(self._keys | self._served)
+
+    def mark_served(self, question: dict):
+        """Отмечает вопрос как уже показанный пользователю."""
+        with self._lock:
+            self._served.add(question_key(question))
+
+    def pop(self) -> Optional[dict]:
+        """Следующий готовый вопрос или None, если буфер пуст."""
+        with self._lock:
+            if not self._items:
+                return None
+            question = self._items.popleft()
+            key = question_key(question)
+            self._keys.discard(key)
+            self._served.add(key)
+            return question
+
+    def extend(self, questions: Iterable[dict]):
+        """Добавляет вопросы, пропуская уже выданные и уже лежащие в буфере."""
+        with self._lock:
+            for question in questions:
+                key = question_key(question)
+                if key in self._keys or key in self._served:
+                    continue
+                self._items.append(question)
+                self._keys.add(key)
+
+    def clear(self):
+        """Очищает буфер (например, при смене режима викторины)."""
+        with self._lock:
+            self._items.clear()
+            self._keys.clear()
+
+
+def get_buffer(context: CallbackContext) -> QuestionBuffer:
+    """Буфер вопросов текущего пользователя (создаётся при первом обращении)."""
+    buffer = context.user_data.get("question_buffer")
+    if buffer is None:
+        buffer = context.user_data["question_buffer"] = QuestionBuffer()
+    return buffer
+
+
+def _refill(quiz, buffer: QuestionBuffer, user_id: int, mode: str, reverse: bool, pair: str):
+    """Фоновая задача: пополнение буфера одним запросом на собственном соединении из пула."""
+    try:
+        with quiz.db.pooled():
+            count = buffer.missing()
+            bundles = (
+                quiz.get_question_batch(user_id, count, reverse=reverse, exclude=buffer.exclude_keys(), pair=pair)
+                if count
+                else []
+            )
+            buffer.extend(quiz.build_question(bundle, mode, pair) for bundle in bundles)
+    except Exception as e:
+        logger.error(f"Ошибка предзагрузки вопросов для {user_id}: {e}")
+    finally:
+        buffer.refilling = False
+
+
+def schedule_refill(context: CallbackContext, quiz, user_id: int, mode: str, reverse: bool):
+    """Асинхронно пополняет буфер, не задерживая обработчик.
+
+    Пополнение не запускается повторно, пока предыдущее не завершилось.
+    Ответы в фоне не записываются: обработчик записывает их сам, чтобы
+    ошибка записи не терялась в фоновом потоке.
+    """
+    buffer = get_buffer(context)
+    if buffer.refilling or not buffer.missing():
+        return
+    buffer.refilling = True
+
+    context.dispatcher.run_async(
+        _refill,
+        quiz,
+        buffer,
+        user_id,
+        mode,
+        reverse,
+        context.user_data.get("lang_pair", DEFAULT_LANG_PAIR),
+    )
@@ -0,0 +1,121 @@
+import logging
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Регулярные выражения для нормализации текста запроса в «отпечаток»
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+# Простой EXPLAIN только планирует запрос и не выполняет его, поэтому безопасен и для
+# изменяющих запросов; EXECUTE не разбирается: подготовленные выражения есть не на всех соединениях
+_EXPLAINABLE = ("select", "with", "insert", "update", "delete")
+
+
+def fingerprint(query: str) -> str:
+    """Нормализует SQL-запрос: литералы и параметры заменяются на '?'."""
+    text = _STRING_LITERAL.sub("?", query)
+    text = _PLACEHOLDER.sub("?", text)
+    text = _NUMBER_LITERAL.sub("?", text)
+    text = _IN_LIST.sub("(...)", text)
+    return _WHITESPACE.sub(" ", text).strip().rstrip(";").lower()
+
+
+class QueryStats:
+    """Накопленная статистика по одному отпечатку запроса."""
+
+    __slots__ = ("calls", "total_ms", "max_ms", "rows")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.calls if self.calls else 0.0
+
+
+class QueryProfiler:
+    def __init__(self, slow_query_ms: float = 200.0, explain_interval: float = 600.0):
+        """Профилировщик SQL-запросов с журналом медленных запросов."""
+        self.slow_query_ms = slow_query_ms
+        self.explain_interval = explain_interval
+        self._stats: Dict[str, QueryStats] = {}
+        self._explained: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, query: str, duration_ms: float, rows: int) -> str:
+        """Учитывает выполнение запроса и возвращает его отпечаток."""
+        key = fingerprint(query)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = QueryStats()
+            stats.calls += 1
+            stats.total_ms += duration_ms
+            stats.max_ms = max(stats.max_ms, duration_ms)
+            stats.rows += max(rows, 0)
+        return key
+
+    def is_slow(self, duration_ms: float) -> bool:
+        """Проверяет, превышает ли запрос порог медленного журнала."""
+        return duration_ms >= self.slow_query_ms
+
+    @staticmethod
+    def is_explainable(query: str) -> bool:
+        """Можно ли получить план запроса простым EXPLAIN."""
+        return query.lstrip().lower().startswith(_EXPLAINABLE)
+
+    def should_explain(self, key: str) -> bool:
+        """План одного отпечатка собирается не чаще раза в explain_interval секунд."""
+        now = time.monotonic()
+        with self._lock:
+            last = self._explained.get(key)
+            if last is not None and now - last < self.explain_interval:
+                return False
+            self._explained[key] = now
+            return True
+
+    def log_slow(self, key: str, duration_ms: float, rows: int, plan: Optional[List[str]]):
+        """Записывает медленный запрос в лог вместе с планом выполнения."""
+        message = f"Slow query ({duration_ms:.1f} ms, {rows} rows): {key}"
+        if plan:
+            message += "\n" + "\n".join(plan)
+        logger.warning(message)
+
+    def top(self, limit: int = 10, order_by: str = "total_ms") -> List[tuple]:
+        """Возвращает top-N отпечатков, отсортированных по указанной метрике."""
+        with self._lock:
+            items = [(key, stats) for key, stats in self._stats.items()]
+        items.sort(key=lambda item: getattr(item[1], order_by), reverse=True)
+        return items[:limit]
+
+    def report(self, limit: int = 10) -> str:
+        """Текстовый отчёт по самым затратным запросам."""
+        lines = []
+        for index, (key, stats) in enumerate(self.top(limit), start=1):
+            lines.append(
+                f"{index}. total={stats.total_ms:.1f}ms calls={stats.calls} "
+                f"mean={stats.mean_ms:.2f}ms max={stats.max_ms:.1f}ms rows={stats.rows}\n"
+                f"   {key[:300]}"
+            )
+        return "\n".join(lines) if lines else "Запросы ещё не выполнялись."
+
+    def reset(self):
+        """Сбрасывает накопленную статистику."""
+        with self._lock:
+            self._stats.clear()
+            self._explained.clear()
+
+
+def monotonic_ms() -> float:
+    """Текущее значение монотонных часов в миллисекундах."""
+    return time.perf_counter() * 1000.0
@@ -1,13 +1,45 @@
+from collections import Counter, defaultdict
 from datetime import datetime
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 import logging
+import random
+import secrets
+import threading
 
+from src.answer_matching import normalize_answer
+from src.config import DEFAULT_LANG_PAIR, DISTRACTOR_DIFFICULTY
 from src.database import Database
+from src.languages import language_name, split_pair
+from src.similarity import DistractorIndex, normalize
 
 # Настройка логгера
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Режимы викторины
+MODE_EN_RU = "en_ru"
+MODE_RU_EN = "ru_en"
+MODE_TYPED = "typed"
+QUIZ_MODES = {
+    MODE_EN_RU: "EN → RU 🇬🇧",
+    MODE_RU_EN: "RU → EN 🇷🇺",
+    MODE_TYPED: "Ввод перевода ⌨️",
+}
+
+# Сколько вариантов из «частых ошибок» подмешивать и с какого числа выборов
+CONFUSION_SLOTS = 1
+CONFUSION_MIN_PICKS = 2
+
+
+class PairCatalog:
+    """Индексы похожих слов одной языковой пары: переводов и слов изучаемого языка."""
+
+    def __init__(self, pair: str):
+        self.pair = pair
+        self.distractors = DistractorIndex()
+        self.source_distractors = DistractorIndex()
+        self.ready = threading.Event()
+
 
 class QuizManager:
     def __init__(self, db: Database):
@@ -30,21 +62,225 @@ class QuizManager:
         self.correct_index = 0
         self.incorrect_index = 0
 
-    def get_next_question(self, user_id: int) -> Optional[Tuple[str, str, str, int]]:
-        """Получение следующего вопроса для пользователя."""
-        question = self.db.get_unseen_word(user_id)
-        if not question:
+        # Индексы похожих слов строятся в фоне отдельно для каждой языковой пары при первом
+        # обращении к ней; до готовности используются случайные варианты
+        self.catalogs: Dict[str, PairCatalog] = {}
+        self._catalogs_lock = threading.Lock()
+
+        # Частые ошибки: (пара, правильный ответ) -> сколько раз выбирали каждый неверный вариант
+        self.confusions: Dict[Tuple[str, str], Counter] = defaultdict(Counter)
+        self._confusions_lock = threading.Lock()
+        threading.Thread(target=self._load_confusions, name="distractor-confusions", daemon=True).start()
+        self.catalog(DEFAULT_LANG_PAIR)
+
+    def _load_confusions(self):
+        """Загрузка статистики частых ошибок из БД."""
+        try:
+            with self.db.pooled(), self._confusions_lock:
+                for pair, correct, distractor, picks in self.db.get_top_confusions(CONFUSION_MIN_PICKS):
+                    self.confusions[pair, normalize(correct)][distractor] = picks
+        except Exception as e:
+            logger.error(f"Error loading distractor confusions: {e}")
+
+    def catalog(self, pair: str) -> PairCatalog:
+        """Индексы языковой пары; при первом обращении запускается их построение в фоне."""
+        with self._catalogs_lock:
+            catalog = self.catalogs.get(pair)
+            if catalog is None:
+                catalog = self.catalogs[pair] = PairCatalog(pair)
+                threading.Thread(
+                    target=self._build_index, args=(catalog,), name=f"distractor-index-{pair}", daemon=True
+                ).start()
+            return catalog
+
+    def _build_index(self, catalog: PairCatalog):
+        """Построение индексов похожих переводов и слов изучаемого языка по словам пары из БД.
+
+        Леммы слов загружаются вместе с ними, чтобы формы правильного ответа
+        («кошки» для «кошка») не становились неправильными вариантами.
+        """
+        try:
+            with self.db.pooled():
+                rows = self.db.get_all_word_pairs_with_lemmas(catalog.pair)
+            catalog.distractors.build(
+                (translation for _, translation, _, _ in rows),
+                {translation: lemma for _, translation, _, lemma in rows if lemma},
+            )
+            catalog.source_distractors.build(
+                (word for word, _, _, _ in rows),
+                {word: lemma for word, _, lemma, _ in rows if lemma},
+            )
+            catalog.ready.set()
+        except Exception as e:
+            logger.error(f"Error building distractor index for {catalog.pair}: {e}")
+
+    def register_translation(
+        self,
+        translation: str,
+        english_word: Optional[str] = None,
+        pair: str = DEFAULT_LANG_PAIR,
+        translation_lemma: Optional[str] = None,
+        english_lemma: Optional[str] = None,
+    ):
+        """Инкрементально добавляет новое слово (с леммами, если известны) в индексы пары."""
+        catalog = self.catalog(pair)
+        if catalog.ready.is_set():
+            catalog.distractors.add(translation, translation_lemma)
+            if english_word:
+                catalog.source_distractors.add(english_word, english_lemma)
+
+    def register_confusion(self, correct_answer: str, chosen: str, pair: str = DEFAULT_LANG_PAIR):
+        """Учитывает выбранный неверный вариант в подборе будущих вариантов."""
+        with self._confusions_lock:
+            self.confusions[pair, normalize(correct_answer)][chosen.strip().lower()] += 1
+
+    def confused_with(
+        self, correct_answer: str, limit: int = CONFUSION_SLOTS, pair: str = DEFAULT_LANG_PAIR
+    ) -> List[str]:
+        """Неверные варианты, которые чаще всего выбирали вместо этого ответа в паре."""
+        with self._confusions_lock:
+            counts = self.confusions.get((pair, normalize(correct_answer)))
+            if not counts:
+                return []
+            return [w for w, picks in counts.most_common(limit) if picks >= CONFUSION_MIN_PICKS]
+
+    def get_question_batch(
+        self,
+        user_id: int,
+        count: int,
+        distractors: int = 3,
+        reverse: bool = False,
+        exclude: List[str] = None,
+        pair: str = DEFAULT_LANG_PAIR,
+    ) -> List[Tuple[str, str, str, int, List[str]]]:
+        """Пачка следующих вопросов одним запросом (для буфера предзагрузки).
+
+        Слова выбираются из пары, сохранённой у пользователя; `pair` определяет
+        только, готов ли индекс вариантов.
+        """
+        return self.db.get_question_batch(
+            user_id, count, self._sql_distractors(distractors, pair), reverse, exclude
+        )
+
+    def record_answer_and_next(
+        self,
+        user_id: int,
+        word_id: int,
+        word_type: str,
+        session_start: datetime,
+        distractors: int = 3,
+        reverse: bool = False,
+        count: int = 1,
+        exclude: List[str] = None,
+        pair: str = DEFAULT_LANG_PAIR,
+    ) -> Optional[List[Tuple[str, str, str, int, List[str]]]]:
+        """Отмечает слово изученным и сразу возвращает до `count` следующих вопросов.
+
+        None — ответ записать не удалось.
+        """
+        bundles = self.db.record_answer_and_next(
+            user_id,
+            word_id,
+            word_type,
+            session_start,
+            self._sql_distractors(distractors, pair),
+            reverse,
+            count,
+            exclude,
+        )
+        if bundles == [] and count:
             logger.info(f"No available words for user_id={user_id}")
-        return question
+        return bundles
+
+    def _sql_distractors(self, limit: int, pair: str = DEFAULT_LANG_PAIR) -> int:
+        """Сколько случайных вариантов запрашивать у БД: при готовом индексе пары — ни одного."""
+        return 0 if self.catalog(pair).ready.is_set() else limit
+
+    def get_wrong_answers(
+        self,
+        correct_word: str,
+        limit: int = 3,
+        difficulty: int = DISTRACTOR_DIFFICULTY,
+        fallback: List[str] = (),
+        reverse: bool = False,
+        pair: str = DEFAULT_LANG_PAIR,
+    ) -> List[str]:
+        """Возвращает уникальные варианты неправильных ответов.
+
+        Первыми идут варианты, которые чаще всего выбирали по ошибке, затем
+        варианты по индексу похожих слов с заданной сложностью;
+        если индекс ещё не готов или слова в нём нет, используются `fallback`
+        и случайные переводы из БД. При `reverse` подбираются слова изучаемого языка.
+        """
+        # Сначала варианты, на которых пользователи уже ошибались, затем похожие слова
+        wrong = [w for w in self.confused_with(correct_word, pair=pair) if normalize(w) != normalize(correct_word)]
+        catalog = self.catalog(pair)
+        if catalog.ready.is_set():
+            index = catalog.source_distractors if reverse else catalog.distractors
+            for candidate in index.pick(correct_word, limit, difficulty):
+                if len(wrong) >= limit:
+                    break
+                if candidate not in wrong:
+                    wrong.append(candidate)
+
+        seen = {correct_word.lower(), *wrong}
+        for candidate in fallback:
+            if len(wrong) >= limit:
+                break
+            if candidate.lower() not in seen:
+                wrong.append(candidate.lower())
+                seen.add(candidate.lower())
+
+        if len(wrong) < limit:
+            for candidate in self.db.get_wrong_translations(correct_word.lower(), limit, reverse, pair):
+                if len(wrong) >= limit:
+                    break
+                if candidate not in seen:
+                    wrong.append(candidate)
+                    seen.add(candidate)
 
-    def get_wrong_answers(self, correct_word: str, limit: int = 3) -> List[str]:
-        """Возвращает уникальные варианты неправильных ответов."""
-        wrong = self.db.get_wrong_translations(correct_word.lower(), limit)
         return [w.capitalize() for w in wrong]
 
-    def mark_word_seen(self, user_id: int, word_id: int, word_type: str, session_start: datetime):
-        """Помечает слово как изученное в базе данных."""
-        self.db.mark_word_as_seen(user_id, word_id, word_type, session_start)
+    def build_question(
+        self, bundle: Tuple[str, str, str, int, List[str]], mode: str = MODE_EN_RU, pair: str = DEFAULT_LANG_PAIR
+    ) -> dict:
+        """Готовит вопрос из набора: текст задания, правильный ответ и варианты.
+
+        Для режима ввода заранее сохраняется нормализованный ответ, поэтому
+        проверка ответа не обращается к БД. Токен вопроса защищает от нажатий
+        на кнопки устаревших вопросов.
+        """
+        word_en, word_ru, word_type, word_id, distractors = bundle
+        reverse = mode == MODE_RU_EN
+
+        if mode == MODE_RU_EN:
+            prompt = f"Переведи на {language_name(split_pair(pair)[0])}: *{word_ru.capitalize()}*"
+            correct = word_en.capitalize()
+        elif mode == MODE_TYPED:
+            prompt = f"Напиши перевод слова: *{word_en.capitalize()}*"
+            correct = word_ru.capitalize()
+        else:
+            prompt = f"Переведи слово: *{word_en.capitalize()}*"
+            correct = word_ru.capitalize()
+
+        options = []
+        if mode != MODE_TYPED:
+            options = [correct] + self.get_wrong_answers(correct, fallback=distractors, reverse=reverse, pair=pair)
+            random.shuffle(options)
+
+        return {
+            "word_en": word_en,
+            "correct_answer": correct,
+            "expected": normalize_answer(correct),
+            "word_id": word_id,
+            "word_type": word_type,
+            "options": options,
+            "correct_index": options.index(correct) if options else None,
+            "token": secrets.token_urlsafe(6),
+            "mode": mode,
+            "pair": pair,
+            "prompt": prompt,
+        }
 
     def get_correct_response(self) -> str:
         """Возвращает случайный ответ для правильного ответа."""
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import NamedTuple, Optional, Tuple
+
+try:
+    import vosk
+except ImportError:  # распознавание через Vosk необязательно
+    vosk = None
+
+from src import audio_pipeline
+from src.answer_matching import match_answer, normalize_answer
+from src.config import (
+    ASR_BACKEND,
+    ASR_CACHE_SIZE,
+    ASR_TIMEOUT,
+    ASR_WORKERS,
+    VOSK_MODEL_PATH,
+)
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+
+class Recognition(NamedTuple):
+    """Результат распознавания: текст, средняя уверенность (если известна) и имя движка."""
+
+    text: str
+    confidence: Optional[float]
+    backend: str
+
+
+class RecognitionBackend:
+    """Интерфейс локального движка распознавания речи."""
+
+    name = "base"
+
+    def available(self) -> bool:
+        """Можно ли использовать движок в текущем окружении."""
+        return True
+
+    def recognize(self, audio: bytes, hint: str) -> Recognition:
+        """Текст голосового сообщения; `hint` — ожидаемое слово. При ошибке выбрасывает исключение."""
+        raise NotImplementedError
+
+
+class VoskBackend(RecognitionBackend):
+    """Офлайн-распознавание Vosk; голосовое сообщение декодируется ffmpeg в PCM потоком."""
+
+    name = "vosk"
+
+    def __init__(self, model_path: str = VOSK_MODEL_PATH):
+        self.model_path = model_path
+        self._model = None
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        return vosk is not None and audio_pipeline.available()
+
+    def _get_model(self):
+        # Модель загружается один раз при первом сообщении и общая для всех потоков
+        with self._lock:
+            if self._model is None:
+                vosk.SetLogLevel(-1)
+                self._model = vosk.Model(self.model_path)
+            return self._model
+
+    def recognize(self, audio: bytes, hint: str) -> Recognition:
+        recognizer = vosk.KaldiRecognizer(self._get_model(), SAMPLE_RATE)
+        recognizer.SetWords(True)
+        for chunk in audio_pipeline.decode_to_pcm([audio], SAMPLE_RATE):
+            recognizer.AcceptWaveform(chunk)
+        result = json.loads(recognizer.FinalResult())
+        words = result.get("result") or []
+        confidence = sum(w["conf"] for w in words) / len(words) if words else None
+        return Recognition(result.get("text", ""), confidence, self.name)
+
+
+class StubBackend(RecognitionBackend):
+    """Заглушка для тестов и разработки: «распознаёт» ожидаемое слово в любом непустом аудио."""
+
+    name = "stub"
+
+    def recognize(self, audio: bytes, hint: str) -> Recognition:
+        return Recognition(hint if audio else "", 1.0, self.name)
+
+
+BACKENDS = {
+    VoskBackend.name: VoskBackend,
+    StubBackend.name: StubBackend,
+}
+
+
+class RecognitionCache:
+    """LRU-кэш результатов по паре (хэш аудио, слово)."""
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._items: "OrderedDict[Tuple[str, str], Recognition]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Optional[Recognition]:
+        with self._lock:
+            result = self._items.get(key)
+            if result is not None:
+                self._items.move_to_end(key)
+            return result
+
+    def put(self, key: Tuple[str, str], result: Recognition):
+        with self._lock:
+            self._items[key] = result
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+
+class RecognitionService:
+    """Распознавание в пуле потоков с бюджетом времени и кэшем результатов.
+
+    Пул ограничивает число одновременных распознаваний (они нагружают
+    процессор); если результат не готов за `timeout` секунд, обработчик
+    получает None и не держит поток бота дольше бюджета.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[RecognitionBackend],
+        workers: int = ASR_WORKERS,
+        timeout: float = ASR_TIMEOUT,
+        cache_size: int = ASR_CACHE_SIZE,
+    ):
+        self.backend = backend if backend is not None and backend.available() else None
+        self.timeout = timeout
+        self.cache = RecognitionCache(cache_size)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="asr")
+        if self.backend is None:
+            logger.warning("Движок распознавания речи недоступен")
+
+    @classmethod
+    def from_config(cls, name: str = ASR_BACKEND) -> "RecognitionService":
+        """Сервис с движком из настройки ASR_BACKEND."""
+        if name not in BACKENDS:
+            logger.warning(f"Неизвестный движок распознавания речи: {name}")
+            return cls(None)
+        return cls(BACKENDS[name]())
+
+    def available(self) -> bool:
+        return self.backend is not None
+
+    def recognize(self, audio: bytes, word: str) -> Optional[Recognition]:
+        """Текст голосового сообщения или None (ошибка, превышен бюджет времени)."""
+        key = (hashlib.sha256(audio).hexdigest(), word.strip().lower())
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        future = self._executor.submit(self.backend.recognize, audio, word)
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            logger.warning(f"Распознавание не уложилось в {self.timeout} с")
+            return None
+        except Exception as e:
+            logger.error(f"Ошибка движка {self.backend.name}: {e}")
+            return None
+        self.cache.put(key, result)
+        return result
+
+
+def score_pronunciation(transcript: str, word: str) -> Tuple[bool, bool]:
+    """Сравнивает распознанный текст со словом: (засчитано, точное совпадение).
+
+    Распознаватель может вернуть несколько слов, поэтому сравнивается и вся
+    фраза, и каждое слово отдельно — с теми же допусками, что и ответ текстом.
+    """
+    expected = normalize_answer(word)
+    accepted = False
+    for candidate in [transcript, *transcript.split()]:
+        matched, exact = match_answer(candidate, expected)
+        if exact:
+            return True, True
+        accepted = accepted or matched
+    return accepted, False
@@ -0,0 +1,167 @@
+import logging
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+import telegram
+from telegram import Update
+from telegram.ext import CallbackContext
+
+from src import db
+from src.word_management import pluralize_words
+from src.config import (
+    REMINDER_BATCH_SIZE,
+    REMINDER_DEFAULT_UTC_OFFSET,
+    REMINDER_MAX_DELAY_HOURS,
+    REMINDER_RATE_PER_SECOND,
+    REMINDER_TICK_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# "/remind 19", "/remind 19 +3", "/remind 8 -5:30"
+_OFFSET_PATTERN = re.compile(r"^(?:utc)?([+-])(\d{1,2})(?::?(\d{2}))?$", re.IGNORECASE)
+
+
+def parse_utc_offset(value: str) -> Optional[int]:
+    """Смещение от UTC в минутах из строки вида '+3', '-5:30', 'UTC+10'."""
+    match = _OFFSET_PATTERN.match(value.strip())
+    if not match:
+        return None
+    sign, hours, minutes = match.groups()
+    offset = int(hours) * 60 + int(minutes or 0)
+    if offset > 14 * 60:
+        return None
+    return offset if sign == "+" else -offset
+
+
+def format_utc_offset(offset: int) -> str:
+    """Форматирование смещения: 180 -> 'UTC+3', -330 -> 'UTC-5:30'."""
+    sign = "+" if offset >= 0 else "-"
+    hours, minutes = divmod(abs(offset), 60)
+    return f"UTC{sign}{hours}" + (f":{minutes:02d}" if minutes else "")
+
+
+def next_reminder_at(hour: int, utc_offset: int, now_utc: datetime = None) -> datetime:
+    """Ближайший момент (UTC, без tzinfo), когда у пользователя наступает `hour` часов."""
+    now_utc = now_utc or datetime.now(timezone.utc)
+    local_now = now_utc.astimezone(timezone(timedelta(minutes=utc_offset)))
+    local_next = local_now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    if local_next <= local_now:
+        local_next += timedelta(days=1)
+    return local_next.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def parse_remind_args(args) -> Tuple[Optional[int], Optional[int]]:
+    """Разбор аргументов /remind: (час, смещение) или (None, None) при ошибке."""
+    try:
+        hour = int(args[0])
+    except (IndexError, ValueError):
+        return None, None
+    if not 0 <= hour <= 23:
+        return None, None
+    offset = parse_utc_offset(args[1]) if len(args) > 1 else REMINDER_DEFAULT_UTC_OFFSET
+    return hour, offset
+
+
+def remind_handler(update: Update, context: CallbackContext):
+    """Команда /remind ЧЧ [±ЧЧ[:ММ]] | off: ежедневное напоминание о словах."""
+    user_id = update.effective_user.id
+    if context.args and context.args[0].lower() in ("off", "выкл", "stop"):
+        db.disable_reminders([user_id])
+        update.message.reply_text("🔕 Напоминания отключены.")
+        return
+
+    hour, offset = parse_remind_args(context.args)
+    if hour is None or offset is None:
+        update.message.reply_text(
+            "Использование: /remind ЧЧ [±ЧЧ:ММ] — час напоминания и смещение от UTC "
+            f"(по умолчанию {format_utc_offset(REMINDER_DEFAULT_UTC_OFFSET)}).\n"
+            "Например: /remind 19 +3\n/remind off — отключить напоминания."
+        )
+        return
+
+    db.set_reminder(user_id, hour, offset, next_reminder_at(hour, offset))
+    update.message.reply_text(f"🔔 Буду напоминать каждый день в {hour:02d}:00 ({format_utc_offset(offset)}).")
+
+
+def _send_reminder(bot, user_id: int, due_words: int) -> bool:
+    """Отправляет одно напоминание. False — пользователь заблокировал бота.
+
+    RetryAfter и сетевые ошибки не перехватываются: повтор решает вызывающий код.
+    """
+    waiting = "Вас ждёт" if due_words % 10 == 1 and due_words % 100 != 11 else "Вас ждут"
+    text = f"📚 Пора позаниматься! {waiting} {due_words} {pluralize_words(due_words)}. Нажмите «Начать тест 🚀»."
+    try:
+        bot.send_message(chat_id=user_id, text=text)
+    except (telegram.error.Unauthorized, telegram.error.BadRequest) as e:
+        logger.info(f"Напоминание для {user_id} не доставлено: {e}")
+        return False
+    return True
+
+
+def send_due_reminders(bot, budget_seconds: float = REMINDER_TICK_SECONDS * 0.8) -> int:
+    """Рассылает напоминания наступившего времени пачками с ограничением скорости.
+
+    Пачка забирается одним запросом по частичному индексу и сразу
+    переводится на следующий день; если время тика вышло, оставшиеся
+    пользователи будут выбраны следующим тиком. Если Telegram ответил
+    RetryAfter или отправка не удалась из-за сети, неотправленная часть
+    пачки возвращается в очередь (на время ожидания или до следующего
+    тика), а тик завершается, не блокируя поток job_queue.
+    Возвращает число отправленных.
+    """
+    started = time.monotonic()
+    interval = 1.0 / REMINDER_RATE_PER_SECOND
+    stale_before = timedelta(hours=REMINDER_MAX_DELAY_HOURS)
+    sent = 0
+
+    while time.monotonic() - started < budget_seconds:
+        now_utc = datetime.now(timezone.utc).replace(tzinfo=None)
+        batch = db.claim_due_reminders(now_utc, REMINDER_BATCH_SIZE)
+        if not batch:
+            break
+
+        # Сильно запоздавшие напоминания (бот был остановлен) не отправляются
+        pending = [
+            (user_id, due_words) for user_id, due_at, due_words in batch
+            if now_utc - due_at <= stale_before and due_words
+        ]
+        blocked = []
+        throttled = False
+        for position, (user_id, due_words) in enumerate(pending):
+            send_started = time.monotonic()
+            try:
+                delivered = _send_reminder(bot, user_id, due_words)
+            except telegram.error.TelegramError as e:
+                # Пачка уже перенесена на завтра: неотправленная часть возвращается в очередь,
+                # при RetryAfter — на время ожидания, при сбое сети — до следующего тика
+                delay = e.retry_after if isinstance(e, telegram.error.RetryAfter) else 0
+                retry_at = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=delay)
+                db.postpone_reminders([user for user, _ in pending[position:]], retry_at)
+                logger.info(f"Рассылка напоминаний приостановлена: {e}")
+                throttled = True
+                break
+            if delivered:
+                sent += 1
+            else:
+                blocked.append(user_id)
+            time.sleep(max(0.0, interval - (time.monotonic() - send_started)))
+
+        if blocked:
+            db.disable_reminders(blocked)
+        if throttled:
+            break
+    return sent
+
+
+def run_reminders(context: CallbackContext):
+    """Периодическая задача job_queue: один тик рассылки напоминаний."""
+    try:
+        with db.pooled():
+            sent = send_due_reminders(context.bot)
+        if sent:
+            logger.info(f"Отправлено напоминаний: {sent}")
+    except Exception as e:
+        logger.error(f"Ошибка рассылки напоминаний: {e}")
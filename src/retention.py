@@ -0,0 +1,50 @@
+import logging
+from datetime import date
+from pathlib import Path
+
+from telegram.ext import CallbackContext
+
+from src import db
+from src.config import ARCHIVE_DIR, SESSION_RETENTION_MONTHS
+
+logger = logging.getLogger(__name__)
+
+
+def retention_cutoff(today: date, months: int = SESSION_RETENTION_MONTHS) -> date:
+    """Первый день самого старого месяца, который остаётся в горячей таблице."""
+    month_index = today.year * 12 + (today.month - 1) - months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def archive_path(month: date) -> Path:
+    """Путь к архиву секции за указанный месяц."""
+    base = Path(ARCHIVE_DIR)
+    if not base.is_absolute():
+        base = db.base_dir / base
+    return base / f"session_stats_{month:%Y_%m}.csv.gz"
+
+
+def apply_session_retention(today: date = None) -> int:
+    """Создаёт секции наперёд и архивирует секции старше срока хранения.
+
+    Возвращает число заархивированных секций.
+    """
+    today = today or date.today()
+    db.ensure_session_partitions()
+
+    cutoff = retention_cutoff(today)
+    archived = 0
+    for partition, month in db.get_session_partitions():
+        if month < cutoff and db.archive_session_partition(partition, archive_path(month)):
+            archived += 1
+    return archived
+
+
+def run_session_retention(context: CallbackContext):
+    """Ежедневная задача job_queue для обслуживания секций session_stats."""
+    try:
+        with db.pooled():
+            archived = apply_session_retention()
+        logger.info(f"Обслуживание session_stats завершено, архивировано секций: {archived}")
+    except Exception as e:
+        logger.error(f"Ошибка обслуживания session_stats: {e}")
@@ -0,0 +1,198 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: межпроцессная блокировка недоступна
+    fcntl = None
+
+from src.config import SBER_TOKEN_CACHE, SBER_TOKEN_REFRESH_MARGIN
+
+logger = logging.getLogger(__name__)
+
+# Срок жизни токена, если сервер не вернул expires_at (токен Sber действует 30 минут)
+DEFAULT_TTL = 1800
+# Пауза перед повтором фонового обновления после ошибки (с)
+RETRY_DELAY = 30
+
+
+def parse_expires_at(token_data: dict, now: float = None) -> float:
+    """Момент истечения токена (epoch, секунды) из ответа OAuth.
+
+    Sber возвращает `expires_at` в миллисекундах; значения в секундах и
+    `expires_in` тоже поддерживаются.
+    """
+    now = time.time() if now is None else now
+    expires_at = token_data.get("expires_at")
+    if expires_at:
+        expires_at = float(expires_at)
+        return expires_at / 1000 if expires_at > 1e11 else expires_at
+    if token_data.get("expires_in"):
+        return now + float(token_data["expires_in"])
+    return now + DEFAULT_TTL
+
+
+class TokenManager:
+    """Общий токен доступа с обновлением заранее и одним запросом на всех.
+
+    Пока до истечения больше `refresh_margin` секунд, `get` отдаёт токен из
+    памяти. Обновление выполняет только один поток, остальные ждут его
+    результата; фоновый таймер обновляет токен до истечения, чтобы запросы
+    пользователей не ждали OAuth. Если указан `cache_path`, токен делится
+    между процессами через файл (запись под flock с атомарной заменой).
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Optional[dict]],
+        cache_path: Optional[str] = None,
+        refresh_margin: float = SBER_TOKEN_REFRESH_MARGIN,
+    ):
+        self.fetch = fetch
+        self.cache_path = cache_path or None
+        self.refresh_margin = refresh_margin
+        self.token: Optional[str] = None
+        self.expires_at = 0.0
+        self._refresh_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def _fresh(self, now: float = None) -> bool:
+        now = time.time() if now is None else now
+        return self.token is not None and self.expires_at - self.refresh_margin > now
+
+    def get(self) -> Optional[str]:
+        """Действующий токен; None, если получить его не удалось."""
+        if self._fresh():
+            return self.token
+        with self._refresh_lock:
+            # Пока поток ждал блокировку, токен мог обновить другой поток
+            if not self._fresh():
+                self._refresh()
+        if self.token is not None and self.expires_at > time.time():
+            return self.token
+        return None
+
+    def _refresh(self):
+        """Обновление токена; вызывается под _refresh_lock."""
+        if self.cache_path:
+            with self._file_lock():
+                # Другой процесс мог уже обновить токен в файле
+                if not self._load_file():
+                    self._fetch()
+                    self._save_file()
+        else:
+            self._fetch()
+        self._schedule()
+
+    def _fetch(self) -> bool:
+        token_data = self.fetch()
+        if not token_data or not token_data.get("access_token"):
+            return False
+        self.token = token_data["access_token"]
+        self.expires_at = parse_expires_at(token_data)
+        logger.info("Access Token успешно получен")
+        return True
+
+    def _schedule(self):
+        """Запускает фоновое обновление незадолго до истечения токена."""
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._fresh():
+            delay = self.expires_at - self.refresh_margin - time.time()
+        else:
+            delay = RETRY_DELAY
+        self._timer = threading.Timer(max(delay, 1.0), self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        try:
+            with self._refresh_lock:
+                # Токен мог уже обновить запрос пользователя — тогда только перепланировать
+                if self.expires_at - self.refresh_margin <= time.time() + 1:
+                    self._refresh()
+                else:
+                    self._schedule()
+        except Exception as e:
+            logger.error(f"Ошибка фонового обновления токена: {e}")
+
+    def close(self):
+        """Останавливает фоновое обновление."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    # --- Файловый кэш ---
+
+    def _file_lock(self):
+        return _FileLock(self.cache_path + ".lock")
+
+    def _load_file(self) -> bool:
+        """Берёт токен из файла, если он ещё свежий."""
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                data = json.load(f)
+            token, expires_at = data["access_token"], float(data["expires_at"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        if expires_at - self.refresh_margin <= time.time():
+            return False
+        self.token, self.expires_at = token, expires_at
+        return True
+
+    def _save_file(self):
+        """Атомарно записывает токен в файл: читатели не видят недописанный файл."""
+        if not self._fresh():
+            return
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".sber_token.")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"access_token": self.token, "expires_at": self.expires_at}, f)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.error(f"Не удалось сохранить токен в {self.cache_path}: {e}")
+
+
+class _FileLock:
+    """Эксклюзивная блокировка файла между процессами (без fcntl — ничего не делает)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        if fcntl is None:
+            return self
+        try:
+            self._file = open(self.path, "a")
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        except OSError as e:
+            logger.warning(f"Блокировка {self.path} недоступна: {e}")
+            self._file = None
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+_managers: Dict[Tuple[str, str], TokenManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_token_manager(key: Tuple[str, str], fetch: Callable[[], Optional[dict]]) -> TokenManager:
+    """Один менеджер токена на процесс для каждой пары (client_id, scope)."""
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = _managers[key] = TokenManager(fetch, cache_path=SBER_TOKEN_CACHE)
+        return manager
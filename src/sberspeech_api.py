@@ -1,11 +1,12 @@
 import os
 import base64
-import time
 import uuid
 import logging
 import requests
 from dotenv import load_dotenv
-from typing import Optional
+from typing import Iterator, Optional
+
+from src.sber_token import get_token_manager
 
 # Загрузка переменных окружения
 load_dotenv()
@@ -14,23 +15,25 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SCOPE = "SALUTE_SPEECH_PERS"
+# Тайм-аут запроса токена (с)
+TOKEN_TIMEOUT = 10
+
 
 class SberSpeechAPI:
     def __init__(self):
-        """Инициализация API с настройкой окружения и токена."""
+        """Инициализация API с настройкой окружения и общего менеджера токена."""
         self.client_id = os.getenv("SBER_CLIENT_ID")
         self.client_secret = os.getenv("SBER_CLIENT_SECRET")
-        self.access_token = None
-        self.token_expires_at = 0  # Время истечения токена (epoch time)
 
         if not self.client_id or not self.client_secret:
             raise ValueError("SBER_CLIENT_ID и SBER_CLIENT_SECRET должны быть указаны в файле .env")
 
-    def get_access_token(self) -> Optional[str]:
-        """Получение Access Token."""
-        if self.access_token and self.token_expires_at > time.time():
-            return self.access_token  # Возвращаем токен, если он ещё действителен
+        # Токен общий для всех экземпляров процесса (и, при SBER_TOKEN_CACHE, для всех процессов)
+        self.tokens = get_token_manager((self.client_id, SCOPE), self.request_access_token)
 
+    def request_access_token(self) -> Optional[dict]:
+        """Запрос нового Access Token; ответ содержит access_token и expires_at (мс)."""
         url = "https://ngw.devices.sberbank.ru:9443/api/v2/oauth"
         credentials = f"{self.client_id}:{self.client_secret}"
         encoded_credentials = base64.b64encode(credentials.encode()).decode()
@@ -41,26 +44,28 @@ class SberSpeechAPI:
             "Accept": "application/json",
             "RqUID": str(uuid.uuid4()),
         }
-        payload = {"scope": "SALUTE_SPEECH_PERS"}
+        payload = {"scope": SCOPE}
 
         try:
-            response = requests.post(url, headers=headers, data=payload, verify=False)
+            response = requests.post(url, headers=headers, data=payload, verify=False, timeout=TOKEN_TIMEOUT)
             response.raise_for_status()
-            token_data = response.json()
-            self.access_token = token_data.get("access_token")
-            self.token_expires_at = time.time() + 1800  # Токен действует 30 минут
-            logger.info("Access Token успешно получен")
-            return self.access_token
-        except requests.exceptions.RequestException as e:
+            return response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
             logger.error(f"Ошибка при получении токена: {e}")
             return None
 
-    def synthesize_text(self, text: str, output_file: str = "output.ogg") -> Optional[str]:
-        """Синтезирует текст в аудио через Sber Speech API."""
+    def get_access_token(self) -> Optional[str]:
+        """Получение Access Token."""
+        return self.tokens.get()
+
+    def stream_audio(self, text: str, timeout: float = None, chunk_size: int = 16 * 1024) -> Iterator[bytes]:
+        """Синтезирует текст и отдаёт аудио OGG/Opus фрагментами по мере загрузки.
+
+        Ошибки сети и авторизации выбрасываются как исключения requests.
+        """
         access_token = self.get_access_token()
         if not access_token:
-            logger.error("Невозможно выполнить синтез речи без токена")
-            return None
+            raise requests.exceptions.RequestException("Невозможно выполнить синтез речи без токена")
 
         url = "https://smartspeech.sber.ru/rest/v1/text:synthesize"
         headers = {
@@ -70,15 +75,10 @@ class SberSpeechAPI:
             "RqUID": str(uuid.uuid4()),
         }
 
-        try:
-            response = requests.post(url, headers=headers, data=text, verify=False)
+        with requests.post(
+            url, headers=headers, params={"format": "opus"}, data=text, verify=False, timeout=timeout, stream=True
+        ) as response:
             response.raise_for_status()
-
-            # Сохраняем аудиофайл
-            with open(output_file, "wb") as f:
-                f.write(response.content)
-            logger.info(f"Аудиофайл успешно создан: {output_file}")
-            return output_file
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Ошибка синтеза речи: {e}")
-            return None
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    yield chunk
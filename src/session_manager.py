@@ -1,10 +1,10 @@
 from datetime import datetime, timedelta
 import telegram
-from telegram import Update, ReplyKeyboardRemove, ReplyKeyboardMarkup, InlineKeyboardMarkup, InlineKeyboardButton
+from telegram import Update, ReplyKeyboardRemove, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import CallbackContext, ConversationHandler
 from src import db
 import logging
-from src.keyboards import main_menu_keyboard, MENU_BUTTON
+from src.keyboards import main_menu_keyboard, session_keyboard
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +37,33 @@ def save_session_data(user_id, context):
         logger.error(f"Ошибка при сохранении данных сессии: {e}")
 
 
+def finalize_sessions_on_shutdown(dispatcher):
+    """Завершает все открытые сессии одной записью в БД при остановке бота."""
+    user_ids = [
+        user_id for user_id, data in dispatcher.user_data.items()
+        if data.get("active_session")
+    ]
+    if not user_ids:
+        return
+
+    finalized = db.finalize_open_sessions(user_ids, datetime.now())
+    for user_id in user_ids:
+        dispatcher.user_data[user_id].pop("active_session", None)
+    logger.info(f"При остановке завершено сессий: {finalized}")
+
+
+def recover_open_sessions():
+    """Завершает сессии, оставшиеся открытыми после падения бота.
+
+    Состояние сессий в памяти после перезапуска потеряно, поэтому каждая
+    такая сессия закрывается по времени последней активности — одной
+    командой, без лавины запросов при старте.
+    """
+    finalized = db.finalize_open_sessions()
+    if finalized:
+        logger.info(f"Восстановлено незавершённых сессий: {finalized}")
+
+
 def check_session_timeout(context: CallbackContext):
     """Автоматическое завершение сессии по таймауту."""
     job = context.job
@@ -50,16 +77,18 @@ def check_session_timeout(context: CallbackContext):
     duration = int((session_end - session_start).total_seconds())
 
     try:
-        learned_words = db.count_new_learned_words(
-            user_id=user_id,
-            session_start=session_start,
-            session_end=session_end,
-        )
-        db.update_session_stats(
-            user_id=user_id,
-            learned_words=learned_words,
-            session_duration=duration,
-        )
+        # Задачи job_queue выполняются вне потока обработки обновлений
+        with db.pooled():
+            learned_words = db.count_new_learned_words(
+                user_id=user_id,
+                session_start=session_start,
+                session_end=session_end,
+            )
+            db.update_session_stats(
+                user_id=user_id,
+                learned_words=learned_words,
+                session_duration=duration,
+            )
         context.bot.send_message(
             chat_id=user_id,
             text="⏳ Ваша сессия завершена из-за неактивности.",
@@ -108,7 +137,9 @@ def start_session(update: Update, context: CallbackContext):
         "correct_answers": 0,
         "active_session": True,
         "job": None,
+        "quiz_message_id": None,
     })
+    db.open_session(user_id, session_start)
     job = context.job_queue.run_once(
         callback=check_session_timeout,
         when=SESSION_TIMEOUT,
@@ -123,7 +154,7 @@ def start_session(update: Update, context: CallbackContext):
     send_message_with_tracking(
         update, context,
         text="Сессия началась!",
-        reply_markup=ReplyKeyboardMarkup([[MENU_BUTTON]], resize_keyboard=True),
+        reply_markup=session_keyboard(),
     )
 
     button = InlineKeyboardMarkup([
@@ -190,7 +221,7 @@ def delete_bot_messages(update: Update, context: CallbackContext):
 
 
 def send_message_with_tracking(update: Update, context: CallbackContext, text: str, reply_markup=None, parse_mode=None, is_user_message=False):
-    """Отправка сообщения и сохранение его ID."""
+    """Отправка сообщения и сохранение его ID. Возвращает отправленное сообщение."""
     if is_user_message:
         message_id = update.message.message_id
     else:
@@ -214,6 +245,38 @@ def send_message_with_tracking(update: Update, context: CallbackContext, text: s
     if "bot_messages" not in context.user_data:
         context.user_data["bot_messages"] = []
     context.user_data["bot_messages"].append(message_id)
+    return None if is_user_message else message
+
+
+def edit_or_send_with_tracking(update: Update, context: CallbackContext, message_id, text: str, reply_markup=None, parse_mode=None):
+    """Редактирует сообщение на месте, а если это невозможно — отправляет новое с отслеживанием.
+
+    Возвращает ID сообщения, в котором теперь показан текст.
+    """
+    if message_id:
+        try:
+            context.bot.edit_message_text(
+                chat_id=update.effective_chat.id,
+                message_id=message_id,
+                text=text,
+                reply_markup=reply_markup,
+                parse_mode=parse_mode,
+            )
+            return message_id
+        except telegram.error.BadRequest as e:
+            if "message is not modified" in str(e).lower():
+                return message_id
+            logger.warning(f"Не удалось отредактировать сообщение {message_id}: {e}")
+        except Exception as e:
+            logger.error(f"Неизвестная ошибка при редактировании сообщения {message_id}: {e}")
+
+    message = send_message_with_tracking(
+        update, context,
+        text=text,
+        reply_markup=reply_markup,
+        parse_mode=parse_mode,
+    )
+    return message.message_id if message else None
 
 
 def handle_menu_button(update: Update, context: CallbackContext):
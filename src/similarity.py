@@ -0,0 +1,206 @@
+import logging
+import random
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Уровни сложности подбора неправильных вариантов
+EASY, MEDIUM, HARD = 1, 2, 3
+
+
+def normalize(word: str) -> str:
+    """Ключ слова в индексе: нижний регистр, 'ё' приравнена к 'е'."""
+    return word.strip().lower().replace("ё", "е")
+
+
+def char_ngrams(word: str, n: int = 3) -> List[str]:
+    """Символьные n-граммы слова с границами (' кот ' -> ' ко', 'кот', 'от ')."""
+    padded = f" {normalize(word)} "
+    if len(padded) <= n:
+        return [padded]
+    return [padded[i : i + n] for i in range(len(padded) - n + 1)]
+
+
+class DistractorIndex:
+    """Индекс похожих переводов на основе хэшированных символьных n-грамм.
+
+    Каждое слово представлено нормированным вектором частот n-грамм, а для
+    каждого слова заранее вычислены `neighbors` ближайших соседей по
+    косинусной близости. Запрос соседей не обращается к БД и занимает
+    микросекунды. Для слов с известной леммой соседи с той же леммой
+    (другие формы правильного ответа) в варианты не попадают.
+    """
+
+    def __init__(self, dims: int = 256, neighbors: int = 32, ngram: int = 3, chunk_size: int = 256):
+        self.dims = dims
+        self.k = neighbors
+        self.ngram = ngram
+        self.chunk_size = chunk_size
+        self.words: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.lemmas: Dict[str, str] = {}
+        self._vectors = np.zeros((0, dims), dtype=np.float32)
+        self._neighbors = np.zeros((0, neighbors), dtype=np.int32)
+        self._scores = np.zeros((0, neighbors), dtype=np.float32)
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __contains__(self, word: str) -> bool:
+        return normalize(word) in self.positions
+
+    def _vectorize(self, words: List[str]) -> np.ndarray:
+        """Нормированные векторы хэшированных n-грамм для списка слов."""
+        rows, cols = [], []
+        for row, word in enumerate(words):
+            for gram in char_ngrams(word, self.ngram):
+                rows.append(row)
+                cols.append(zlib.crc32(gram.encode("utf-8")) % self.dims)
+
+        vectors = np.zeros((len(words), self.dims), dtype=np.float32)
+        np.add.at(vectors, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), 1.0)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _reserve(self, size: int):
+        """Увеличивает ёмкость массивов с запасом, чтобы добавление было амортизированным O(1)."""
+        capacity = self._vectors.shape[0]
+        if size <= capacity:
+            return
+        new_capacity = max(size, capacity * 2, 64)
+        self._vectors = np.resize(self._vectors, (new_capacity, self.dims))
+        self._neighbors = np.resize(self._neighbors, (new_capacity, self.k))
+        self._scores = np.resize(self._scores, (new_capacity, self.k))
+        self._neighbors[capacity:] = -1
+        self._scores[capacity:] = -np.inf
+
+    def _lemma(self, word: str) -> str:
+        """Лемма слова индекса; без известной леммы — само слово."""
+        key = normalize(word)
+        return self.lemmas.get(key, key)
+
+    def build(self, words: Iterable[str], lemmas: Optional[Dict[str, str]] = None):
+        """Полное построение индекса одним векторизованным проходом.
+
+        `lemmas` — леммы слов (слово -> лемма), если они известны.
+        """
+        unique = list({normalize(w): w.strip().lower() for w in words if w and w.strip()}.values())
+        with self._lock:
+            self.words = []
+            self.positions = {}
+            self.lemmas = {normalize(w): normalize(lemma) for w, lemma in (lemmas or {}).items() if lemma}
+            self._vectors = np.zeros((0, self.dims), dtype=np.float32)
+            self._neighbors = np.zeros((0, self.k), dtype=np.int32)
+            self._scores = np.zeros((0, self.k), dtype=np.float32)
+            if not unique:
+                return
+
+            n = len(unique)
+            self._reserve(n)
+            vectors = self._vectorize(unique)
+            self._vectors[:n] = vectors
+            k = min(self.k, n - 1)
+
+            # Матрица близости считается блоками, чтобы не держать n x n в памяти
+            for start in range(0, n, self.chunk_size):
+                stop = min(start + self.chunk_size, n)
+                sims = vectors[start:stop] @ vectors.T
+                sims[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+                if k <= 0:
+                    continue
+                top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+                self._neighbors[start:stop, :k] = top
+                self._scores[start:stop, :k] = np.take_along_axis(sims, top, axis=1)
+
+            self.words = unique
+            self.positions = {normalize(w): i for i, w in enumerate(unique)}
+        logger.info(f"Distractor index built: {n} words")
+
+    def add(self, word: str, lemma: Optional[str] = None):
+        """Инкрементальное добавление слова без перестроения индекса."""
+        key = normalize(word)
+        word = word.strip().lower()
+        with self._lock:
+            if not key or key in self.positions:
+                return
+            if lemma:
+                self.lemmas[key] = normalize(lemma)
+
+            n = len(self.words)
+            self._reserve(n + 1)
+            vector = self._vectorize([word])[0]
+            self._vectors[n] = vector
+            self._neighbors[n] = -1
+            self._scores[n] = -np.inf
+
+            if n:
+                sims = self._vectors[:n] @ vector
+                k = min(self.k, n)
+                top = np.argpartition(-sims, k - 1)[:k]
+                self._neighbors[n, :k] = top
+                self._scores[n, :k] = sims[top]
+
+                # Новое слово вытесняет самого дальнего соседа там, где оно ближе
+                weakest = np.argmin(self._scores[:n], axis=1)
+                rows = np.nonzero(sims > self._scores[np.arange(n), weakest])[0]
+                self._neighbors[rows, weakest[rows]] = n
+                self._scores[rows, weakest[rows]] = sims[rows]
+
+            self.words.append(word)
+            self.positions[key] = n
+
+    def pick(self, word: str, limit: int = 3, difficulty: int = MEDIUM) -> List[str]:
+        """Подбор неправильных вариантов заданной сложности.
+
+        HARD — самые похожие слова, MEDIUM — соседи из второй половины
+        списка близости, EASY — случайные слова вне списка соседей.
+        Формы того же слова (та же лемма) отбрасываются до выбора.
+        """
+        with self._lock:
+            position = self.positions.get(normalize(word))
+            if position is None or len(self.words) < 2:
+                return []
+
+            row = self._neighbors[position]
+            valid = row >= 0
+            order = np.argsort(-self._scores[position][valid])
+            target = self._lemma(word)
+            ranked = [self.words[i] for i in row[valid][order]]
+            ranked = [w for w in ranked if self._lemma(w) != target]
+
+            if difficulty >= HARD:
+                pool = ranked[: limit * 2]
+            elif difficulty == MEDIUM:
+                pool = ranked[len(ranked) // 2 :] or ranked
+            else:
+                excluded = set(ranked) | {self.words[position]}
+                pool = []
+                for _ in range(limit * 4):
+                    candidate = self.words[random.randrange(len(self.words))]
+                    if candidate not in excluded and candidate not in pool and self._lemma(candidate) != target:
+                        pool.append(candidate)
+                    if len(pool) >= limit:
+                        break
+                # В маленьком словаре все слова — соседи: берём самые далёкие
+                pool = pool or ranked[::-1][: limit * 2]
+
+            pool = [w for w in pool if self._lemma(w) != target]
+        return random.sample(pool, min(limit, len(pool)))
+
+    def neighbors(self, word: str, limit: int = 10) -> Optional[List[tuple]]:
+        """Ближайшие соседи слова с оценками близости (для отладки и аналитики)."""
+        with self._lock:
+            position = self.positions.get(normalize(word))
+            if position is None:
+                return None
+            row = self._neighbors[position]
+            scores = self._scores[position]
+            valid = row >= 0
+            order = np.argsort(-scores[valid])[:limit]
+            return [(self.words[i], float(s)) for i, s in zip(row[valid][order], scores[valid][order])]
@@ -0,0 +1,271 @@
+import logging
+import shutil
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from src import audio_pipeline
+from src.config import (
+    ESPEAK_VOICE,
+    SPEECH_BACKENDS,
+    SPEECH_CACHE_MB,
+    SPEECH_FAILURE_COOLDOWN,
+    SPEECH_LATENCY_BUDGET_MS,
+    SPEECH_REMOTE_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Speech(NamedTuple):
+    """Синтезированное аудио: данные, расширение файла, имя движка и формат.
+
+    `voice` — аудио в формате голосового сообщения Telegram (OGG/Opus).
+    """
+
+    audio: bytes
+    extension: str
+    backend: str
+    voice: bool
+
+
+class SpeechBackend:
+    """Интерфейс движка синтеза речи."""
+
+    name = "base"
+    extension = "ogg"
+    # Отдаёт ли движок аудио, пригодное для голосового сообщения без перекодирования
+    voice_ready = False
+
+    def available(self) -> bool:
+        """Можно ли использовать движок в текущем окружении."""
+        return True
+
+    def stream(self, text: str) -> Iterator[bytes]:
+        """Аудио для текста фрагментами; при ошибке выбрасывает исключение."""
+        raise NotImplementedError
+
+
+class SberSpeechBackend(SpeechBackend):
+    """Облачный синтез SberSpeech (OGG/Opus)."""
+
+    name = "sber"
+    extension = "ogg"
+    voice_ready = True
+
+    def __init__(self, timeout: float = SPEECH_REMOTE_TIMEOUT):
+        self.timeout = timeout
+        self._api = None
+        try:
+            from src.sberspeech_api import SberSpeechAPI
+
+            self._api = SberSpeechAPI()
+        except ValueError as e:
+            logger.warning(f"SberSpeech недоступен: {e}")
+
+    def available(self) -> bool:
+        return self._api is not None
+
+    def stream(self, text: str) -> Iterator[bytes]:
+        return self._api.stream_audio(text, timeout=self.timeout)
+
+
+class EspeakBackend(SpeechBackend):
+    """Локальный офлайн-синтез через espeak-ng (WAV)."""
+
+    name = "espeak"
+    extension = "wav"
+
+    def __init__(self, voice: str = ESPEAK_VOICE, timeout: float = 5.0):
+        self.voice = voice
+        self.timeout = timeout
+        self.binary = shutil.which("espeak-ng") or shutil.which("espeak")
+
+    def available(self) -> bool:
+        return self.binary is not None
+
+    def stream(self, text: str) -> Iterator[bytes]:
+        # Текст передаётся через stdin, а не аргументом: он не может стать опцией
+        process = subprocess.Popen(
+            [self.binary, "-v", self.voice, "--stdin", "--stdout"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            process.stdin.write(text.encode("utf-8"))
+            process.stdin.close()
+            deadline = time.monotonic() + self.timeout
+            while True:
+                chunk = process.stdout.read(16 * 1024)
+                if not chunk:
+                    break
+                if time.monotonic() > deadline:
+                    raise subprocess.TimeoutExpired(self.binary, self.timeout)
+                yield chunk
+            if process.wait(timeout=self.timeout) != 0:
+                raise subprocess.CalledProcessError(process.returncode, self.binary)
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+
+
+BACKENDS = {
+    SberSpeechBackend.name: SberSpeechBackend,
+    EspeakBackend.name: EspeakBackend,
+}
+
+
+class AudioCache:
+    """LRU-кэш синтезированного аудио, общий для всех пользователей и движков."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items: "OrderedDict[str, Speech]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Speech]:
+        with self._lock:
+            speech = self._items.get(key)
+            if speech is not None:
+                self._items.move_to_end(key)
+            return speech
+
+    def put(self, key: str, speech: Speech):
+        if len(speech.audio) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._items.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous.audio)
+            self._items[key] = speech
+            self.size += len(speech.audio)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted.audio)
+
+
+class BackendHealth:
+    """Сглаженная задержка движка и время окончания паузы после сбоя."""
+
+    def __init__(self, alpha: float = 0.3):
+        self.alpha = alpha
+        self.latency_ms: Optional[float] = None
+        self.cooldown_until = 0.0
+        self.last_used = 0.0
+        self.failures = 0
+
+    def record_success(self, latency_ms: float):
+        if self.latency_ms is None:
+            self.latency_ms = latency_ms
+        else:
+            self.latency_ms = self.alpha * latency_ms + (1 - self.alpha) * self.latency_ms
+        self.failures = 0
+
+    def record_failure(self, cooldown: float):
+        self.failures += 1
+        # Пауза растёт с числом сбоев подряд, но не больше 10 интервалов
+        self.cooldown_until = time.monotonic() + cooldown * min(self.failures, 10)
+
+
+class SpeechService:
+    """Выбор движка синтеза по приоритету, задержке и доступности.
+
+    Движки перебираются в порядке SPEECH_BACKENDS. Движок на паузе после
+    сбоя пропускается, а движок, чья сглаженная задержка превышает бюджет,
+    пробуется только после более быстрых (и снова первым — не чаще раза
+    в SPEECH_FAILURE_COOLDOWN секунд, чтобы обновить оценку).
+    """
+
+    def __init__(
+        self,
+        backends: List[SpeechBackend],
+        latency_budget_ms: float = SPEECH_LATENCY_BUDGET_MS,
+        failure_cooldown: float = SPEECH_FAILURE_COOLDOWN,
+        cache_bytes: int = SPEECH_CACHE_MB * 1024 * 1024,
+    ):
+        self.backends = [b for b in backends if b.available()]
+        self.latency_budget_ms = latency_budget_ms
+        self.failure_cooldown = failure_cooldown
+        self.cache = AudioCache(cache_bytes)
+        self.health: Dict[str, BackendHealth] = {b.name: BackendHealth() for b in self.backends}
+        self._lock = threading.Lock()
+        if not self.backends:
+            logger.warning("Нет доступных движков синтеза речи")
+
+    @classmethod
+    def from_config(cls, names: str = SPEECH_BACKENDS) -> "SpeechService":
+        """Сервис с движками из настройки SPEECH_BACKENDS (через запятую)."""
+        backends = []
+        for name in (n.strip() for n in names.split(",")):
+            if name in BACKENDS:
+                backends.append(BACKENDS[name]())
+            elif name:
+                logger.warning(f"Неизвестный движок синтеза речи: {name}")
+        return cls(backends)
+
+    def candidates(self) -> List[SpeechBackend]:
+        """Движки в порядке попыток для очередного запроса."""
+        now = time.monotonic()
+        with self._lock:
+            healthy = [b for b in self.backends if self.health[b.name].cooldown_until <= now]
+            within_budget = [
+                b for b in healthy
+                if self.health[b.name].latency_ms is None
+                or self.health[b.name].latency_ms <= self.latency_budget_ms
+                # Медленный движок время от времени пробуется снова, чтобы обновить оценку
+                or now - self.health[b.name].last_used >= self.failure_cooldown
+            ]
+            slow = sorted(
+                (b for b in healthy if b not in within_budget),
+                key=lambda b: self.health[b.name].latency_ms,
+            )
+        return within_budget + slow
+
+    @staticmethod
+    def _render(backend: SpeechBackend, text: str) -> Optional[bytes]:
+        """Поток движка, перекодированный в голосовое сообщение (или как есть без ffmpeg)."""
+        if audio_pipeline.available():
+            return audio_pipeline.transcode_to_voice(backend.stream(text))
+        return audio_pipeline.collect(backend.stream(text))
+
+    @staticmethod
+    def _format(backend: SpeechBackend):
+        """Расширение файла и признак голосового сообщения для результата движка."""
+        if audio_pipeline.available():
+            return "ogg", True
+        return backend.extension, backend.voice_ready
+
+    def synthesize(self, text: str) -> Optional[Speech]:
+        """Аудио для текста: из кэша или от первого успешно ответившего движка."""
+        key = text.strip().lower()
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        for backend in self.candidates():
+            started = time.monotonic()
+            try:
+                audio = self._render(backend, text)
+            except Exception as e:
+                logger.error(f"Ошибка движка {backend.name}: {e}")
+                audio = None
+            latency_ms = (time.monotonic() - started) * 1000
+
+            with self._lock:
+                health = self.health[backend.name]
+                health.last_used = time.monotonic()
+                if audio:
+                    health.record_success(latency_ms)
+                else:
+                    health.record_failure(self.failure_cooldown)
+            if audio:
+                extension, voice = self._format(backend)
+                speech = Speech(audio, extension, backend.name, voice)
+                self.cache.put(key, speech)
+                return speech
+        return None
@@ -1,5 +1,6 @@
 import logging
 import io
+from datetime import date
 import matplotlib
 from telegram import Update
 from telegram.ext import CallbackContext
@@ -7,6 +8,8 @@ from src.handlers import ask_question_handler
 from src.keyboards import stats_keyboard
 from src.session_manager import send_message_with_tracking
 from src import db
+from src.config import ADMIN_IDS
+from src.retention import retention_cutoff
 
 matplotlib.use('Agg')  # Используем backend, не зависящий от дисплея
 import matplotlib.pyplot as plt
@@ -17,14 +20,27 @@ logger = logging.getLogger(__name__)
 def get_user_statistics(user_id: int) -> dict:
     stats = {}
     try:
-        db.cur.execute("SELECT COUNT(*) FROM user_progress WHERE user_id = %s", (user_id,))
-        stats['learned_words'] = db.cur.fetchone()[0]
-
-        db.cur.execute("SELECT COUNT(*) FROM user_words WHERE user_id = %s", (user_id,))
-        stats['added_words'] = db.cur.fetchone()[0]
-
-        db.cur.execute("SELECT session_date, learned_words FROM session_stats WHERE user_id = %s", (user_id,))
-        stats['session_stats'] = db.cur.fetchall()
+        cur = db.execute("SELECT COUNT(*) FROM user_progress WHERE user_id = %s", (user_id,))
+        stats['learned_words'] = cur.fetchone()[0]
+
+        cur = db.execute("SELECT COUNT(*) FROM user_words WHERE user_id = %s", (user_id,))
+        stats['added_words'] = cur.fetchone()[0]
+
+        # Свежие сессии читаются только из секций после границы хранения,
+        # более старые — из помесячных итогов
+        cutoff = retention_cutoff(date.today())
+        cur = db.execute(
+            """
+            SELECT session_date, learned_words FROM session_stats
+            WHERE user_id = %s AND session_date >= %s
+            UNION ALL
+            SELECT month::TIMESTAMP, learned_words FROM session_stats_monthly
+            WHERE user_id = %s AND month < %s
+            ORDER BY 1
+            """,
+            (user_id, cutoff, user_id, cutoff),
+        )
+        stats['session_stats'] = cur.fetchall()
 
     except Exception as e:
         logger.error(f"Ошибка получения статистики: {e}")
@@ -122,10 +138,14 @@ def clear_user_sessions(update: Update, context: CallbackContext):
 
     # Удаление данных сессии пользователя из базы данных
     try:
-        db.cur.execute(
+        db.execute(
             "DELETE FROM session_stats WHERE user_id = %s",
             (user_id,)
         )
+        db.execute(
+            "DELETE FROM session_stats_monthly WHERE user_id = %s",
+            (user_id,)
+        )
         db.conn.commit()
 
         send_message_with_tracking(
@@ -153,9 +173,24 @@ def reset_progress_handler(update: Update, context: CallbackContext):
     user_id = update.effective_user.id
     try:
         with db.conn:
-            db.cur.execute("DELETE FROM user_progress WHERE user_id = %s", (user_id,))
+            db.execute("DELETE FROM user_progress WHERE user_id = %s", (user_id,))
+        context.user_data.pop("question_buffer", None)
         update.callback_query.answer("✅ Прогресс сброшен!")
         ask_question_handler(update, context)
     except Exception as e:
         logger.error(f"Ошибка сброса: {e}")
-        update.callback_query.answer("❌ Ошибка при сбросе прогресса.")
\ No newline at end of file
+        update.callback_query.answer("❌ Ошибка при сбросе прогресса.")
+
+
+def query_stats_handler(update: Update, context: CallbackContext):
+    """Отчёт профилировщика: top-N самых затратных SQL-запросов (только для админов)."""
+    if update.effective_user.id not in ADMIN_IDS:
+        return
+
+    try:
+        limit = int(context.args[0]) if context.args else 10
+    except ValueError:
+        limit = 10
+
+    report = db.profiler.report(limit)
+    update.message.reply_text(f"🐢 Top-{limit} SQL-запросов:\n\n{report}"[:4096])
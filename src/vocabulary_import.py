@@ -0,0 +1,168 @@
+"""Потоковый импорт частотных списков и двуязычных словарей в common_words.
+
+Пример запуска:
+
+    python -m src.vocabulary_import dictionary.tsv.gz --columns english,russian,pos
+    python -m src.vocabulary_import frequency.csv --columns english --rank-by-order --skip-header
+    python -m src.vocabulary_import de_ru.tsv --columns english,russian --pair de-ru
+
+Колонки english/russian — слово изучаемого языка и перевод на родной язык пары.
+"""
+import argparse
+import csv
+import gzip
+import io
+import logging
+import sys
+from typing import Iterator, List, Optional, TextIO, Tuple
+
+from src import db
+from src.config import DEFAULT_LANG_PAIR
+from src.languages import is_lang_pair
+from src.lemmas import backfill_lemmas
+
+# Допустимые имена колонок входного файла; 'skip' — колонка игнорируется
+COLUMNS = ("english", "russian", "rank", "pos", "skip")
+
+# Ограничения длины полей из схемы common_words
+MAX_WORD_LENGTH = 50
+MAX_POS_LENGTH = 20
+
+logger = logging.getLogger(__name__)
+
+
+def open_source(path: str) -> TextIO:
+    """Открывает файл (в том числе .gz) или stdin ('-') для построчного чтения."""
+    if path == "-":
+        return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def detect_delimiter(path: str) -> str:
+    """Разделитель по расширению файла: CSV — запятая, иначе табуляция."""
+    name = path[:-3] if path.endswith(".gz") else path
+    return "," if name.endswith(".csv") else "\t"
+
+
+def _clean(value: Optional[str], limit: int) -> Optional[str]:
+    """Обрезает пробелы; пустые и слишком длинные значения заменяет на None."""
+    if value is None:
+        return None
+    value = value.strip()
+    if not value or len(value) > limit:
+        return None
+    return value
+
+
+def parse_rows(
+    lines: TextIO,
+    columns: List[str],
+    delimiter: str = "\t",
+    skip_header: bool = False,
+    rank_by_order: bool = False,
+    stats: Optional[dict] = None,
+) -> Iterator[Tuple[str, Optional[str], Optional[int], Optional[str]]]:
+    """Лениво разбирает входной файл в кортежи (english, russian, rank, part_of_speech).
+
+    При `rank_by_order` ранг равен порядковому номеру записи (для частотных
+    списков, отсортированных по частоте). Некорректные строки пропускаются
+    и учитываются в stats["skipped"].
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("skipped", 0)
+    quoting = csv.QUOTE_MINIMAL if delimiter == "," else csv.QUOTE_NONE
+    reader = csv.reader(lines, delimiter=delimiter, quoting=quoting)
+    if skip_header:
+        next(reader, None)
+
+    positions = {name: i for i, name in enumerate(columns) if name != "skip"}
+    order = 0
+    for fields in reader:
+        if not fields or fields[0].startswith("#"):
+            continue
+        record = {name: fields[i] if i < len(fields) else None for name, i in positions.items()}
+
+        english = _clean(record.get("english"), MAX_WORD_LENGTH)
+        if not english:
+            stats["skipped"] += 1
+            continue
+        order += 1
+
+        rank = None
+        if rank_by_order:
+            rank = order
+        elif record.get("rank"):
+            try:
+                rank = int(record["rank"].strip())
+            except ValueError:
+                stats["skipped"] += 1
+                continue
+
+        russian = _clean(record.get("russian"), MAX_WORD_LENGTH)
+        if record.get("russian") and not russian:
+            # Перевод есть, но не помещается в схему
+            stats["skipped"] += 1
+            continue
+        if not russian and rank is None:
+            stats["skipped"] += 1
+            continue
+
+        yield english.lower(), russian.lower() if russian else None, rank, _clean(record.get("pos"), MAX_POS_LENGTH)
+
+
+def parse_columns(value: str) -> List[str]:
+    """Разбор аргумента --columns."""
+    columns = [c.strip().lower() for c in value.split(",") if c.strip()]
+    unknown = set(columns) - set(COLUMNS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Неизвестные колонки: {', '.join(sorted(unknown))}")
+    if "english" not in columns:
+        raise argparse.ArgumentTypeError("Колонка english обязательна")
+    return columns
+
+
+def parse_pair(value: str) -> str:
+    """Разбор аргумента --pair."""
+    value = value.strip().lower()
+    if not is_lang_pair(value):
+        raise argparse.ArgumentTypeError(f"Некорректная языковая пара: {value} (ожидается, например, en-ru)")
+    return value
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Импорт словаря в таблицу common_words")
+    parser.add_argument("path", help="TSV/CSV-файл (можно .gz) или '-' для stdin")
+    parser.add_argument(
+        "--columns",
+        type=parse_columns,
+        default=parse_columns("english,russian,rank,pos"),
+        help="порядок колонок через запятую: english, russian, rank, pos, skip",
+    )
+    parser.add_argument("--delimiter", help="разделитель колонок (по умолчанию — по расширению файла)")
+    parser.add_argument("--skip-header", action="store_true", help="пропустить первую строку")
+    parser.add_argument("--rank-by-order", action="store_true", help="ранг частоты — номер записи в файле")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="строк в одной порции COPY")
+    parser.add_argument(
+        "--pair", type=parse_pair, default=DEFAULT_LANG_PAIR, help="языковая пара 'изучаемый-родной' (например, de-ru)"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    stats = {}
+    delimiter = args.delimiter or detect_delimiter(args.path)
+    with open_source(args.path) as lines:
+        rows = parse_rows(lines, args.columns, delimiter, args.skip_header, args.rank_by_order, stats)
+        upserted, ranked = db.import_common_words(rows, chunk_size=args.chunk_size, pair=args.pair)
+    db.ensure_lang_pair(args.pair)
+    lemmatized = backfill_lemmas()
+
+    logger.info(f"Импорт завершён: добавлено или обновлено {upserted}, ранг обновлён у {ranked}, пропущено строк {stats['skipped']}, лемматизировано {lemmatized}")
+    db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
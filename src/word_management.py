@@ -1,12 +1,15 @@
 from telegram import Update
 from telegram.ext import CallbackContext, ConversationHandler
 from src import db
+from src.handlers import current_lang_pair, quiz
+from src.inline_search import dictionary
+from src.lemmas import lemmatizer
+from src.languages import is_word_in_language, language_name_prepositional, lookup_direction, split_pair
 from src.keyboards import main_menu_keyboard, add_more_keyboard, delete_more_keyboard
 from src.session_manager import delete_bot_messages, send_message_with_tracking
 from src.yandex_api import YandexDictionaryApi
 import os
 import logging
-import re
 
 logger = logging.getLogger(__name__)
 
@@ -36,9 +39,10 @@ def add_word(update: Update, context: CallbackContext) -> int:
 
     delete_bot_messages(update, context)
 
+    _, native_lang = split_pair(current_lang_pair(context, update.effective_user.id))
     send_message_with_tracking(
         update, context,
-        text="📝 Введите слово на русском языке:",
+        text=f"📝 Введите слово на {language_name_prepositional(native_lang)} языке:",
         reply_markup=add_more_keyboard(),
     )
     return WAITING_WORD
@@ -52,9 +56,8 @@ def save_word(update: Update, context: CallbackContext) -> int:
 
     user_id = update.effective_user.id
     input_text = update.message.text.strip().lower()
-
-    if input_text == "назад ↩️":
-        return handle_back_to_menu(update, context)
+    pair = current_lang_pair(context, user_id)
+    studied_lang, native_lang = split_pair(pair)
 
     if not input_text:
         send_message_with_tracking(
@@ -72,15 +75,17 @@ def save_word(update: Update, context: CallbackContext) -> int:
         )
         return WAITING_WORD
 
-    if not re.match(r"^[а-яё\-]+$", input_text):
+    if not is_word_in_language(input_text, native_lang):
         send_message_with_tracking(
             update, context,
-            text="❌ Используйте только русские буквы!",
+            text=f"❌ Введите слово на {language_name_prepositional(native_lang)} языке!",
             reply_markup=add_more_keyboard(),
         )
         return WAITING_WORD
 
-    if db.check_duplicate(user_id, input_text):
+    # Дубликаты ищутся по лемме: «кошки» совпадает с уже добавленной «кошкой»
+    input_lemma = lemmatizer.lemma(input_text, native_lang)
+    if db.check_duplicate(user_id, input_lemma, pair):
         send_message_with_tracking(
             update, context,
             text=f"❌ Слово '{input_text.capitalize()}' уже существует!",
@@ -89,11 +94,14 @@ def save_word(update: Update, context: CallbackContext) -> int:
         return WAITING_WORD
 
     try:
-        api_response = yandex_api.lookup(input_text, "ru-en")
-        if not api_response or not api_response.get("def"):
-            raise ValueError("Пустой ответ API")
-
-        first_translation = api_response["def"][0]["tr"][0]["text"].lower()
+        # Перевод уже есть в общем словаре — запрос к API не нужен
+        first_translation = db.find_lexeme_translation(input_text, pair)
+        if not first_translation:
+            api_response = yandex_api.lookup(input_text, lookup_direction(pair))
+            if not api_response or not api_response.get("def"):
+                raise ValueError("Пустой ответ API")
+
+            first_translation = api_response["def"][0]["tr"][0]["text"].lower()
     except Exception as e:
         logger.error(f"Ошибка перевода: {str(e)}")
         send_message_with_tracking(
@@ -103,7 +111,8 @@ def save_word(update: Update, context: CallbackContext) -> int:
         )
         return WAITING_WORD
 
-    if db.check_duplicate(user_id, first_translation):
+    translation_lemma = lemmatizer.lemma(first_translation, studied_lang)
+    if db.check_duplicate(user_id, translation_lemma, pair, studied=True):
         send_message_with_tracking(
             update, context,
             text=f"❌ Перевод '{first_translation.capitalize()}' уже существует!",
@@ -111,8 +120,13 @@ def save_word(update: Update, context: CallbackContext) -> int:
         )
         return WAITING_WORD
 
-    if db.add_user_word(user_id, first_translation, input_text):
-        count = db.count_user_words(user_id)
+    if db.add_user_word(
+        user_id, first_translation, input_text, pair, english_lemma=translation_lemma, translation_lemma=input_lemma
+    ):
+        quiz.register_translation(input_text, first_translation, pair, input_lemma, translation_lemma)
+        dictionary.forget_user(user_id)
+        dictionary.add_to_catalog(pair, [(first_translation, input_text)])
+        count = db.count_user_words(user_id, pair)
         send_message_with_tracking(
             update, context,
             text=f"✅ Успешно добавлено: {input_text.capitalize()} по слову {first_translation.capitalize()}\n"
@@ -140,7 +154,7 @@ def delete_word(update: Update, context: CallbackContext) -> int:
 
     send_message_with_tracking(
         update, context,
-        text="🗑 Введите слово для удаления (русское или английское):",
+        text="🗑 Введите слово для удаления (или его перевод):",
         reply_markup=delete_more_keyboard(),
     )
     return WAITING_DELETE
@@ -155,10 +169,9 @@ def confirm_delete(update: Update, context: CallbackContext) -> int:
     user_id = update.effective_user.id
     word = update.message.text.strip().lower()
 
-    if word == "назад ↩️":
-        return handle_back_to_menu(update, context)
-
-    if db.delete_user_word(user_id, word):
+    deleted = db.delete_user_word(user_id, word, current_lang_pair(context, user_id))
+    if deleted:
+        dictionary.forget_user(user_id)
         send_message_with_tracking(
             update, context,
             text=f"✅ Слово/перевод '{word}' успешно удалено!",
@@ -199,7 +212,7 @@ def show_user_words(update: Update, context: CallbackContext):
 
     user_id = update.effective_user.id
     try:
-        words = db.get_user_words(user_id)
+        words = db.get_user_words(user_id, current_lang_pair(context, user_id))
         if not words:
             send_message_with_tracking(
                 update, context,
@@ -8,6 +8,22 @@ class YandexDictionaryApi:
     def __init__(self, api_key: str):
         self.api_key = api_key
         self.base_url = "https://dictionary.yandex.net/api/v1/dicservice.json"
+        self._langs = None
+
+    def get_langs(self) -> list | None:
+        """Возвращает поддерживаемые направления перевода ('ru-en', ...).
+
+        Список меняется редко, поэтому запрашивается один раз за время работы.
+        """
+        if self._langs is None:
+            try:
+                response = requests.get(f"{self.base_url}/getLangs", params={"key": self.api_key}, timeout=5)
+                response.raise_for_status()
+                self._langs = response.json()
+            except Exception as e:
+                logger.error(f"Request failed: {str(e)}")
+                return None
+        return self._langs
 
     def lookup(self, word: str, lang: str = "en-ru") -> dict | None:
         """Возвращает полный JSON-ответ API."""